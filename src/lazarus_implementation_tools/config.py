@@ -27,6 +27,9 @@ WORKING_FOLDER = normalize_path(os.environ.get("WORKING_FOLDER", "/tmp"))
 DOWNLOAD_FOLDER = normalize_path(
     os.environ.get("DOWNLOAD_FOLDER", os.path.join(WORKING_FOLDER, "downloads"))
 )
+CACHE_FOLDER = normalize_path(
+    os.environ.get("CACHE_FOLDER", os.path.join(WORKING_FOLDER, ".cache"))
+)
 
 # Rikai2 Variables
 RIKAI2_ORG_ID = os.environ.get("RIKAI2_ORG_ID", "")
@@ -74,8 +77,40 @@ FIREBASE_PERSONAL_ROOT_FOLDER = (
 )
 
 FIREBASE_KEY = os.path.join(PROJECT_ROOT_FOLDER, os.environ.get("FIREBASE_KEY"))
+FIREBASE_TRANSFER_WORKERS = int(os.environ.get("FIREBASE_TRANSFER_WORKERS", 8))
+FIREBASE_TRANSFER_RETRIES = int(os.environ.get("FIREBASE_TRANSFER_RETRIES", 3))  # Per file
+# Size of the requests large files are uploaded and downloaded in, a multiple of 256 KB
+FIREBASE_CHUNK_SIZE = int(float(os.environ.get("FIREBASE_CHUNK_SIZE_MB", 8)) * 1024 * 1024)
 
 
 # PDF Variables
 PATH_TO_LIBRE_OFFICE = os.environ.get("PATH_TO_LIBRE_OFFICE", "soffice")
 CLOUD_CONVERT_API_KEY = os.environ.get("CLOUD_CONVERT_API_KEY")
+PDF_CONVERSION_WORKERS = int(os.environ.get("PDF_CONVERSION_WORKERS", os.cpu_count() or 1))
+LIBRE_OFFICE_DAEMON = os.environ.get("LIBRE_OFFICE_DAEMON", "true").lower() == "true"
+LIBRE_OFFICE_POOL_SIZE = int(os.environ.get("LIBRE_OFFICE_POOL_SIZE", 1))  # Per process
+LIBRE_OFFICE_MAX_JOBS = int(os.environ.get("LIBRE_OFFICE_MAX_JOBS", 200))  # Before restarting
+LIBRE_OFFICE_BATCH_SIZE = int(os.environ.get("LIBRE_OFFICE_BATCH_SIZE", 20))  # Files per run
+CONVERSION_CACHE = os.environ.get("CONVERSION_CACHE", "true").lower() == "true"
+CONVERSION_CACHE_SIZE_MB = int(os.environ.get("CONVERSION_CACHE_SIZE_MB", 2048))
+CONVERSION_CACHE_HARDLINK = os.environ.get("CONVERSION_CACHE_HARDLINK", "").lower() == "true"
+PDF_METADATA_CACHE = os.environ.get("PDF_METADATA_CACHE", "true").lower() == "true"
+PDF_METADATA_CACHE_SIZE_MB = int(os.environ.get("PDF_METADATA_CACHE_SIZE_MB", 64))
+PDF_RENDER_THREADS = int(os.environ.get("PDF_RENDER_THREADS", 4))  # Poppler processes per render
+PDF_RENDER_CACHE = os.environ.get("PDF_RENDER_CACHE", "true").lower() == "true"
+PDF_RENDER_CACHE_SIZE_MB = int(os.environ.get("PDF_RENDER_CACHE_SIZE_MB", 512))  # In memory
+PDF_RENDER_DISK_CACHE_SIZE_MB = int(os.environ.get("PDF_RENDER_DISK_CACHE_SIZE_MB", 2048))
+
+# OCR Variables
+OCR_THREADS_PER_WORKER = int(os.environ.get("OCR_THREADS_PER_WORKER", 2))
+OCR_WORKERS = int(
+    os.environ.get("OCR_WORKERS", max(1, (os.cpu_count() or 1) // OCR_THREADS_PER_WORKER))
+)
+OCR_PAGES_PER_TASK = int(os.environ.get("OCR_PAGES_PER_TASK", 4))
+OCR_TILE_PAGE_SIZE = int(os.environ.get("OCR_TILE_PAGE_SIZE", 6000))  # Pixels, 0 disables
+OCR_TILE_SIZE = int(os.environ.get("OCR_TILE_SIZE", 2048))
+OCR_TILE_OVERLAP = int(os.environ.get("OCR_TILE_OVERLAP", 256))
+OCR_TILE_THREADS = int(os.environ.get("OCR_TILE_THREADS", 2))
+OCR_MAX_TILES = int(os.environ.get("OCR_MAX_TILES", 36))  # Larger pages are scaled down
+OCR_CACHE = os.environ.get("OCR_CACHE", "true").lower() == "true"
+OCR_CACHE_SIZE_MB = int(os.environ.get("OCR_CACHE_SIZE_MB", 1024))
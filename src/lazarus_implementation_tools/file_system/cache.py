@@ -0,0 +1,179 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FileCache:
+    """A directory of files stored under string keys with a size cap.
+
+    Once the cache grows past max_size bytes the least recently used files are removed.
+    Files are written atomically, so several processes can share one cache directory.
+
+    """
+
+    def __init__(self, cache_dir: str, max_size: int):
+        """Initializes the cache, creating its directory if needed.
+
+        :param cache_dir: (str) The directory the cached files are stored in.
+        :param max_size: (int) The maximum size of the cache in bytes.
+
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._size = None  # type: Optional[int]
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, key: str, extension: str = "") -> str:
+        """Returns the path a key is stored at.
+
+        :param key: (str) The cache key, usually a hash.
+        :param extension: (str) The file extension, without the dot.
+
+        :returns: (str) The path to the cached file, which may not exist.
+
+        """
+        filename = f"{key}.{extension}" if extension else key
+        return os.path.join(self.cache_dir, key[:2], filename)
+
+    def get(self, key: str, extension: str = "") -> Optional[str]:
+        """Looks up a key, marking it as recently used.
+
+        :param key: (str) The cache key.
+        :param extension: (str) The file extension, without the dot.
+
+        :returns: (Optional[str]) The path to the cached file, or None on a miss.
+
+        """
+        path = self.path_for(key, extension)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, file_path: str, extension: str = "") -> str:
+        """Copies a file into the cache.
+
+        :param key: (str) The cache key.
+        :param file_path: (str) The file to store.
+        :param extension: (str) The file extension, without the dot.
+
+        :returns: (str) The path to the cached file.
+
+        """
+        with open(file_path, "rb") as file:
+            return self.put_bytes(key, file, extension)
+
+    def put_bytes(self, key: str, data, extension: str = "") -> str:
+        """Stores bytes, or the contents of a binary file object, in the cache.
+
+        :param key: (str) The cache key.
+        :param data: (bytes) The data, or a file object to read it from.
+        :param extension: (str) The file extension, without the dot.
+
+        :returns: (str) The path to the cached file.
+
+        """
+        path = self.path_for(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+        try:
+            with os.fdopen(handle, "wb") as tmp_file:
+                if isinstance(data, bytes):
+                    tmp_file.write(data)
+                else:
+                    shutil.copyfileobj(data, tmp_file)
+            try:
+                # Overwriting a key replaces the old file, which no longer counts
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is not None:
+                self._size += os.path.getsize(path) - old_size
+        self.evict()
+        return path
+
+    def copy_to(self, key: str, destination_path: str, extension: str = "", link=False) -> bool:
+        """Copies a cached file out of the cache.
+
+        :param key: (str) The cache key.
+        :param destination_path: (str) Where to put the file.
+        :param extension: (str) The file extension, without the dot.
+        :param link: (bool) If True, hardlink the file instead of copying it when the
+            file system allows it. Only safe if the destination is never modified in
+            place.
+
+        :returns: (bool) True on a hit, False on a miss.
+
+        """
+        path = self.get(key, extension)
+        if path is None:
+            return False
+
+        if os.path.abspath(path) == os.path.abspath(destination_path):
+            return True
+
+        try:
+            if link:
+                if os.path.lexists(destination_path):
+                    os.remove(destination_path)
+                try:
+                    os.link(path, destination_path)
+                    return True
+                except OSError:
+                    pass
+            shutil.copyfile(path, destination_path)
+        except FileNotFoundError:
+            # Evicted by another process between the lookup and the copy
+            return False
+        return True
+
+    def evict(self):
+        """Removes the least recently used files until the cache fits in max_size."""
+        with self._lock:
+            if self._size is not None and self._size <= self.max_size:
+                return
+
+            entries = []
+            for root, _, files in os.walk(self.cache_dir):
+                for filename in files:
+                    if filename.startswith(".tmp_"):
+                        continue
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            size = sum(entry[1] for entry in entries)
+            entries.sort()
+            for _, file_size, path in entries:
+                if size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+            self._size = size
+
+    def clear(self):
+        """Removes every file in the cache."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._size = 0
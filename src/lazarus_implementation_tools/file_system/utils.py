@@ -1,4 +1,5 @@
 import glob
+import hashlib
 import json
 import os
 import zipfile
@@ -275,3 +276,19 @@ def get_absolute_path(file_path: str) -> Path:
 
     """
     return Path(file_path).resolve()
+
+
+def get_file_hash(file_path: str, algorithm: str = "sha256") -> str:
+    """Returns the hex digest of a file's contents.
+
+    :param file_path: The file path.
+    :param algorithm: The hashlib algorithm to use.
+
+    :returns: The hex digest of the file.
+
+    """
+    digest = hashlib.new(algorithm)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -7,7 +7,7 @@ class BoundingBox(BaseModel):
     """A Pydantic model representing a bounding box on a specific page."""
 
     page_number: int  # 1 Indexed
-    unit: Optional[str]
+    unit: Optional[str] = None
     box: dict
     # Example:
     # box_dict = {
@@ -22,7 +22,7 @@ class Polygon(BaseModel):
     """A Pydantic model representing a polygon on a specific page."""
 
     page_number: int
-    unit: Optional[str]
+    unit: Optional[str] = None
     vertices: list[tuple]
 
 
@@ -30,7 +30,7 @@ class TextBox(BaseModel):
     """A Pydantic model representing the placement of text."""
 
     page_number: int
-    unit: Optional[str]
+    unit: Optional[str] = None
     coordinates: tuple[float, float]
     text: str
-    font: Optional[Any]  # Optional[ImageFont]
+    font: Optional[Any] = None  # Optional[ImageFont]
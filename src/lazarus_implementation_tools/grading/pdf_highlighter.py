@@ -1,17 +1,16 @@
 import json
 import os
 import re
-import tempfile
 from uuid import uuid4
 
 from nicegui import app, events, ui
-from pdf2image import convert_from_path
 
 from lazarus_implementation_tools.file_system.utils import (
     file_exists,
     get_all_files_with_ext,
     get_filename,
 )
+from lazarus_implementation_tools.transformations.pdf.render import render_pages
 from lazarus_implementation_tools.transformations.pdf.utils import get_number_of_pages
 
 
@@ -218,14 +217,13 @@ class AnnotationJob:
         """Loads the current page image from the PDF file."""
         pdf_path = self.pdf_files[self.current_pdf_index]
 
-        with tempfile.TemporaryDirectory() as path:
-            images = convert_from_path(
-                pdf_path,
-                first_page=self.current_page + 1,  # Convert 0 index to 1 index
-                last_page=self.current_page + 1,  # Convert 0 index to 1 index
-                output_folder=path,
-            )
-            self.current_image = images.pop()
+        # Pages come from the shared render cache, so paging back and forth is instant
+        images = render_pages(
+            pdf_path,
+            first_page=self.current_page + 1,  # Convert 0 index to 1 index
+            last_page=self.current_page + 1,  # Convert 0 index to 1 index
+        )
+        self.current_image = images.pop()
 
     # Buttons
     def next_pdf(self):
@@ -1,14 +1,31 @@
 import glob
 import logging
 import os
+import threading
 
 import requests
 from firebase_admin import credentials, delete_app, get_app, initialize_app, storage
 
-from lazarus_implementation_tools.config import FIREBASE_KEY, WORKING_FOLDER
+from lazarus_implementation_tools.config import (
+    FIREBASE_CHUNK_SIZE,
+    FIREBASE_KEY,
+    FIREBASE_TRANSFER_WORKERS,
+    WORKING_FOLDER,
+)
+from lazarus_implementation_tools.sync.firebase.transfer import (
+    FirebaseTransferError,
+    TransferResult,
+    run_transfers,
+    verify_file_checksum,
+)
 
 logger = logging.getLogger(__name__)
 
+# Only ask the listing API for what is needed to name the blobs
+LIST_FIELDS = "items(name),prefixes,nextPageToken"
+# Striped by local path, a fixed number so the locks never pile up
+_download_locks = [threading.Lock() for _ in range(64)]
+
 
 class FirebaseStorageManager:
     """A class for managing Firebase storage operations."""
@@ -31,8 +48,11 @@ class FirebaseStorageManager:
             pass
 
         self.storage_url = storage_url
+        self.firebase_credential_path = firebase_credential_path
         self.working_folder = working_folder
         self.bucket = storage.bucket(name=self.storage_url)
+        # The TransferReport of the last upload, download, copy or delete
+        self.last_transfer_report = None
 
     def is_folder(self, blob):
         """Checks if the blob is a folder.
@@ -65,38 +85,100 @@ class FirebaseStorageManager:
         :returns: (list) A list of file paths.
 
         """
-        blobs = self.bucket.list_blobs()
+        # The delimiter makes the server roll subdirectories up instead of listing them
+        blobs = self.bucket.list_blobs(
+            prefix=data_path, delimiter=None if recursive else "/", fields=LIST_FIELDS
+        )
         file_paths = []
         for blob in blobs:
-            if blob.name.startswith(data_path):
-                file_path = blob.name.replace(data_path, "")
-                if not recursive and "/" in file_path:
-                    continue
+            if not blob.name.startswith(data_path):
+                continue
+            file_path = blob.name[len(data_path) :]
+            if not recursive and "/" in file_path:
+                continue
+            file_paths.append(file_path)
+        return list(dict.fromkeys(file_paths))
+
+    def list_folders_in_path(self, data_path):
+        """Lists the folders directly under the specified path.
+
+        :param data_path: (str) The path to list folders from, usually ending in "/".
+
+        :returns: (list) A list of folder paths relative to data_path, ending in "/".
+
+        """
+        blobs = self.bucket.list_blobs(prefix=data_path, delimiter="/", fields=LIST_FIELDS)
+        # Prefixes are only filled in as the pages are read
+        for _ in blobs:
+            pass
+        return sorted(prefix[len(data_path) :] for prefix in blobs.prefixes)
+
+    def run_transfers(self, jobs, transfer, max_workers=FIREBASE_TRANSFER_WORKERS, progress=None):
+        """Runs a transfer over many files in parallel, see transfer.run_transfers.
 
-                file_paths.append(file_path)
-        return list(set(file_paths))
+        The report is kept in last_transfer_report.
 
-    def download_all_files_from_path(self, data_path, local_folder):
+        :param jobs: (list) One job per file, passed to transfer.
+        :param transfer: A function moving the file of a job and returning its
+            TransferResult.
+        :param max_workers: (int) The number of files transferred at once.
+        :param progress: (TransferProgress) Counters to update as files finish.
+
+        :returns: (TransferReport) The result of every job, in order.
+
+        :raises FirebaseTransferError: If some files failed after all their retries.
+
+        """
+        report = run_transfers(jobs, transfer, max_workers=max_workers, progress=progress)
+        self.last_transfer_report = report
+        if report.failed:
+            raise FirebaseTransferError(report)
+        return report
+
+    def download_all_files_from_path(
+        self, data_path, local_folder, max_workers=FIREBASE_TRANSFER_WORKERS, progress=None
+    ):
         """Downloads all files from the specified path to the local folder.
 
         :param data_path: (str) The path to download files from.
         :param local_folder: (str) The local folder to download files to.
+        :param max_workers: (int) The number of files downloaded at once.
+        :param progress: (TransferProgress) Counters to update as files finish.
 
         :returns: (list) A list of tuples containing the original file path and the
             local file path.
 
+        :raises FirebaseTransferError: If some files failed after all their retries.
+
         """
         results = []
         if not os.path.exists(local_folder):
             os.makedirs(local_folder)
 
-        blobs = self.bucket.list_blobs()
+        blobs = self.bucket.list_blobs(prefix=data_path)
+        jobs = {}
         for blob in blobs:
             if not blob.name.startswith(data_path) or self.is_folder(blob):
                 continue
             local_file_path = os.path.join(local_folder, os.path.basename(blob.name))
             results.append((blob.name, local_file_path))
-            blob.download_to_filename(local_file_path)
+            # Files in different subfolders can share a name, like a sequential download
+            # the last one listed wins, without downloading the others for nothing
+            if local_file_path in jobs:
+                logger.warning(
+                    f"{jobs[local_file_path][0].name} and {blob.name} are both downloaded to "
+                    f"{local_file_path}, keeping {blob.name}"
+                )
+            jobs[local_file_path] = (blob, local_file_path)
+
+        def download(job):
+            blob, local_file_path = job
+            size = self.download_blob(blob, local_file_path)
+            return TransferResult(source=blob.name, destination=local_file_path, size=size)
+
+        self.run_transfers(
+            list(jobs.values()), download, max_workers=max_workers, progress=progress
+        )
         return results
 
     def upload_file_to_path(self, data_path, local_file_path):
@@ -111,52 +193,188 @@ class FirebaseStorageManager:
         """
         relative_dir_path = local_file_path.replace(self.working_folder, "").strip("/")
         upload_path = str(os.path.join(data_path, relative_dir_path))
-        blob = self.bucket.blob(upload_path)
-        blob.upload_from_filename(local_file_path)
-        return local_file_path, blob.name
+        return local_file_path, self.upload_file(upload_path, local_file_path)
+
+    def upload_file(self, data_path, local_file_path, chunk_size=FIREBASE_CHUNK_SIZE):
+        """Uploads a file to the exact blob path, verifying its checksum.
+
+        Files larger than a chunk are sent over a resumable session one chunk at a
+        time, so a dropped connection only sends the current chunk again.
+
+        :param data_path: (str) The blob path to upload the file to.
+        :param local_file_path: (str) The local file path to upload.
+        :param chunk_size: (int) The size of the chunks, a multiple of 256 KB.
+
+        :returns: (str) The destination blob name.
+
+        """
+        blob = self.bucket.blob(data_path, chunk_size=chunk_size)
+        blob.upload_from_filename(local_file_path, checksum="crc32c")
+        return blob.name
+
+    def download_file(self, data_path, local_file_path, chunk_size=FIREBASE_CHUNK_SIZE):
+        """Downloads a file to the exact local path, see download_blob.
+
+        :param data_path: (str) The blob path to download.
+        :param local_file_path: (str) The local file path to download to.
+        :param chunk_size: (int) The size of the chunks.
+
+        :returns: (int) The size of the file in bytes.
+
+        :raises FileNotFoundError: If there is no such blob.
+
+        """
+        # Loads the size, checksums and generation the download is checked against
+        blob = self.bucket.get_blob(data_path)
+        if blob is None:
+            raise FileNotFoundError(f"No file at {data_path}")
+        return self.download_blob(blob, local_file_path, chunk_size=chunk_size)
+
+    def download_blob(self, blob, local_file_path, chunk_size=FIREBASE_CHUNK_SIZE):
+        """Downloads a blob in ranged chunks, resuming a partial download.
+
+        The chunks are appended to a ".part" file next to the destination, named after
+        the blob generation. When a download is interrupted, the next attempt continues
+        from the end of that file, unless the blob was replaced in the meantime. The
+        file is checked against the blob checksum before it is moved into place.
+
+        :param blob: (google.cloud.storage.blob.Blob) The blob, with its metadata loaded,
+            eg. from a listing or get_blob.
+        :param local_file_path: (str) The local file path to download to.
+        :param chunk_size: (int) The size of the chunks.
+
+        :returns: (int) The size of the file in bytes.
+
+        :raises FirebaseChecksumError: If the downloaded file does not match the blob.
+
+        """
+        if blob.content_encoding == "gzip":
+            # Served decompressed, so byte ranges and checksums do not line up
+            blob.download_to_filename(local_file_path)
+            return os.path.getsize(local_file_path)
+
+        # Downloads to the same path in this process wait for each other, they would
+        # share a .part file otherwise
+        lock = _download_locks[hash(os.path.abspath(local_file_path)) % len(_download_locks)]
+        with lock:
+            self._download_chunks(blob, local_file_path, chunk_size)
+        return blob.size
+
+    def _download_chunks(self, blob, local_file_path, chunk_size):
+        """Downloads a blob into its .part file and moves it into place, see download_blob."""
+        part_path = f"{local_file_path}.{blob.generation}.part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset:
+            logger.info(f"Resuming download of {blob.name} at {offset} of {blob.size} bytes")
+        with open(part_path, "ab" if offset <= blob.size else "wb") as file:
+            offset = file.tell()
+            while offset < blob.size:
+                end = min(offset + chunk_size, blob.size) - 1
+                blob.download_to_file(
+                    file,
+                    start=offset,
+                    end=end,
+                    raw_download=True,
+                    checksum=None,
+                    if_generation_match=blob.generation,
+                )
+                file.flush()
+                offset = file.tell()
+        try:
+            verify_file_checksum(part_path, blob)
+        except Exception:
+            os.remove(part_path)
+            raise
+        os.replace(part_path, local_file_path)
+
+        # Parts of older generations can't be resumed any more
+        for stale_path in glob.glob(f"{glob.escape(local_file_path)}.*.part"):
+            generation = stale_path[len(local_file_path) + 1 : -len(".part")]
+            if generation.isdigit() and int(generation) < int(blob.generation):
+                os.remove(stale_path)
 
-    def upload_folder_to_path(self, data_path, local_folder, recursive=False):
+    def open_file(self, data_path, mode="rb", chunk_size=FIREBASE_CHUNK_SIZE):
+        """Opens a blob as a file object, streaming it one chunk at a time.
+
+        Readers are pinned to the current generation of the blob, so a blob replaced
+        while it is read raises an error instead of mixing both versions. Writers upload
+        over a resumable session and verify the CRC32C of the whole file on close.
+
+        :param data_path: (str) The blob path.
+        :param mode: (str) "rb", "wb", "r" or "w".
+        :param chunk_size: (int) The size of the chunks, a multiple of 256 KB.
+
+        :returns: A file object, best used as a context manager.
+
+        :raises FileNotFoundError: If the blob is opened for reading and does not exist.
+
+        """
+        if "r" in mode:
+            blob = self.bucket.get_blob(data_path)
+            if blob is None:
+                raise FileNotFoundError(f"No file at {data_path}")
+            return blob.open(mode, chunk_size=chunk_size, if_generation_match=blob.generation)
+        blob = self.bucket.blob(data_path)
+        return blob.open(mode, chunk_size=chunk_size, checksum="crc32c")
+
+    def upload_folder_to_path(
+        self,
+        data_path,
+        local_folder,
+        recursive=False,
+        max_workers=FIREBASE_TRANSFER_WORKERS,
+        progress=None,
+    ):
         """Uploads a folder to the specified path.
 
         :param data_path: (str) The path to upload the folder to.
         :param local_folder: (str) The local folder to upload.
         :param recursive: (bool) If True, upload subdirectories; otherwise, only upload
             files in the specified directory.
+        :param max_workers: (int) The number of files uploaded at once.
+        :param progress: (TransferProgress) Counters to update as files finish.
 
         :returns: (list) A list of tuples containing the input file path and the
             destination blob name.
 
+        :raises FirebaseTransferError: If some files failed after all their retries.
+
         """
-        results = []
         if not os.path.exists(local_folder):
-            return results
+            return []
 
         files = glob.glob(f"{local_folder}/**", recursive=recursive)
-        for file in files:
-            if file.startswith("."):
-                continue
-            if not os.path.isfile(file):
-                continue
+        files = [file for file in files if not file.startswith(".") and os.path.isfile(file)]
+
+        def upload(file):
             input_file, destination = self.upload_file_to_path(data_path, file)
-            results.append((input_file, destination))
-        return results
+            return TransferResult(
+                source=input_file, destination=destination, size=os.path.getsize(input_file)
+            )
 
-    def delete_files_in_path(self, data_path):
+        report = self.run_transfers(files, upload, max_workers=max_workers, progress=progress)
+        return [(result.source, result.destination) for result in report.results]
+
+    def delete_files_in_path(self, data_path, max_workers=FIREBASE_TRANSFER_WORKERS):
         """Deletes all files in the specified path.
 
         :param data_path: (str) The path to delete files from.
+        :param max_workers: (int) The number of files deleted at once.
 
         :returns: (list) A list of deleted file names.
 
+        :raises FirebaseTransferError: If some files failed after all their retries.
+
         """
-        results = []
-        blobs = self.bucket.list_blobs()
-        for blob in blobs:
-            if not blob.name.startswith(data_path):
-                continue
-            results.append(blob.name)
+        blobs = self.bucket.list_blobs(prefix=data_path, fields=LIST_FIELDS)
+        blobs = [blob for blob in blobs if blob.name.startswith(data_path)]
+
+        def delete(blob):
             blob.delete()
-        return results
+            return TransferResult(source=blob.name)
+
+        self.run_transfers(blobs, delete, max_workers=max_workers)
+        return [blob.name for blob in blobs]
 
     def get_presigned_url(self, data_path, expiration=3600):
         """Generates a presigned URL for accessing a file.
@@ -170,14 +388,11 @@ class FirebaseStorageManager:
         if data_path.endswith("/"):
             return None
 
-        presigned_url = None
-        bucket = storage.bucket(self.storage_url)
-        blobs = bucket.list_blobs()
-        for blob in blobs:
-            if not blob.name == data_path:
-                continue
-            presigned_url = blob.generate_signed_url(version="v4", expiration=expiration)
-        return presigned_url
+        # A single metadata request, None if there is no such blob
+        blob = self.bucket.get_blob(data_path)
+        if blob is None:
+            return None
+        return blob.generate_signed_url(version="v4", expiration=expiration)
 
     # Read content of a file from a presigned URL
     def read_file_from_presigned_url(self, presigned_url):
@@ -198,31 +413,70 @@ class FirebaseStorageManager:
         except requests.exceptions.RequestException as e:
             return {"error": str(e)}, 500
 
-    def copy_files(self, data_path, destination_folder):
+    def copy_file(self, source_path, destination_path, destination_bucket=None):
+        """Copies a file inside Cloud Storage, without downloading it.
+
+        Rewrites are used rather than a single copy call so that large files, or files
+        copied between locations or storage classes, are copied over several calls
+        instead of timing out.
+
+        :param source_path: (str) The path of the file to copy.
+        :param destination_path: (str) The path to copy the file to.
+        :param destination_bucket: (google.cloud.storage.bucket.Bucket) The bucket to
+            copy the file to, the same bucket by default.
+
+        :returns: (int) The size of the file in bytes.
+
+        """
+        destination_bucket = destination_bucket or self.bucket
+        source_blob = self.bucket.blob(source_path)
+        destination_blob = destination_bucket.blob(destination_path)
+        token, bytes_rewritten, total_bytes = destination_blob.rewrite(source_blob)
+        while token is not None:
+            token, bytes_rewritten, total_bytes = destination_blob.rewrite(source_blob, token=token)
+        return total_bytes
+
+    def copy_files(
+        self,
+        data_path,
+        destination_folder,
+        max_workers=FIREBASE_TRANSFER_WORKERS,
+        destination_storage_url=None,
+    ):
         """Copies files from the specified path to a destination folder.
 
+        The files are copied by Cloud Storage itself, so only metadata requests go
+        through this process.
+
         :param data_path: (str) The path to copy files from.
         :param destination_folder: (str) The destination folder to copy files to.
+        :param max_workers: (int) The number of files copied at once.
+        :param destination_storage_url: (str) The bucket to copy the files to, the same
+            bucket by default.
 
         :returns: (list) A list of tuples containing the source file name and the
             destination file name.
 
-        """
-        results = []
-        destination_bucket = storage.bucket(name=self.storage_url)
-
-        blobs = self.bucket.list_blobs(prefix=data_path)
-        for blob in blobs:
-            if not blob.name.startswith(data_path):
-                continue
-
-            source_blob_name = blob.name[len(data_path) :]
-            source_blob = self.bucket.blob(blob.name)
-            destination_blob_name = f"{destination_folder}{source_blob_name}"
-            destination_blob = destination_bucket.blob(destination_blob_name)
-            destination_blob.upload_from_string(source_blob.download_as_bytes())
-            results.append((source_blob_name, destination_blob_name))
+        :raises FirebaseTransferError: If some files failed after all their retries.
 
+        """
+        destination_bucket = self.bucket
+        if destination_storage_url and destination_storage_url != self.storage_url:
+            destination_bucket = storage.bucket(name=destination_storage_url)
+
+        blobs = self.bucket.list_blobs(prefix=data_path, fields=LIST_FIELDS)
+        names = [blob.name for blob in blobs if blob.name.startswith(data_path)]
+        results = [
+            (name[len(data_path) :], f"{destination_folder}{name[len(data_path) :]}")
+            for name in names
+        ]
+
+        def copy(job):
+            name, (_, destination_blob_name) = job
+            size = self.copy_file(name, destination_blob_name, destination_bucket)
+            return TransferResult(source=name, destination=destination_blob_name, size=size)
+
+        self.run_transfers(list(zip(names, results)), copy, max_workers=max_workers)
         return results
 
     # Close the Firebase connection
@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from lazarus_implementation_tools.config import CACHE_FOLDER, FIREBASE_TRANSFER_WORKERS
+from lazarus_implementation_tools.sync.firebase.client import FirebaseStorageManager
+from lazarus_implementation_tools.sync.firebase.transfer import (
+    TransferReport,
+    TransferResult,
+    get_file_checksums,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when the manifest entries change shape
+MANIFEST_VERSION = 1
+# Only ask the listing API for what is needed to compare the blobs
+SYNC_LIST_FIELDS = "items(name,size,md5Hash,crc32c),nextPageToken"
+SYNC_DIRECTIONS = ("upload", "download")
+
+
+class FileState(BaseModel):
+    """The size and checksums of a local file or a blob, as Cloud Storage reports them."""
+
+    size: int
+    md5_hash: Optional[str] = None
+    crc32c: Optional[str] = None
+    # Local files only, to tell if the file changed since it was hashed
+    mtime_ns: Optional[int] = None
+
+    def matches(self, other: "FileState") -> bool:
+        """Checks if two files have the same content.
+
+        MD5 is compared when both sides have it, composite blobs only have a CRC32C.
+
+        :param other: (FileState) The other file.
+
+        :returns: (bool) True if the contents are the same.
+
+        """
+        if self.size != other.size:
+            return False
+        if self.md5_hash and other.md5_hash:
+            return self.md5_hash == other.md5_hash
+        if self.crc32c and other.crc32c:
+            return self.crc32c == other.crc32c
+        return True
+
+
+class SyncReport(BaseModel):
+    """What a sync changed, with paths relative to the synced folders."""
+
+    transferred: List[str] = []
+    deleted: List[str] = []
+    unchanged: int = 0
+    transfer_report: Optional[TransferReport] = None
+
+
+def get_manifest_path(storage_url: str, firebase_path: str, local_folder: str) -> str:
+    """Returns where the manifest of a synced folder is kept.
+
+    :param storage_url: (str) The URL of the Firebase storage bucket.
+    :param firebase_path: (str) The Firebase prefix the folder is synced with.
+    :param local_folder: (str) The local folder.
+
+    :returns: (str) The manifest path.
+
+    """
+    key = f"{storage_url}:{firebase_path}:{os.path.abspath(local_folder)}"
+    name = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(CACHE_FOLDER, "firebase_sync", f"{name}.json")
+
+
+def load_manifest(manifest_path: str) -> Dict[str, FileState]:
+    """Loads the states the local files had when they were last hashed.
+
+    :param manifest_path: (str) The manifest path.
+
+    :returns: (Dict[str, FileState]) The states by relative path, empty if the manifest
+        is missing or unreadable.
+
+    """
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return {path: FileState(**state) for path, state in manifest["files"].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def save_manifest(manifest_path: str, files: Dict[str, FileState]):
+    """Saves the states of the local files, replacing the manifest atomically.
+
+    :param manifest_path: (str) The manifest path.
+    :param files: (Dict[str, FileState]) The states by relative path.
+
+    """
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "files": {path: state.model_dump() for path, state in files.items()},
+    }
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file)
+    os.replace(temp_path, manifest_path)
+
+
+def is_hidden(relative_path: str) -> bool:
+    """Checks if a path is in a hidden folder or is a hidden file, eg. the cache.
+
+    :param relative_path: (str) The path relative to the synced folder.
+
+    :returns: (bool) True if the path should not be synced.
+
+    """
+    return any(part.startswith(".") for part in relative_path.split("/"))
+
+
+def get_local_files(
+    local_folder: str, manifest: Dict[str, FileState], max_workers: int
+) -> Dict[str, FileState]:
+    """Lists the local files with their checksums.
+
+    Files whose size and modification time match the manifest are not hashed again.
+
+    :param local_folder: (str) The local folder.
+    :param manifest: (Dict[str, FileState]) The states from the last sync.
+    :param max_workers: (int) The number of files hashed at once.
+
+    :returns: (Dict[str, FileState]) The states by relative path.
+
+    """
+    files = {}
+    to_hash = []
+    for root, folders, names in os.walk(local_folder):
+        folders[:] = [folder for folder in folders if not folder.startswith(".")]
+        for name in names:
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, local_folder).replace(os.sep, "/")
+            stat = os.stat(path)
+            known = manifest.get(relative_path)
+            if known and known.size == stat.st_size and known.mtime_ns == stat.st_mtime_ns:
+                files[relative_path] = known
+            else:
+                to_hash.append((relative_path, path, stat))
+
+    def hash_file(job):
+        relative_path, path, stat = job
+        md5_hash, crc32c = get_file_checksums(path)
+        return FileState(
+            size=stat.st_size, md5_hash=md5_hash, crc32c=crc32c, mtime_ns=stat.st_mtime_ns
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for (relative_path, _, _), state in zip(to_hash, executor.map(hash_file, to_hash)):
+            files[relative_path] = state
+    if to_hash:
+        logger.debug(f"Hashed {len(to_hash)} of {len(files)} local files")
+    return files
+
+
+def get_remote_files(firebase_manager: FirebaseStorageManager, prefix: str) -> Dict[str, FileState]:
+    """Lists the blobs under a prefix with their checksums.
+
+    :param firebase_manager: (FirebaseStorageManager) The manager of the bucket.
+    :param prefix: (str) The Firebase prefix, ending in "/".
+
+    :returns: (Dict[str, FileState]) The states by path relative to the prefix.
+
+    """
+    files = {}
+    for blob in firebase_manager.bucket.list_blobs(prefix=prefix, fields=SYNC_LIST_FIELDS):
+        if not blob.name.startswith(prefix) or firebase_manager.is_folder(blob):
+            continue
+        relative_path = blob.name[len(prefix) :]
+        if is_hidden(relative_path):
+            continue
+        files[relative_path] = FileState(
+            size=blob.size or 0, md5_hash=blob.md5_hash, crc32c=blob.crc32c
+        )
+    return files
+
+
+def sync_folder(
+    firebase_manager: FirebaseStorageManager,
+    local_folder: str,
+    firebase_path: str,
+    direction: str = "upload",
+    delete_missing: bool = False,
+    max_workers: int = FIREBASE_TRANSFER_WORKERS,
+    dry_run: bool = False,
+) -> SyncReport:
+    """Makes a Firebase prefix match a local folder, or the other way around.
+
+    Like rsync, only files that are new or whose size or checksum changed are
+    transferred. Local checksums are kept in a manifest in the cache folder, so
+    unchanged files are not read again on the next sync. Hidden files and folders are
+    skipped.
+
+    :param firebase_manager: (FirebaseStorageManager) The manager of the bucket.
+    :param local_folder: (str) The local folder.
+    :param firebase_path: (str) The Firebase prefix.
+    :param direction: (str) "upload" to update Firebase from the local folder, or
+        "download" to update the local folder from Firebase.
+    :param delete_missing: (bool) If True, also delete files missing from the source.
+    :param max_workers: (int) The number of files hashed or transferred at once.
+    :param dry_run: (bool) If True, only report what would change.
+
+    :returns: (SyncReport) The files transferred and deleted.
+
+    :raises ValueError: If the direction is not "upload" or "download", or if
+        delete_missing is set for the root of the bucket.
+    :raises FirebaseTransferError: If some files failed after all their retries.
+
+    """
+    if direction not in SYNC_DIRECTIONS:
+        raise ValueError(f"direction must be one of {SYNC_DIRECTIONS}, got {direction!r}")
+    download = direction == "download"
+    prefix = firebase_path.rstrip("/") + "/" if firebase_path.strip("/") else ""
+    if delete_missing and not prefix:
+        # Would delete everything in the bucket that isn't in the local folder
+        raise ValueError("delete_missing can't be used to sync the root of the bucket")
+    os.makedirs(local_folder, exist_ok=True)
+    manifest_path = get_manifest_path(firebase_manager.storage_url, prefix, local_folder)
+    local_files = get_local_files(local_folder, load_manifest(manifest_path), max_workers)
+    remote_files = get_remote_files(firebase_manager, prefix)
+
+    if download:
+        source_files, destination_files = remote_files, local_files
+    else:
+        source_files, destination_files = local_files, remote_files
+    changed = [
+        path
+        for path, state in source_files.items()
+        if path not in destination_files or not state.matches(destination_files[path])
+    ]
+    deleted = sorted(set(destination_files) - set(source_files)) if delete_missing else []
+    report = SyncReport(
+        transferred=sorted(changed), deleted=deleted, unchanged=len(source_files) - len(changed)
+    )
+    logger.info(
+        f"Sync of {local_folder} {'from' if download else 'to'} {prefix}: "
+        f"{len(changed)} changed, {len(deleted)} to delete, {report.unchanged} unchanged"
+    )
+    if dry_run:
+        return report
+
+    def upload_file(relative_path):
+        blob_name = firebase_manager.upload_file(
+            prefix + relative_path, os.path.join(local_folder, relative_path)
+        )
+        return TransferResult(
+            source=relative_path, destination=blob_name, size=local_files[relative_path].size
+        )
+
+    def download_file(relative_path):
+        local_path = os.path.join(local_folder, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        # Downloaded under a hidden name, so an interrupted download is never synced
+        # and is resumed by the next sync
+        temp_path = os.path.join(os.path.dirname(local_path), f".{os.path.basename(local_path)}")
+        firebase_manager.download_file(prefix + relative_path, temp_path)
+        os.replace(temp_path, local_path)
+        remote = remote_files[relative_path]
+        stat = os.stat(local_path)
+        local_files[relative_path] = remote.model_copy(
+            update={"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        )
+        return TransferResult(
+            source=prefix + relative_path, destination=local_path, size=remote.size
+        )
+
+    def delete_file(relative_path):
+        if download:
+            os.remove(os.path.join(local_folder, *relative_path.split("/")))
+            local_files.pop(relative_path, None)
+        else:
+            firebase_manager.bucket.blob(prefix + relative_path).delete()
+        return TransferResult(source=relative_path)
+
+    try:
+        transfer = download_file if download else upload_file
+        report.transfer_report = firebase_manager.run_transfers(
+            report.transferred, transfer, max_workers=max_workers
+        )
+        if deleted:
+            firebase_manager.run_transfers(deleted, delete_file, max_workers=max_workers)
+    finally:
+        # Keep the hashes of what is known, even when some transfers failed
+        save_manifest(manifest_path, local_files)
+    return report
@@ -0,0 +1,241 @@
+import base64
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import google_crc32c
+from google.api_core import exceptions
+from pydantic import BaseModel
+
+from lazarus_implementation_tools.config import (
+    FIREBASE_TRANSFER_RETRIES,
+    FIREBASE_TRANSFER_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry, doubled for every retry after it
+RETRY_DELAY = 0.5
+# Client errors that are worth retrying (timeout, rate limit), other 4xx fail at once
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+class FirebaseTransferError(Exception):
+    """Raised when some files of a transfer failed after all their retries."""
+
+    def __init__(self, report: "TransferReport"):
+        self.report = report
+        super().__init__(
+            f"{len(report.failed)} of {len(report.results)} files failed, "
+            f"first error: {report.failed[0].error}"
+        )
+
+
+class FirebaseChecksumError(Exception):
+    """Raised when a transferred file does not match the checksum of its blob."""
+
+    pass
+
+
+class TransferResult(BaseModel):
+    """The outcome of transferring one file."""
+
+    source: str
+    destination: str = ""
+    size: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+class TransferReport(BaseModel):
+    """The outcome of a transfer, with one result per file in the order given."""
+
+    results: List[TransferResult] = []
+    seconds: float = 0.0
+
+    @property
+    def failed(self) -> List[TransferResult]:
+        """Files that could not be transferred."""
+        return [result for result in self.results if result.error]
+
+    @property
+    def transferred_bytes(self) -> int:
+        """The size of the files that were transferred."""
+        return sum(result.size for result in self.results if not result.error)
+
+    @property
+    def bytes_per_second(self) -> float:
+        """The average throughput of the transfer."""
+        return self.transferred_bytes / self.seconds if self.seconds else 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        """The average number of files transferred per second."""
+        done = len(self.results) - len(self.failed)
+        return done / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        """Describes the transfer in a line, eg. for logging.
+
+        :returns: (str) The summary.
+
+        """
+        done = len(self.results) - len(self.failed)
+        return (
+            f"{done} files ({self.transferred_bytes / 1024 / 1024:.1f} MB) in "
+            f"{self.seconds:.1f}s, {self.bytes_per_second / 1024 / 1024:.2f} MB/s, "
+            f"{self.files_per_second:.1f} files/s, {len(self.failed)} failed"
+        )
+
+
+class TransferProgress:
+    """Thread safe counters of the files and bytes a transfer has moved so far."""
+
+    def __init__(
+        self,
+        files_total: int = 0,
+        bytes_total: int = 0,
+        callback: Optional[Callable[["TransferProgress"], Any]] = None,
+    ):
+        """Initializes the counters.
+
+        :param files_total: (int) The number of files to transfer.
+        :param bytes_total: (int) The number of bytes to transfer, if known.
+        :param callback: Called with the progress after every file.
+
+        """
+        self.files_total = files_total
+        self.bytes_total = bytes_total
+        self.files_done = 0
+        self.bytes_done = 0
+        self.files_failed = 0
+        self.callback = callback
+        self._lock = threading.Lock()
+
+    def add(self, result: TransferResult):
+        """Counts a finished file.
+
+        :param result: (TransferResult) The outcome of the file.
+
+        """
+        with self._lock:
+            if result.error:
+                self.files_failed += 1
+            else:
+                self.files_done += 1
+                self.bytes_done += result.size
+        if self.callback:
+            self.callback(self)
+
+
+def run_transfers(
+    jobs: Iterable[Any],
+    transfer: Callable[[Any], TransferResult],
+    max_workers: int = FIREBASE_TRANSFER_WORKERS,
+    retries: int = FIREBASE_TRANSFER_RETRIES,
+    progress: Optional[TransferProgress] = None,
+) -> TransferReport:
+    """Runs a transfer function over many files with a pool of threads.
+
+    Transfers are network bound, so a pool of threads keeps the link busy instead of
+    waiting for one round trip at a time. Each file is retried with a growing delay
+    when it fails with a transient error.
+
+    :param jobs: (Iterable) One job per file, passed to transfer.
+    :param transfer: A function moving the file of a job and returning its
+        TransferResult, without error or attempts filled in. Exceptions it raises are
+        retried or recorded.
+    :param max_workers: (int) The number of files transferred at once.
+    :param retries: (int) The number of times a failing file is tried again.
+    :param progress: (TransferProgress) Counters to update as files finish.
+
+    :returns: (TransferReport) The result of every job, in order.
+
+    """
+    jobs = list(jobs)
+    if progress is not None and not progress.files_total:
+        progress.files_total = len(jobs)
+
+    def run(job) -> TransferResult:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = transfer(job)
+                result.attempts = attempt
+                break
+            except Exception as e:
+                if attempt > retries or not is_retryable(e):
+                    result = TransferResult(
+                        source=str(job), attempts=attempt, error=str(e) or type(e).__name__
+                    )
+                    logger.info(f"Transfer of {job} failed: {result.error}")
+                    break
+                logger.debug(f"Retrying transfer of {job} after: {e}")
+                time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+        if progress is not None:
+            progress.add(result)
+        return result
+
+    start = time.monotonic()
+    if max_workers <= 1 or len(jobs) <= 1:
+        results = [run(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+            results = list(executor.map(run, jobs))
+    report = TransferReport(results=results, seconds=time.monotonic() - start)
+    if jobs:
+        logger.info(f"Transferred {report.summary()}")
+    return report
+
+
+def is_retryable(error: Exception) -> bool:
+    """Checks if a failed transfer may succeed when tried again.
+
+    :param error: (Exception) The error the transfer failed with.
+
+    :returns: (bool) False for client errors like a missing file or a denied request,
+        True otherwise.
+
+    """
+    if isinstance(error, exceptions.ClientError):
+        return error.code in RETRYABLE_CLIENT_ERRORS
+    return not isinstance(error, (FileNotFoundError, PermissionError, IsADirectoryError))
+
+
+def get_file_checksums(file_path: str) -> Tuple[str, str]:
+    """Computes the checksums Cloud Storage keeps for a file, in one read.
+
+    :param file_path: (str) The file path.
+
+    :returns: (Tuple[str, str]) The base64 encoded MD5 and CRC32C of the file.
+
+    """
+    md5 = hashlib.md5()
+    crc32c = google_crc32c.Checksum()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            md5.update(chunk)
+            crc32c.update(chunk)
+    return base64.b64encode(md5.digest()).decode(), base64.b64encode(crc32c.digest()).decode()
+
+
+def verify_file_checksum(file_path: str, blob):
+    """Checks that a downloaded file has the content of its blob.
+
+    CRC32C is compared, or MD5 for blobs without one.
+
+    :param file_path: (str) The downloaded file.
+    :param blob: (google.cloud.storage.blob.Blob) The blob, with its metadata loaded.
+
+    :raises FirebaseChecksumError: If the file does not match the blob.
+
+    """
+    md5_hash, crc32c = get_file_checksums(file_path)
+    if blob.crc32c and blob.crc32c != crc32c:
+        raise FirebaseChecksumError(f"CRC32C of {file_path} does not match {blob.name}")
+    if not blob.crc32c and blob.md5_hash and blob.md5_hash != md5_hash:
+        raise FirebaseChecksumError(f"MD5 of {file_path} does not match {blob.name}")
@@ -1,12 +1,70 @@
 import os.path
+import threading
+from typing import Dict
 
 from lazarus_implementation_tools.config import (
     DOWNLOAD_FOLDER,
+    FIREBASE_KEY,
     FIREBASE_PERSONAL_ROOT_FOLDER,
     FIREBASE_STORAGE_URL,
+    FIREBASE_TRANSFER_WORKERS,
     WORKING_FOLDER,
 )
 from lazarus_implementation_tools.sync.firebase.client import FirebaseStorageManager
+from lazarus_implementation_tools.sync.firebase.sync import sync_folder
+
+_firebase_managers: Dict[str, FirebaseStorageManager] = {}
+_firebase_managers_lock = threading.Lock()
+
+
+def get_firebase_manager(
+    storage_url=FIREBASE_STORAGE_URL, firebase_credential_path=FIREBASE_KEY
+) -> FirebaseStorageManager:
+    """Returns a shared FirebaseStorageManager, created on first use.
+
+    Creating a manager reads the credentials and sets up a bucket handle, so one is
+    kept per bucket and reused by every call, from any thread. Every manager talks
+    through the default Firebase app, which is set up with the first credentials used,
+    so asking for other credentials is an error rather than silently ignored.
+
+    :param storage_url: (str) The URL of the Firebase storage bucket.
+    :param firebase_credential_path: (str) The path to the json file that provides
+        credentials to firebase.
+
+    :returns: (FirebaseStorageManager) The manager of the bucket.
+
+    :raises ValueError: If the shared managers use other credentials.
+
+    """
+    firebase_manager = _firebase_managers.get(storage_url)
+    if firebase_manager is None:
+        with _firebase_managers_lock:
+            firebase_manager = _firebase_managers.get(storage_url)
+            if firebase_manager is None:
+                for other_manager in _firebase_managers.values():
+                    _check_credentials(other_manager, firebase_credential_path)
+                firebase_manager = FirebaseStorageManager(
+                    storage_url, firebase_credential_path=firebase_credential_path
+                )
+                _firebase_managers[storage_url] = firebase_manager
+    _check_credentials(firebase_manager, firebase_credential_path)
+    return firebase_manager
+
+
+def _check_credentials(firebase_manager: FirebaseStorageManager, firebase_credential_path):
+    if firebase_manager.firebase_credential_path != firebase_credential_path:
+        raise ValueError(
+            f"Firebase is already set up with {firebase_manager.firebase_credential_path}, "
+            f"not {firebase_credential_path}, call clear_firebase_managers first"
+        )
+
+
+def clear_firebase_managers():
+    """Forgets the shared managers and closes the Firebase app, eg. to switch credentials."""
+    with _firebase_managers_lock:
+        if _firebase_managers:
+            next(iter(_firebase_managers.values())).close_connection()
+        _firebase_managers.clear()
 
 
 def list_files(firebase_path=FIREBASE_PERSONAL_ROOT_FOLDER, recursive=False):
@@ -19,10 +77,22 @@ def list_files(firebase_path=FIREBASE_PERSONAL_ROOT_FOLDER, recursive=False):
     :returns: (list) A list of file paths.
 
     """
-    firebase_manager = FirebaseStorageManager(FIREBASE_STORAGE_URL)
+    firebase_manager = get_firebase_manager()
     return firebase_manager.list_all_files_in_path(firebase_path, recursive=recursive)
 
 
+def list_folders(firebase_path=FIREBASE_PERSONAL_ROOT_FOLDER):
+    """Lists the folders directly under the specified Firebase path.
+
+    :param firebase_path: (str) The Firebase path to list folders from.
+
+    :returns: (list) A list of folder paths, ending in "/".
+
+    """
+    firebase_manager = get_firebase_manager()
+    return firebase_manager.list_folders_in_path(firebase_path)
+
+
 def file_exists(firebase_path):
     """Checks if a file or folder exists in the specified Firebase path.
 
@@ -31,7 +101,7 @@ def file_exists(firebase_path):
     :returns: (bool) True if the file or folder exists, False otherwise.
 
     """
-    firebase_manager = FirebaseStorageManager(FIREBASE_STORAGE_URL)
+    firebase_manager = get_firebase_manager()
     return firebase_manager.exists(firebase_path)
 
 
@@ -47,7 +117,7 @@ def upload(local_path=WORKING_FOLDER, firebase_path=FIREBASE_PERSONAL_ROOT_FOLDE
         blob name.
 
     """
-    firebase_manager = FirebaseStorageManager(FIREBASE_STORAGE_URL)
+    firebase_manager = get_firebase_manager()
     if os.path.isdir(local_path):
         return firebase_manager.upload_folder_to_path(
             firebase_path, local_path, recursive=recursive
@@ -66,7 +136,7 @@ def download(local_path=DOWNLOAD_FOLDER, firebase_path=FIREBASE_PERSONAL_ROOT_FO
         file path.
 
     """
-    firebase_manager = FirebaseStorageManager(FIREBASE_STORAGE_URL)
+    firebase_manager = get_firebase_manager()
     return firebase_manager.download_all_files_from_path(firebase_path, local_path)
 
 
@@ -81,7 +151,7 @@ def copy(firebase_source_path, firebase_destination_path):
         destination file name.
 
     """
-    firebase_manager = FirebaseStorageManager(FIREBASE_STORAGE_URL)
+    firebase_manager = get_firebase_manager()
     return firebase_manager.copy_files(firebase_source_path, firebase_destination_path)
 
 
@@ -93,7 +163,7 @@ def delete(firebase_path):
     :returns: (list) A list of deleted file names.
 
     """
-    firebase_manager = FirebaseStorageManager(FIREBASE_STORAGE_URL)
+    firebase_manager = get_firebase_manager()
     return firebase_manager.delete_files_in_path(firebase_path)
 
 
@@ -106,5 +176,38 @@ def get_url(firebase_path):
 
     """
     firebase_path = os.path.join(FIREBASE_PERSONAL_ROOT_FOLDER, firebase_path)
-    firebase_manager = FirebaseStorageManager(FIREBASE_STORAGE_URL)
+    firebase_manager = get_firebase_manager()
     return firebase_manager.get_presigned_url(firebase_path)
+
+
+def sync(
+    local_path=WORKING_FOLDER,
+    firebase_path=FIREBASE_PERSONAL_ROOT_FOLDER,
+    direction="upload",
+    delete_missing=False,
+    max_workers=FIREBASE_TRANSFER_WORKERS,
+    dry_run=False,
+):
+    """Syncs a local folder with a Firebase path, transferring only changed files.
+
+    :param local_path: (str) The local folder to sync.
+    :param firebase_path: (str) The Firebase path to sync with.
+    :param direction: (str) "upload" to update Firebase from the local folder, or
+        "download" to update the local folder from Firebase.
+    :param delete_missing: (bool) If True, also delete files missing from the source.
+        Not allowed when syncing the root of the bucket.
+    :param max_workers: (int) The number of files hashed or transferred at once.
+    :param dry_run: (bool) If True, only report what would change.
+
+    :returns: (SyncReport) The files transferred and deleted.
+
+    """
+    return sync_folder(
+        get_firebase_manager(),
+        local_path,
+        firebase_path,
+        direction=direction,
+        delete_missing=delete_missing,
+        max_workers=max_workers,
+        dry_run=dry_run,
+    )
@@ -0,0 +1,77 @@
+import hashlib
+import logging
+import os
+import zipfile
+from io import BytesIO
+from typing import Hashable, Optional
+
+from lazarus_implementation_tools.config import CACHE_FOLDER, OCR_CACHE_SIZE_MB
+from lazarus_implementation_tools.file_system.cache import FileCache
+from lazarus_implementation_tools.transformations.ocr.results import OcrResults
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached results change shape
+OCR_CACHE_VERSION = 1
+
+_ocr_cache = None  # type: Optional[FileCache]
+
+
+def get_ocr_cache() -> FileCache:
+    """Returns the cache the OCR results of single pages are kept in.
+
+    :returns: (FileCache) The OCR cache.
+
+    """
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = FileCache(
+            os.path.join(CACHE_FOLDER, "ocr"), max_size=OCR_CACHE_SIZE_MB * 1024 * 1024
+        )
+    return _ocr_cache
+
+
+def get_ocr_cache_key(pdf_key: str, page_number: int, dpi: int, settings: Hashable) -> str:
+    """Builds the cache key for the OCR results of a page.
+
+    :param pdf_key: (str) The content hash of the PDF, see get_pdf_key.
+    :param page_number: (int) The page number.
+    :param dpi: (int) The resolution the page was rendered at.
+    :param settings: Everything else the results depend on, like the reader languages
+        and settings.
+
+    :returns: (str) The cache key.
+
+    """
+    key = f"{OCR_CACHE_VERSION}:{pdf_key}:{page_number}:{dpi}:{settings!r}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_cached_page(cache_key: str) -> Optional[OcrResults]:
+    """Looks up the OCR results of a page.
+
+    :param cache_key: (str) The cache key, see get_ocr_cache_key.
+
+    :returns: (Optional[OcrResults]) The results of the page, or None on a miss.
+
+    """
+    path = get_ocr_cache().get(cache_key, "npz")
+    if path is None:
+        return None
+    try:
+        return OcrResults.load(path)
+    except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+        # Evicted or written by an older version, read the page again
+        return None
+
+
+def cache_page(cache_key: str, results: OcrResults):
+    """Stores the OCR results of a page.
+
+    :param cache_key: (str) The cache key, see get_ocr_cache_key.
+    :param results: (OcrResults) The results of the page.
+
+    """
+    buffer = BytesIO()
+    results.save(buffer)
+    get_ocr_cache().put_bytes(cache_key, buffer.getvalue(), "npz")
@@ -0,0 +1,38 @@
+from lazarus_implementation_tools.general.pydantic_models import BoundingBox
+
+
+def format_ocr_results(results, page_number):
+    """Formats the OCR results for each page.
+
+    :param results: (list) A list of tuples containing OCR results for a single page.
+    :param page_number: (int) The page number.
+
+    :returns: (list) A list of dictionaries containing the OCR data, confidence, and
+        bounding box.
+
+    """
+    # Example of incoming results:
+    #     (
+    #         [
+    #             [np.int32(1052), np.int32(285)],
+    #             [np.int32(1661), np.int32(285)],
+    #             [np.int32(1661), np.int32(386)],
+    #             [np.int32(1052), np.int32(386)]
+    #         ],
+    #         'LAZARUS',
+    #         np.float64(0.9106397069581507)
+    #     ),
+    output = []
+    for result in results:
+        coordinates = result[0]
+        data = result[1]
+        confidence = float(result[2])
+        box_values = {
+            "top_left_x": int(coordinates[0][0]),
+            "top_left_y": int(coordinates[0][1]),
+            "bottom_right_x": int(coordinates[2][0]),
+            "bottom_right_y": int(coordinates[2][1]),
+        }
+        box = BoundingBox(page_number=page_number, box=box_values)
+        output.append({"data": data, "confidence": confidence, "bounding_box": box.model_dump()})
+    return output
@@ -1,76 +1,316 @@
+import gc
+import logging
+import os
+import threading
 import warnings
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
 
 import easyocr
+import numpy as np
 
-from lazarus_implementation_tools.file_system.utils import (
-    get_all_files_with_ext,
-    get_extension,
-    get_filename,
+from lazarus_implementation_tools.config import (
+    OCR_CACHE,
+    OCR_MAX_TILES,
+    OCR_TILE_OVERLAP,
+    OCR_TILE_PAGE_SIZE,
+    OCR_TILE_SIZE,
+    PDF_RENDER_THREADS,
 )
-from lazarus_implementation_tools.general.pydantic_models import BoundingBox
-from lazarus_implementation_tools.transformations.pdf.utils import convert_pdf_to_images
+from lazarus_implementation_tools.file_system.utils import mkdir
+from lazarus_implementation_tools.transformations.ocr.cache import (
+    cache_page,
+    get_cached_page,
+    get_ocr_cache_key,
+)
+from lazarus_implementation_tools.transformations.ocr.core import format_ocr_results
+from lazarus_implementation_tools.transformations.ocr.results import OcrResults
+from lazarus_implementation_tools.transformations.ocr.tiling import needs_tiling, read_tiled
+from lazarus_implementation_tools.transformations.pdf.render import (
+    get_page_runs,
+    get_pdf_key,
+    iter_rendered_pages,
+)
+from lazarus_implementation_tools.transformations.pdf.utils import (
+    get_image_folder,
+    get_number_of_pages,
+    get_page_image_name,
+)
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LANGUAGES = ("en",)
+
+_readers: Dict[Tuple, easyocr.Reader] = {}
+_reader_locks: Dict[Tuple, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_reader_key(languages: Iterable[str] = DEFAULT_LANGUAGES, **settings) -> Tuple:
+    """Builds the registry key for a reader.
+
+    :param languages: (Iterable[str]) The languages the reader recognizes.
+    :param settings: Keyword arguments passed to easyocr.Reader, eg. gpu=False.
+
+    :returns: (tuple) The registry key.
+
+    """
+    return tuple(languages), tuple(sorted(settings.items()))
+
 
+def get_reader(languages: Iterable[str] = DEFAULT_LANGUAGES, **settings) -> easyocr.Reader:
+    """Returns the shared EasyOCR reader for a language list and settings.
 
-def format_ocr_results(results, page_number):
-    """Formats the OCR results for each page.
+    Readers are created on first use and kept for the life of the process, so the model
+    weights are only loaded once. Safe to call from several threads, a reader being
+    loaded by one thread is waited for by the others.
 
-    :param results: (list) A list of tuples containing OCR results for a single page.
-    :param page_number: (int) The page number.
+    :param languages: (Iterable[str]) The languages the reader recognizes.
+    :param settings: Keyword arguments passed to easyocr.Reader, eg. gpu=False.
 
-    :returns: (list) A list of dictionaries containing the OCR data, confidence, and
-        bounding box.
+    :returns: (easyocr.Reader) The reader.
 
     """
-    # Example of incoming results:
-    #     (
-    #         [
-    #             [np.int32(1052), np.int32(285)],
-    #             [np.int32(1661), np.int32(285)],
-    #             [np.int32(1661), np.int32(386)],
-    #             [np.int32(1052), np.int32(386)]
-    #         ],
-    #         'LAZARUS',
-    #         np.float64(0.9106397069581507)
-    #     ),
-    output = []
-    for result in results:
-        coordinates = result[0]
-        data = result[1]
-        confidence = float(result[2])
-        box_values = {
-            "top_left_x": int(coordinates[0][0]),
-            "top_left_y": int(coordinates[0][1]),
-            "bottom_right_x": int(coordinates[2][0]),
-            "bottom_right_y": int(coordinates[2][1]),
-        }
-        box = BoundingBox(page_number=page_number, box=box_values)
-        output.append({"data": data, "confidence": confidence, "bounding_box": box.model_dump()})
-    return output
-
-
-def read_pdf(file_path, start_page=None, end_page=None):
+    key = get_reader_key(languages, **settings)
+    reader = _readers.get(key)
+    if reader is not None:
+        return reader
+
+    with _registry_lock:
+        lock = _reader_locks.setdefault(key, threading.Lock())
+    with lock:
+        reader = _readers.get(key)
+        if reader is None:
+            logger.info(f"Loading EasyOCR reader for {list(key[0])}")
+            reader = easyocr.Reader(list(key[0]), **settings)
+            _readers[key] = reader
+    return reader
+
+
+def warm_up_reader(languages: Iterable[str] = DEFAULT_LANGUAGES, **settings) -> easyocr.Reader:
+    """Loads a reader and runs it once, so the first real page is read at full speed.
+
+    :param languages: (Iterable[str]) The languages the reader recognizes.
+    :param settings: Keyword arguments passed to easyocr.Reader, eg. gpu=False.
+
+    :returns: (easyocr.Reader) The reader.
+
+    """
+    reader = get_reader(languages, **settings)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        reader.readtext(np.full((64, 256), 255, dtype=np.uint8))
+    return reader
+
+
+def release_reader(languages: Optional[Iterable[str]] = None, **settings):
+    """Drops readers from the registry, freeing their memory once no one else holds them.
+
+    :param languages: (Iterable[str]) The languages of the reader to release. If None,
+        releases every reader.
+    :param settings: The settings of the reader to release.
+
+    """
+    with _registry_lock:
+        if languages is None:
+            _readers.clear()
+        else:
+            _readers.pop(get_reader_key(languages, **settings), None)
+
+    gc.collect()
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def read_pdf(
+    file_path,
+    start_page=None,
+    end_page=None,
+    languages=DEFAULT_LANGUAGES,
+    dpi=300,
+    save_images=False,
+    image_folder=None,
+    tiled=None,
+    columnar=False,
+    use_cache=OCR_CACHE,
+):
     """Reads a PDF file and extracts OCR results for each page.
 
+    Pages are rendered into memory and handed to the reader as pixel buffers, nothing
+    is written to disk unless save_images is set.
+
     :param file_path: (str) The path to the PDF file.
     :param start_page: (int) The starting page number to read. If None, reads from the
         first page.
     :param end_page: (int) The ending page number to read. If None, reads to the last
         page.
+    :param languages: (Iterable[str]) The languages to recognize.
+    :param dpi: (int) The resolution pages are rendered at for OCR.
+    :param save_images: (bool) If True, also saves the page images, named like
+        convert_pdf_to_images names them.
+    :param image_folder: (str) The folder page images are saved to. If None, uses the
+        "<name>_images" folder next to the PDF.
+    :param tiled: (bool) If True, pages are OCR'd in overlapping tiles, if False as a
+        whole. If None, only pages larger than OCR_TILE_PAGE_SIZE are tiled.
+    :param columnar: (bool) If True, returns the results as OcrResults.
+    :param use_cache: (bool) If True, pages OCR'd before with the same settings are
+        taken from the OCR cache, and new pages are added to it.
+
+    :returns: (dict) A dictionary containing the OCR results for each page, or
+        OcrResults if columnar is True.
+
+    """
+    if save_images:
+        image_folder = image_folder or get_image_folder(file_path)
+        mkdir(image_folder)
+    else:
+        image_folder = None
+
+    page_count = get_number_of_pages(file_path)
+    pages = read_pages(
+        file_path,
+        start_page,
+        end_page,
+        languages,
+        dpi,
+        image_folder,
+        tiled=tiled,
+        columnar=columnar,
+        use_cache=use_cache,
+    )
+    if columnar:
+        return OcrResults.concatenate([page_results for _, page_results in pages], page_count)
+    return {
+        get_page_image_name(page_number, page_count): page_results
+        for page_number, page_results in pages
+    }
+
+
+def read_pages(
+    file_path: str,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    languages: Iterable[str] = DEFAULT_LANGUAGES,
+    dpi: int = 300,
+    image_folder: Optional[str] = None,
+    thread_count: int = PDF_RENDER_THREADS,
+    tiled: Optional[bool] = None,
+    columnar: bool = False,
+    use_cache: bool = OCR_CACHE,
+) -> Iterator[Tuple[int, Union[list, OcrResults]]]:
+    """OCRs pages of a PDF in memory, rendering a few pages at a time.
+
+    With the cache on, each page is stored as soon as it is read, and pages read before
+    with the same settings are not read again. A job that stopped half way, or an
+    overlapping page range, only OCRs the pages that are missing.
+
+    :param file_path: (str) The path to the PDF file.
+    :param first_page: (int) The first page (1 indexed) to read. If None, starts at the
+        first page.
+    :param last_page: (int) The last page (1 indexed) to read. If None, reads to the
+        last page.
+    :param languages: (Iterable[str]) The languages to recognize.
+    :param dpi: (int) The resolution pages are rendered at.
+    :param image_folder: (str) If given, an existing folder the page images are also
+        saved to.
+    :param thread_count: (int) The number of poppler processes rendering at once.
+    :param tiled: (bool) If True, pages are OCR'd in overlapping tiles, if False as a
+        whole. If None, only pages larger than OCR_TILE_PAGE_SIZE are tiled.
+    :param columnar: (bool) If True, the results of each page are OcrResults instead of
+        formatted dicts.
+    :param use_cache: (bool) If True, reuse and store the results of each page in the
+        OCR cache.
 
-    :returns: (dict) A dictionary containing the OCR results for each page.
+    :returns: (Iterator[Tuple[int, list]]) (page_number, results) tuples, in order.
 
     """
-    image_folder = convert_pdf_to_images(file_path, start_page=start_page, end_page=end_page)
-    image_paths = get_all_files_with_ext(image_folder, "jpg")
-    reader = easyocr.Reader(["en"])  # this needs to run only once to load the model into memory
-    results = {}
-    page_number = start_page
-    for image_path in image_paths:
-        file_name = f"{get_filename(image_path)}.{get_extension(image_path)}"
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            result = reader.readtext(image_path)
-            results[file_name] = format_ocr_results(result, page_number)
-
-        page_number = page_number + 1
-    return results
+    page_count = get_number_of_pages(file_path)
+    if not use_cache or not page_count:
+        reader = get_reader(languages)
+        pages = iter_rendered_pages(
+            file_path, first_page, last_page, dpi=dpi, thread_count=thread_count
+        )
+        for page_number, image in pages:
+            result = _read_page(reader, image, page_number, page_count, image_folder, tiled)
+            if columnar:
+                yield page_number, OcrResults.from_detections(result, page_number)
+            else:
+                yield page_number, format_ocr_results(result, page_number)
+        return
+
+    first_page = first_page or 1
+    last_page = min(last_page or page_count, page_count)
+    pdf_key = get_pdf_key(file_path)
+    settings = get_reader_key(languages), easyocr.__version__, tiled, get_tile_settings(tiled)
+    cache_keys = {
+        page_number: get_ocr_cache_key(pdf_key, page_number, dpi, settings)
+        for page_number in range(first_page, last_page + 1)
+    }
+    cached = {}
+    for page_number, cache_key in cache_keys.items():
+        page_results = get_cached_page(cache_key)
+        if page_results is not None:
+            cached[page_number] = page_results
+    if cached:
+        logger.info(f"Reusing the OCR results of {len(cached)} pages of {file_path}")
+
+    # Cached pages are only rendered when their images are wanted
+    to_render = [number for number in cache_keys if number not in cached or image_folder]
+    rendered = (
+        page
+        for run_start, run_end in get_page_runs(to_render)
+        for page in iter_rendered_pages(
+            file_path, run_start, run_end, dpi=dpi, thread_count=thread_count
+        )
+    )
+    # Loading the model takes seconds, it is skipped when every page is cached
+    reader = None
+    for page_number, cache_key in cache_keys.items():
+        page_results = cached.get(page_number)
+        if page_results is None or image_folder:
+            _, image = next(rendered)
+        if page_results is None:
+            if reader is None:
+                reader = get_reader(languages)
+            result = _read_page(reader, image, page_number, page_count, image_folder, tiled)
+            page_results = OcrResults.from_detections(result, page_number)
+            cache_page(cache_key, page_results)
+            if not columnar:
+                yield page_number, format_ocr_results(result, page_number)
+                continue
+        elif image_folder:
+            _save_page_image(image, page_number, page_count, image_folder)
+        yield page_number, page_results if columnar else page_results.to_page_results()
+
+
+def get_tile_settings(tiled: Optional[bool]) -> Tuple:
+    """Returns the tiling settings OCR results depend on.
+
+    :param tiled: (bool) The tiled argument of read_pages.
+
+    :returns: (tuple) The settings, empty if pages are never tiled.
+
+    """
+    if tiled is False:
+        return ()
+    return OCR_TILE_PAGE_SIZE, OCR_TILE_SIZE, OCR_TILE_OVERLAP, OCR_MAX_TILES
+
+
+def _read_page(reader, image, page_number, page_count, image_folder, tiled) -> list:
+    if image_folder:
+        _save_page_image(image, page_number, page_count, image_folder)
+    pixels = np.asarray(image)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if tiled or (tiled is None and needs_tiling(pixels)):
+            return read_tiled(reader, pixels)
+        return reader.readtext(pixels)
+
+
+def _save_page_image(image, page_number, page_count, image_folder):
+    image.save(os.path.join(image_folder, get_page_image_name(page_number, page_count)))
@@ -0,0 +1,220 @@
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import cv2
+
+from lazarus_implementation_tools.config import (
+    OCR_PAGES_PER_TASK,
+    OCR_THREADS_PER_WORKER,
+    OCR_WORKERS,
+)
+from lazarus_implementation_tools.file_system.utils import mkdir
+from lazarus_implementation_tools.transformations.ocr.easyocr import (
+    DEFAULT_LANGUAGES,
+    read_pages,
+    warm_up_reader,
+)
+from lazarus_implementation_tools.transformations.ocr.results import OcrResults
+from lazarus_implementation_tools.transformations.ocr.text_layer import read_text_layer
+from lazarus_implementation_tools.transformations.pdf.render import get_page_runs
+from lazarus_implementation_tools.transformations.pdf.utils import (
+    get_image_folder,
+    get_number_of_pages,
+    get_page_image_name,
+)
+
+logger = logging.getLogger(__name__)
+
+# (file_path, first_page, last_page), 1 indexed and inclusive
+OcrTask = Tuple[str, int, int]
+
+
+def ocr_pdfs(
+    file_paths: Iterable[str],
+    start_page: Optional[int] = None,
+    end_page: Optional[int] = None,
+    use_text_layer: bool = True,
+    languages: Iterable[str] = DEFAULT_LANGUAGES,
+    dpi: int = 300,
+    max_workers: int = OCR_WORKERS,
+    threads_per_worker: int = OCR_THREADS_PER_WORKER,
+    pages_per_task: int = OCR_PAGES_PER_TASK,
+    save_images: bool = False,
+    tiled: Optional[bool] = None,
+    columnar: bool = False,
+) -> Dict[str, Union[dict, OcrResults]]:
+    """OCRs the pages of many PDFs at once, spreading them over a pool of processes.
+
+    Each worker loads its own reader once and is limited to threads_per_worker threads,
+    so the workers don't compete for the same cores. Pages are handed out a few at a
+    time, so one long PDF doesn't leave the other workers idle.
+
+    :param file_paths: (Iterable[str]) The paths to the PDF files.
+    :param start_page: (int) The starting page number to read in every PDF. If None,
+        reads from the first page.
+    :param end_page: (int) The ending page number to read in every PDF. If None, reads
+        to the last page.
+    :param use_text_layer: (bool) If True, pages with a text layer are read from it
+        instead of being OCR'd.
+    :param languages: (Iterable[str]) The languages to recognize.
+    :param dpi: (int) The resolution pages are rendered at for OCR.
+    :param max_workers: (int) The number of OCR processes. With 1, or when there is a
+        single task, pages are read in this process without limiting its threads.
+    :param threads_per_worker: (int) The number of threads each OCR process may use.
+    :param pages_per_task: (int) The number of pages a worker renders and reads at once.
+    :param save_images: (bool) If True, the OCR'd pages of each PDF are also saved as
+        images to the "<name>_images" folder next to it. Pages are OCR'd in memory
+        either way.
+    :param tiled: (bool) If True, pages are OCR'd in overlapping tiles, if False as a
+        whole. If None, only pages larger than OCR_TILE_PAGE_SIZE are tiled.
+    :param columnar: (bool) If True, the results of each PDF are OcrResults. Workers
+        then send back arrays instead of a dict per word.
+
+    :returns: (dict) A dictionary mapping each file path to its results, in the format
+        ocr_pdf returns them.
+
+    """
+    languages = tuple(languages)
+    pages: Dict[str, Dict[int, Union[list, OcrResults]]] = {}
+    page_counts: Dict[str, int] = {}
+    tasks: List[OcrTask] = []
+    image_folders: Dict[str, Optional[str]] = {}
+    for file_path in file_paths:
+        page_count = get_number_of_pages(file_path) or 0
+        first_page = start_page or 1
+        last_page = min(end_page or page_count, page_count)
+        page_counts[file_path] = page_count
+        image_folders[file_path] = None
+        if save_images:
+            image_folders[file_path] = get_image_folder(file_path)
+            mkdir(image_folders[file_path])
+
+        text_pages = {}
+        if use_text_layer:
+            text_layer = read_text_layer(file_path, first_page, last_page, dpi=dpi)
+            text_pages = {number: words for number, words in text_layer.items() if words}
+        pages[file_path] = text_pages
+
+        image_pages = [
+            number for number in range(first_page, last_page + 1) if number not in text_pages
+        ]
+        tasks.extend(get_ocr_tasks(file_path, image_pages, pages_per_task))
+
+    logger.info(f"OCRing {sum(last - first + 1 for _, first, last in tasks)} pages")
+    if max_workers <= 1 or len(tasks) <= 1:
+        # Thread limits are only set in pool workers, they would outlive this call here
+        for file_path, first_page, last_page in tasks:
+            pages[file_path].update(
+                _ocr_pages(
+                    file_path,
+                    first_page,
+                    last_page,
+                    languages,
+                    dpi,
+                    image_folders[file_path],
+                    tiled,
+                    columnar,
+                )
+            )
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(tasks)),
+            initializer=_init_worker,
+            initargs=(languages, threads_per_worker),
+        ) as executor:
+            futures: Dict[Future, str] = {}
+            for file_path, first_page, last_page in tasks:
+                future = executor.submit(
+                    _ocr_pages,
+                    file_path,
+                    first_page,
+                    last_page,
+                    languages,
+                    dpi,
+                    image_folders[file_path],
+                    tiled,
+                    columnar,
+                )
+                futures[future] = file_path
+            for future in as_completed(futures):
+                pages[futures[future]].update(future.result())
+
+    if columnar:
+        return {
+            file_path: OcrResults.concatenate(
+                [
+                    page_results
+                    if isinstance(page_results, OcrResults)
+                    else OcrResults.from_page_results(page_results, number)
+                    for number, page_results in sorted(page_pages.items())
+                ],
+                page_counts[file_path],
+            )
+            for file_path, page_pages in pages.items()
+        }
+    return {
+        file_path: {
+            get_page_image_name(number, page_counts[file_path]): page_pages[number]
+            for number in sorted(page_pages)
+        }
+        for file_path, page_pages in pages.items()
+    }
+
+
+def get_ocr_tasks(file_path: str, page_numbers: List[int], pages_per_task: int) -> List[OcrTask]:
+    """Cuts the pages of a PDF into tasks of up to pages_per_task consecutive pages.
+
+    :param file_path: (str) The path to the PDF file.
+    :param page_numbers: (List[int]) The sorted page numbers to OCR.
+    :param pages_per_task: (int) The maximum number of pages in a task.
+
+    :returns: (List[OcrTask]) (file_path, first_page, last_page) tuples.
+
+    """
+    tasks = []
+    for first_page, last_page in get_page_runs(page_numbers):
+        for task_start in range(first_page, last_page + 1, max(1, pages_per_task)):
+            task_end = min(task_start + max(1, pages_per_task) - 1, last_page)
+            tasks.append((file_path, task_start, task_end))
+    return tasks
+
+
+def _init_worker(languages: Tuple[str, ...], threads_per_worker: int):
+    _set_thread_count(threads_per_worker)
+    warm_up_reader(languages)
+
+
+def _set_thread_count(thread_count: int):
+    cv2.setNumThreads(thread_count)
+    try:
+        import torch
+
+        torch.set_num_threads(thread_count)
+    except ImportError:
+        pass
+
+
+def _ocr_pages(
+    file_path: str,
+    first_page: int,
+    last_page: int,
+    languages: Tuple[str, ...],
+    dpi: int,
+    image_folder: Optional[str] = None,
+    tiled: Optional[bool] = None,
+    columnar: bool = False,
+) -> Dict[int, Union[list, OcrResults]]:
+    # Rendering stays in this process, other workers already use the other cores
+    pages = read_pages(
+        file_path,
+        first_page,
+        last_page,
+        languages,
+        dpi,
+        image_folder,
+        thread_count=1,
+        tiled=tiled,
+        columnar=columnar,
+    )
+    return dict(pages)
@@ -0,0 +1,363 @@
+import logging
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from lazarus_implementation_tools.general.pydantic_models import BoundingBox
+from lazarus_implementation_tools.general.utils import normalize_text
+from lazarus_implementation_tools.transformations.ocr.results import OcrResults
+
+logger = logging.getLogger(__name__)
+
+# Grid cells are this many median word heights wide
+CELL_SIZE_IN_WORDS = 4
+# Words sharing fewer trigrams with a query word than this (Dice coefficient) are not
+# considered for a match
+MIN_WORD_SIMILARITY = 0.4
+# The number of best matching words a phrase is anchored on
+MAX_ANCHORS = 100
+
+
+class TextMatch(BaseModel):
+    """A run of consecutive words on a page that matches a searched text."""
+
+    text: str
+    score: float
+    bounding_box: BoundingBox
+    word_indexes: List[int]
+
+
+class PageGrid:
+    """A uniform grid over the words of one page, stored as flat numpy arrays.
+
+    Each word is listed in every cell its box touches. The word ids of cell n are
+    word_ids[cell_starts[n]:cell_starts[n + 1]].
+
+    """
+
+    def __init__(self, indexes: np.ndarray, boxes: np.ndarray, cell_size: float):
+        """Builds the grid.
+
+        :param indexes: (np.ndarray) The positions of the page's words in the index.
+        :param boxes: (np.ndarray) An (n, 4) array of x0, y0, x1, y1 for those words.
+        :param cell_size: (float) The width and height of a cell.
+
+        """
+        self.cell_size = cell_size
+        x0, y0, x1, y1 = (boxes[:, column] for column in range(4))
+        first_columns = np.maximum(x0 // cell_size, 0).astype(np.int64)
+        first_rows = np.maximum(y0 // cell_size, 0).astype(np.int64)
+        last_columns = np.maximum(x1 // cell_size, first_columns).astype(np.int64)
+        last_rows = np.maximum(y1 // cell_size, first_rows).astype(np.int64)
+        self.columns = int(last_columns.max(initial=0)) + 1
+        self.rows = int(last_rows.max(initial=0)) + 1
+
+        # Expand each word into the cells it covers
+        widths = last_columns - first_columns + 1
+        counts = widths * (last_rows - first_rows + 1)
+        owners = np.repeat(np.arange(len(indexes)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_columns = first_columns[owners] + offsets % widths[owners]
+        cell_rows = first_rows[owners] + offsets // widths[owners]
+        cells = cell_rows * self.columns + cell_columns
+
+        order = np.argsort(cells, kind="stable")
+        self.word_ids = indexes[owners[order]]
+        self.cell_starts = np.searchsorted(cells[order], np.arange(self.rows * self.columns + 1))
+
+    def get_candidates(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Returns the ids of the words in the cells a rectangle touches.
+
+        :returns: (np.ndarray) Unique word ids, a superset of the words in the rectangle.
+
+        """
+        first_column = max(int(x0 // self.cell_size), 0)
+        first_row = max(int(y0 // self.cell_size), 0)
+        last_column = min(int(x1 // self.cell_size), self.columns - 1)
+        last_row = min(int(y1 // self.cell_size), self.rows - 1)
+        if first_column > last_column or first_row > last_row:
+            return np.zeros(0, dtype=np.int64)
+
+        chunks = []
+        for row in range(first_row, last_row + 1):
+            # Cells of a row are contiguous, so each row is a single slice
+            start = self.cell_starts[row * self.columns + first_column]
+            end = self.cell_starts[row * self.columns + last_column + 1]
+            chunks.append(self.word_ids[start:end])
+        return np.unique(np.concatenate(chunks))
+
+
+class WordIndex:
+    """A spatial and text index over OCR or text layer words.
+
+    Finds the words in a region of a page, the words nearest to a point and the places
+    a piece of text appears, without scanning every word.
+
+    """
+
+    def __init__(self, results: OcrResults):
+        """Builds the index.
+
+        :param results: (OcrResults) The words to index. OcrResults.from_dict converts
+            the dictionary ocr_pdf returns.
+
+        """
+        self.results = results
+        self.boxes = np.stack([results.x0, results.y0, results.x1, results.y1], axis=1).astype(
+            np.float64
+        )
+        # Boxes of rotated text may have their corners swapped
+        self.boxes = np.concatenate(
+            [
+                np.minimum(self.boxes[:, :2], self.boxes[:, 2:]),
+                np.maximum(self.boxes[:, :2], self.boxes[:, 2:]),
+            ],
+            axis=1,
+        )
+
+        heights = self.boxes[:, 3] - self.boxes[:, 1]
+        median_height = float(np.median(heights)) if len(heights) else 0.0
+        cell_size = max(median_height, 1.0) * CELL_SIZE_IN_WORDS
+        self.grids: Dict[int, PageGrid] = {}
+        self.page_words: Dict[int, np.ndarray] = {}
+        order = np.argsort(results.page, kind="stable")
+        pages, starts = np.unique(results.page[order], return_index=True)
+        for page_number, indexes in zip(pages.tolist(), np.split(order, starts[1:])):
+            self.page_words[page_number] = indexes
+            self.grids[page_number] = PageGrid(indexes, self.boxes[indexes], cell_size)
+
+        self.normalized = [normalize_text(text) for text in results.text]
+        # Position of each word in the reading order of its page
+        self.positions = np.zeros(len(results), dtype=np.int64)
+        for indexes in self.page_words.values():
+            self.positions[indexes] = np.arange(len(indexes))
+        trigrams: Dict[str, List[int]] = defaultdict(list)
+        self.trigram_counts = np.zeros(len(results), dtype=np.int64)
+        for index, text in enumerate(self.normalized):
+            word_trigrams = _get_trigrams(text)
+            self.trigram_counts[index] = len(word_trigrams)
+            for trigram in word_trigrams:
+                trigrams[trigram].append(index)
+        self.trigrams = {
+            trigram: np.array(indexes, dtype=np.int64) for trigram, indexes in trigrams.items()
+        }
+
+    @classmethod
+    def from_dict(cls, results: Dict[str, List[dict]]) -> "WordIndex":
+        """Builds the index from the dictionary ocr_pdf returns.
+
+        :param results: (dict) The words of each page, keyed by page image name.
+
+        :returns: (WordIndex) The index.
+
+        """
+        return cls(OcrResults.from_dict(results))
+
+    def search_region(
+        self,
+        page_number: int,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        contained: bool = False,
+    ) -> np.ndarray:
+        """Finds the words in a rectangle of a page.
+
+        :param page_number: (int) The page number.
+        :param x0: (float) The left of the rectangle, in the units of the word boxes.
+        :param y0: (float) The top of the rectangle.
+        :param x1: (float) The right of the rectangle.
+        :param y1: (float) The bottom of the rectangle.
+        :param contained: (bool) If True, only words entirely inside the rectangle are
+            returned, otherwise words that overlap it.
+
+        :returns: (np.ndarray) The positions of the words in the results, in reading
+            order. Use results.take to get the words.
+
+        """
+        grid = self.grids.get(page_number)
+        if grid is None:
+            return np.zeros(0, dtype=np.int64)
+        candidates = grid.get_candidates(x0, y0, x1, y1)
+        boxes = self.boxes[candidates]
+        if contained:
+            inside = (
+                (boxes[:, 0] >= x0)
+                & (boxes[:, 1] >= y0)
+                & (boxes[:, 2] <= x1)
+                & (boxes[:, 3] <= y1)
+            )
+        else:
+            inside = (
+                (boxes[:, 0] <= x1)
+                & (boxes[:, 1] <= y1)
+                & (boxes[:, 2] >= x0)
+                & (boxes[:, 3] >= y0)
+            )
+        return candidates[inside]
+
+    def search_bounding_box(self, bounding_box: BoundingBox, contained: bool = False) -> np.ndarray:
+        """Finds the words in a BoundingBox, like search_region.
+
+        :param bounding_box: (BoundingBox) The box, in the units of the word boxes.
+        :param contained: (bool) If True, only words entirely inside the box are
+            returned.
+
+        :returns: (np.ndarray) The positions of the words in the results.
+
+        """
+        box = bounding_box.box
+        return self.search_region(
+            bounding_box.page_number,
+            box["top_left_x"],
+            box["top_left_y"],
+            box["bottom_right_x"],
+            box["bottom_right_y"],
+            contained=contained,
+        )
+
+    def nearest(self, page_number: int, x: float, y: float, count: int = 1) -> np.ndarray:
+        """Finds the words closest to a point.
+
+        :param page_number: (int) The page number.
+        :param x: (float) The x of the point.
+        :param y: (float) The y of the point.
+        :param count: (int) The number of words to return.
+
+        :returns: (np.ndarray) The positions of the words in the results, closest first.
+            Words the point is inside of are at distance 0.
+
+        """
+        grid = self.grids.get(page_number)
+        if grid is None or count < 1:
+            return np.zeros(0, dtype=np.int64)
+
+        width = grid.columns * grid.cell_size
+        height = grid.rows * grid.cell_size
+        reach = 0.0
+        while True:
+            candidates = grid.get_candidates(x - reach, y - reach, x + reach, y + reach)
+            covers_grid = (
+                x - reach <= 0 and y - reach <= 0 and x + reach >= width and y + reach >= height
+            )
+            if len(candidates) >= count or covers_grid:
+                distances = self._get_distances(candidates, x, y)
+                order = np.argsort(distances, kind="stable")[:count]
+                # Every word within reach has been seen, anything further can't be closer
+                if covers_grid or distances[order[-1]] <= reach:
+                    return candidates[order]
+            reach = max(grid.cell_size, reach * 2)
+
+    def find_text(
+        self,
+        text: str,
+        page_number: Optional[int] = None,
+        min_score: float = 0.8,
+        limit: int = 10,
+    ) -> List[TextMatch]:
+        """Finds where a piece of text appears, tolerating OCR mistakes.
+
+        Text is compared after normalize_text. Words sharing trigrams with the words of
+        the text are looked up in the index, then each run of consecutive words around
+        them is scored against the whole text.
+
+        :param text: (str) The text to look for, eg. a model answer.
+        :param page_number: (int) If given, only this page is searched.
+        :param min_score: (float) The lowest similarity, from 0 to 1, to return.
+        :param limit: (int) The maximum number of matches to return.
+
+        :returns: (List[TextMatch]) The best matches, best first.
+
+        """
+        query = normalize_text(text)
+        query_words = query.split()
+        if not query_words:
+            return []
+
+        # (query word position, word index, similarity) of words resembling a query word
+        anchors: List[Tuple[float, int, int]] = []
+        for query_position, query_word in enumerate(query_words):
+            for index, similarity in self._get_similar_words(query_word, page_number):
+                anchors.append((similarity, index, query_position))
+        anchors.sort(reverse=True)
+
+        windows = set()
+        for _, index, query_position in anchors[:MAX_ANCHORS]:
+            page_indexes = self.page_words[int(self.results.page[index])]
+            start = int(self.positions[index]) - query_position
+            # Text can be read as one word more or less than the query
+            for length in {len(query_words) - 1, len(query_words), len(query_words) + 1}:
+                for shift in (-1, 0, 1) if length != len(query_words) else (0,):
+                    first = max(start + shift, 0)
+                    last = min(first + max(length, 1), len(page_indexes))
+                    if first < last:
+                        windows.add(tuple(page_indexes[first:last].tolist()))
+
+        # The query is analyzed once, cheap upper bounds skip most windows
+        matcher = SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(query)
+        matches = []
+        for window in windows:
+            matcher.set_seq1(" ".join(self.normalized[index] for index in window))
+            if matcher.real_quick_ratio() < min_score or matcher.quick_ratio() < min_score:
+                continue
+            score = matcher.ratio()
+            if score >= min_score:
+                matches.append((score, window))
+        matches.sort(key=lambda match: (-match[0], match[1]))
+
+        results = []
+        used = set()
+        for score, window in matches:
+            # Overlapping windows describe the same place, keep the best one
+            if used.intersection(window):
+                continue
+            used.update(window)
+            results.append(self._get_match(window, score))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _get_similar_words(self, word: str, page_number: Optional[int]) -> List[Tuple[int, float]]:
+        trigrams = _get_trigrams(word)
+        postings = [self.trigrams[trigram] for trigram in trigrams if trigram in self.trigrams]
+        if not postings:
+            return []
+        indexes, shared = np.unique(np.concatenate(postings), return_counts=True)
+        if page_number is not None:
+            on_page = self.results.page[indexes] == page_number
+            indexes, shared = indexes[on_page], shared[on_page]
+        similarities = 2 * shared / (len(trigrams) + self.trigram_counts[indexes])
+        similar = similarities >= MIN_WORD_SIMILARITY
+        return list(zip(indexes[similar].tolist(), similarities[similar].tolist()))
+
+    def _get_distances(self, indexes: np.ndarray, x: float, y: float) -> np.ndarray:
+        boxes = self.boxes[indexes]
+        dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0)
+        dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0)
+        return np.hypot(dx, dy)
+
+    def _get_match(self, window: Tuple[int, ...], score: float) -> TextMatch:
+        boxes = self.boxes[list(window)]
+        box = {
+            "top_left_x": int(boxes[:, 0].min()),
+            "top_left_y": int(boxes[:, 1].min()),
+            "bottom_right_x": int(boxes[:, 2].max()),
+            "bottom_right_y": int(boxes[:, 3].max()),
+        }
+        page_number = int(self.results.page[window[0]])
+        return TextMatch(
+            text=" ".join(self.results.text[index] for index in window),
+            score=round(score, 4),
+            bounding_box=BoundingBox(page_number=page_number, box=box),
+            word_indexes=list(window),
+        )
+
+
+def _get_trigrams(text: str) -> set:
+    padded = f" {text} "
+    return {padded[i : i + 3] for i in range(max(len(padded) - 2, 1))}
@@ -0,0 +1,348 @@
+import logging
+from collections.abc import Mapping
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from lazarus_implementation_tools.transformations.pdf.utils import get_page_image_name
+
+logger = logging.getLogger(__name__)
+
+# 2: confidences are stored as float64
+FORMAT_VERSION = 2
+
+
+class OcrResults:
+    """OCR results for many pages, stored as one numpy array per field.
+
+    A word takes a few dozen bytes instead of a handful of dicts and a BoundingBox, and
+    results can be saved to and loaded from a compact .npz file. as_dict gives the
+    results in the format ocr_pdf returns them, building each page only when it is
+    accessed.
+
+    """
+
+    def __init__(
+        self,
+        page: np.ndarray,
+        x0: np.ndarray,
+        y0: np.ndarray,
+        x1: np.ndarray,
+        y1: np.ndarray,
+        confidence: np.ndarray,
+        text: List[str],
+        pages: Optional[np.ndarray] = None,
+        page_count: Optional[int] = None,
+    ):
+        """Initializes the results from their columns, one entry per word.
+
+        :param page: (np.ndarray) The page number (1 indexed) of each word.
+        :param x0: (np.ndarray) The x of the top left corner of each word.
+        :param y0: (np.ndarray) The y of the top left corner of each word.
+        :param x1: (np.ndarray) The x of the bottom right corner of each word.
+        :param y1: (np.ndarray) The y of the bottom right corner of each word.
+        :param confidence: (np.ndarray) The confidence of each word.
+        :param text: (List[str]) The text of each word.
+        :param pages: (np.ndarray) The page numbers that were read, including pages
+            without words. If None, the pages with words.
+        :param page_count: (int) The number of pages in the PDF, which the page image
+            names are padded to. If None, the last page read.
+
+        """
+        self.page = np.asarray(page, dtype=np.int32)
+        self.x0 = np.asarray(x0, dtype=np.int32)
+        self.y0 = np.asarray(y0, dtype=np.int32)
+        self.x1 = np.asarray(x1, dtype=np.int32)
+        self.y1 = np.asarray(y1, dtype=np.int32)
+        # Full precision, so cached results are identical to freshly OCR'd ones
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+        self.text = list(text)
+        if pages is None:
+            pages = np.unique(self.page)
+        self.pages = np.asarray(pages, dtype=np.int32)
+        self.page_count = page_count
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @classmethod
+    def empty(cls, pages: Iterable[int] = (), page_count: Optional[int] = None) -> "OcrResults":
+        """Creates results without words.
+
+        :param pages: (Iterable[int]) The page numbers that were read.
+        :param page_count: (int) The number of pages in the PDF.
+
+        :returns: (OcrResults) The empty results.
+
+        """
+        columns = [np.zeros(0)] * 6
+        return cls(
+            *columns, text=[], pages=np.fromiter(pages, dtype=np.int32), page_count=page_count
+        )
+
+    @classmethod
+    def from_detections(cls, results: List[tuple], page_number: int) -> "OcrResults":
+        """Creates results for a page from what reader.readtext returns.
+
+        :param results: (List[tuple]) (corners, text, confidence) tuples, like
+            format_ocr_results takes them.
+        :param page_number: (int) The page number.
+
+        :returns: (OcrResults) The results of the page.
+
+        """
+        corners = np.array([result[0] for result in results], dtype=np.float64).reshape(-1, 4, 2)
+        return cls(
+            page=np.full(len(results), page_number),
+            x0=corners[:, 0, 0],
+            y0=corners[:, 0, 1],
+            x1=corners[:, 2, 0],
+            y1=corners[:, 2, 1],
+            confidence=[float(result[2]) for result in results],
+            text=[result[1] for result in results],
+            pages=[page_number],
+        )
+
+    @classmethod
+    def from_page_results(cls, words: List[dict], page_number: int) -> "OcrResults":
+        """Creates results for a page from the words format_ocr_results returns.
+
+        :param words: (List[dict]) The formatted words of the page.
+        :param page_number: (int) The page number.
+
+        :returns: (OcrResults) The results of the page.
+
+        """
+        boxes = [word["bounding_box"]["box"] for word in words]
+        return cls(
+            page=np.full(len(words), page_number),
+            x0=[box["top_left_x"] for box in boxes],
+            y0=[box["top_left_y"] for box in boxes],
+            x1=[box["bottom_right_x"] for box in boxes],
+            y1=[box["bottom_right_y"] for box in boxes],
+            confidence=[word["confidence"] for word in words],
+            text=[word["data"] for word in words],
+            pages=[page_number],
+        )
+
+    @classmethod
+    def from_dict(
+        cls, results: Dict[str, List[dict]], page_count: Optional[int] = None
+    ) -> "OcrResults":
+        """Creates results from the dictionary ocr_pdf returns.
+
+        Pages without words can't be told apart by their image name alone and are left
+        out.
+
+        :param results: (dict) The words of each page, keyed by page image name.
+        :param page_count: (int) The number of pages in the PDF.
+
+        :returns: (OcrResults) The results.
+
+        """
+        parts = []
+        for words in results.values():
+            if words:
+                parts.append(cls.from_page_results(words, words[0]["bounding_box"]["page_number"]))
+        return cls.concatenate(parts, page_count)
+
+    @classmethod
+    def concatenate(
+        cls, parts: List["OcrResults"], page_count: Optional[int] = None
+    ) -> "OcrResults":
+        """Joins results, eg. of several pages, in order.
+
+        :param parts: (List[OcrResults]) The results to join.
+        :param page_count: (int) The number of pages in the PDF. If None, taken from the
+            first part.
+
+        :returns: (OcrResults) The joined results.
+
+        """
+        if not parts:
+            return cls.empty(page_count=page_count)
+        text = []
+        for part in parts:
+            text.extend(part.text)
+        return cls(
+            page=np.concatenate([part.page for part in parts]),
+            x0=np.concatenate([part.x0 for part in parts]),
+            y0=np.concatenate([part.y0 for part in parts]),
+            x1=np.concatenate([part.x1 for part in parts]),
+            y1=np.concatenate([part.y1 for part in parts]),
+            confidence=np.concatenate([part.confidence for part in parts]),
+            text=text,
+            pages=np.unique(np.concatenate([part.pages for part in parts])),
+            page_count=page_count or parts[0].page_count,
+        )
+
+    def get_page(self, page_number: int) -> "OcrResults":
+        """Selects the words of a single page.
+
+        :param page_number: (int) The page number.
+
+        :returns: (OcrResults) The results of the page.
+
+        """
+        (indexes,) = np.nonzero(self.page == page_number)
+        return self.take(indexes, [page_number])
+
+    def take(self, indexes: np.ndarray, pages: Optional[Iterable[int]] = None) -> "OcrResults":
+        """Selects words by their position.
+
+        :param indexes: (np.ndarray) The positions of the words.
+        :param pages: (Iterable[int]) The page numbers the selection covers. If None, the
+            pages of the selected words.
+
+        :returns: (OcrResults) The selected words.
+
+        """
+        return OcrResults(
+            page=self.page[indexes],
+            x0=self.x0[indexes],
+            y0=self.y0[indexes],
+            x1=self.x1[indexes],
+            y1=self.y1[indexes],
+            confidence=self.confidence[indexes],
+            text=[self.text[index] for index in indexes],
+            pages=None if pages is None else list(pages),
+            page_count=self.page_count,
+        )
+
+    def to_page_results(self) -> List[dict]:
+        """Formats the words like format_ocr_results does.
+
+        :returns: (List[dict]) A dictionary with the data, confidence and bounding box of
+            each word.
+
+        """
+        columns = zip(
+            self.page.tolist(),
+            self.x0.tolist(),
+            self.y0.tolist(),
+            self.x1.tolist(),
+            self.y1.tolist(),
+            self.confidence.tolist(),
+            self.text,
+        )
+        # The shape of BoundingBox.model_dump(), without validating every word
+        return [
+            {
+                "data": text,
+                "confidence": confidence,
+                "bounding_box": {
+                    "page_number": page,
+                    "unit": None,
+                    "box": {
+                        "top_left_x": x0,
+                        "top_left_y": y0,
+                        "bottom_right_x": x1,
+                        "bottom_right_y": y1,
+                    },
+                },
+            }
+            for page, x0, y0, x1, y1, confidence, text in columns
+        ]
+
+    def as_dict(self) -> "OcrResultsDict":
+        """Returns the results in the format ocr_pdf returns them, built lazily.
+
+        :returns: (OcrResultsDict) A read only mapping of page image names to the words
+            of the page. Pass it to dict() to build every page at once.
+
+        """
+        return OcrResultsDict(self)
+
+    def save(self, file: Union[str, BinaryIO]):
+        """Saves the results to a compressed .npz file.
+
+        :param file: (Union[str, BinaryIO]) The path to save to, or a binary file object.
+
+        """
+        encoded = [text.encode("utf-8") for text in self.text]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        np.savez_compressed(
+            file,
+            version=np.array(FORMAT_VERSION),
+            page=self.page,
+            x0=self.x0,
+            y0=self.y0,
+            x1=self.x1,
+            y1=self.y1,
+            confidence=self.confidence,
+            text=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            text_offsets=offsets,
+            pages=self.pages,
+            page_count=np.array(self.page_count or 0),
+        )
+
+    @classmethod
+    def load(cls, file: Union[str, BinaryIO]) -> "OcrResults":
+        """Loads results saved with save.
+
+        :param file: (Union[str, BinaryIO]) The path to the .npz file, or a binary file
+            object.
+
+        :returns: (OcrResults) The results.
+
+        :raises ValueError: If the file was saved in an unknown format.
+
+        """
+        with np.load(file, allow_pickle=False) as data:
+            if int(data["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unknown OCR results format {int(data['version'])}")
+            blob = data["text"].tobytes()
+            offsets = data["text_offsets"].tolist()
+            return cls(
+                page=data["page"],
+                x0=data["x0"],
+                y0=data["y0"],
+                x1=data["x1"],
+                y1=data["y1"],
+                confidence=data["confidence"],
+                text=[blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])],
+                pages=data["pages"],
+                page_count=int(data["page_count"]) or None,
+            )
+
+
+class OcrResultsDict(Mapping):
+    """A read only view of OcrResults keyed by page image name, like ocr_pdf returns.
+
+    The words of a page are only turned into dicts when the page is looked up.
+
+    """
+
+    def __init__(self, results: OcrResults):
+        """Initializes the view.
+
+        :param results: (OcrResults) The results to view.
+
+        """
+        self.results = results
+        page_count = results.page_count or int(results.pages.max(initial=0))
+        self._pages = {
+            get_page_image_name(page_number, page_count): page_number
+            for page_number in sorted(results.pages.tolist())
+        }
+        # Word positions grouped by page, keeping the order words were read in
+        self._order = np.argsort(results.page, kind="stable")
+        self._sorted_pages = results.page[self._order]
+        self._cache: Dict[str, List[dict]] = {}
+
+    def __getitem__(self, name: str) -> List[dict]:
+        words = self._cache.get(name)
+        if words is None:
+            page_number = self._pages[name]
+            start, end = np.searchsorted(self._sorted_pages, [page_number, page_number + 1])
+            page = self.results.take(self._order[start:end], [page_number])
+            words = page.to_page_results()
+            self._cache[name] = words
+        return words
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._pages)
+
+    def __len__(self) -> int:
+        return len(self._pages)
@@ -0,0 +1,235 @@
+import logging
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+from lazarus_implementation_tools.transformations.ocr.core import format_ocr_results
+
+logger = logging.getLogger(__name__)
+
+# Pages with fewer visible characters than this are treated as image only
+MIN_TEXT_LAYER_CHARACTERS = 10
+# Pages this much covered by images are scans, whose text layer may only be a stamp
+SCANNED_PAGE_IMAGE_COVERAGE = 0.5
+# The text layer of a scan is only used if its words cover this much of the images, so
+# a Bates number or fax header doesn't stand in for the scanned body
+MIN_SCANNED_TEXT_COVERAGE = 0.05
+# Glyph width, as a fraction of the font size, used when a font has no width table
+AVERAGE_CHARACTER_WIDTH = 0.5
+TEXT_OPERATORS = (b"Tj", b"TJ", b"'", b'"')
+
+
+def read_text_layer(
+    file_path: str,
+    start_page: Optional[int] = None,
+    end_page: Optional[int] = None,
+    dpi: int = 300,
+    min_characters: int = MIN_TEXT_LAYER_CHARACTERS,
+) -> Dict[int, Optional[List[dict]]]:
+    """Reads the words of each page from the text layer of a PDF.
+
+    Words come out in the same format as OCR results, with their bounding boxes in
+    pixels of the page rendered at the given DPI. Boxes are placed from the text
+    position and font metrics, so they are close to, but not as tight as, OCR boxes.
+
+    :param file_path: (str) The path to the PDF file.
+    :param start_page: (int) The first page (1 indexed) to read. If None, starts at the
+        first page.
+    :param end_page: (int) The last page (1 indexed) to read. If None, reads to the last
+        page.
+    :param dpi: (int) The resolution the bounding boxes are scaled to.
+    :param min_characters: (int) The number of visible characters a page needs for its
+        text layer to be used.
+
+    :returns: (dict) A dictionary mapping page numbers to their formatted results, or
+        to None for pages without a usable text layer.
+
+    """
+    results = {}  # type: Dict[int, Optional[List[dict]]]
+    with open(file_path, "rb") as file:
+        reader = PdfReader(file)
+        if reader.is_encrypted and not reader.decrypt(""):
+            logger.info(f"Can't read the text layer of encrypted PDF {file_path}")
+            reader = None
+
+        page_count = len(reader.pages) if reader else end_page or 0
+        start_page = start_page or 1
+        end_page = min(end_page or page_count, page_count)
+        for page_number in range(start_page, end_page + 1):
+            page_results = None
+            if reader:
+                try:
+                    page_results = read_page_text_layer(
+                        reader.pages[page_number - 1], page_number, dpi, min_characters
+                    )
+                except Exception as e:
+                    logger.info(f"Can't read the text layer of page {page_number}: {e}")
+            results[page_number] = page_results
+    return results
+
+
+def read_page_text_layer(
+    page, page_number: int, dpi: int = 300, min_characters: int = MIN_TEXT_LAYER_CHARACTERS
+) -> Optional[List[dict]]:
+    """Reads the words of a single page from its text layer.
+
+    Scanned pages, mostly covered by images, need their words to cover a fair part of
+    the images too. Otherwise the text layer is only a stamp on top of the scan.
+
+    :param page: A PyPDF2 PageObject.
+    :param page_number: (int) The page number (1 indexed).
+    :param dpi: (int) The resolution the bounding boxes are scaled to.
+    :param min_characters: (int) The number of visible characters the page needs for
+        its text layer to be used.
+
+    :returns: (Optional[list]) The formatted results, or None if the page has no usable
+        text layer.
+
+    """
+    chunks, image_area = _read_text_chunks(page)
+    if sum(len(re.sub(r"\s", "", text)) for text, *_ in chunks) < min_characters:
+        return None
+
+    # Words in PDF user space as [text, left, right, baseline, font_size]
+    words: List[list] = []
+    joinable = False
+    for text, x, y, font_size, horizontal_scale, widths in chunks:
+        em = font_size * horizontal_scale
+        offset = 0.0
+        for match in re.finditer(r"\S+|\s+", text):
+            piece = match.group()
+            width = sum(_get_character_width(character, widths) for character in piece) * em
+            if piece.isspace():
+                joinable = False
+            elif joinable and _touches(words[-1], x + offset, y):
+                # A word split over several runs, eg. by a font change
+                words[-1][0] += piece
+                words[-1][2] = x + offset + width
+            else:
+                words.append([piece, x + offset, x + offset + width, y, font_size])
+            joinable = not piece.isspace()
+            offset += width
+
+    page_area = float(page.mediabox.width) * float(page.mediabox.height)
+    image_area = min(image_area, page_area)
+    if image_area >= SCANNED_PAGE_IMAGE_COVERAGE * page_area:
+        text_area = sum((x1 - x0) * font_size for _, x0, x1, _, font_size in words)
+        if text_area < MIN_SCANNED_TEXT_COVERAGE * image_area:
+            return None
+
+    scale = dpi / 72
+    left = float(page.mediabox.left)
+    top = float(page.mediabox.top)
+    results = []
+    for word, x0, x1, y, font_size in words:
+        # Glyphs rise about 0.8 of the font size above the baseline and descend 0.2
+        y0 = (top - y - 0.8 * font_size) * scale
+        y1 = (top - y + 0.2 * font_size) * scale
+        x0 = (x0 - left) * scale
+        x1 = (x1 - left) * scale
+        results.append(([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], word, 1.0))
+    return format_ocr_results(results, page_number)
+
+
+def _touches(word: list, x: float, y: float) -> bool:
+    """Checks if text starting at (x, y) continues a word without a gap."""
+    _, _, right, baseline, font_size = word
+    return abs(baseline - y) < 0.3 * font_size and abs(right - x) < 0.25 * font_size
+
+
+def _read_text_chunks(page) -> Tuple[List[tuple], float]:
+    """Collects the runs of text PyPDF2 decodes with where each run starts.
+
+    PyPDF2 reports text once it is flushed, with the text matrix at that moment, which
+    is often the position of the next line. The start of each run is tracked from the
+    text showing operators instead.
+
+    :returns: (tuple) A list of (text, x, y, font_size, horizontal_scale, widths) tuples
+        in PDF user space, where widths maps characters to their width in text space,
+        and the area the page's images are drawn over, in PDF user space.
+
+    """
+    chunks = []
+    state = {"start": None, "current": None, "in_text_operator": False, "image_area": 0.0}
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    xobjects = xobjects.get_object() if xobjects else {}
+
+    def before_operator(operator, operands, cm, tm):
+        if operator == b"Do" and operands and operands[0] in xobjects:
+            is_image = xobjects[operands[0]].get_object().get("/Subtype") == "/Image"
+        else:
+            is_image = operator == b"INLINE IMAGE"
+        if is_image:
+            # Images fill the unit square, scaled by the current transformation matrix
+            state["image_area"] += abs(cm[0] * cm[3] - cm[1] * cm[2])
+        if operator in TEXT_OPERATORS:
+            state["current"] = (list(cm), list(tm))
+            state["in_text_operator"] = True
+            if state["start"] is None:
+                state["start"] = state["current"]
+
+    def after_operator(operator, operands, cm, tm):
+        if operator in TEXT_OPERATORS:
+            state["in_text_operator"] = False
+
+    def on_text(text, cm, tm, font_dict, font_size):
+        start = state["start"] or (cm, tm)
+        # Flushed by a line break in the middle of an operator, the text of that
+        # operator starts the next run.
+        state["start"] = state["current"] if state["in_text_operator"] else None
+        if not text or text.isspace():
+            return
+
+        start_cm, start_tm = start
+        matrix = _multiply(start_tm, start_cm)
+        chunks.append(
+            (
+                text,
+                matrix[4],
+                matrix[5],
+                font_size * math.hypot(matrix[2], matrix[3]),
+                math.hypot(matrix[0], matrix[1]) / (math.hypot(matrix[2], matrix[3]) or 1),
+                _get_font_widths(font_dict),
+            )
+        )
+
+    page.extract_text(
+        visitor_operand_before=before_operator,
+        visitor_operand_after=after_operator,
+        visitor_text=on_text,
+    )
+    return chunks, state["image_area"]
+
+
+def _multiply(m, n) -> List[float]:
+    return [
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    ]
+
+
+def _get_font_widths(font_dict) -> Dict[str, float]:
+    """Reads the glyph widths of a simple font, keyed by character."""
+    if not font_dict or "/Widths" not in font_dict:
+        return {}
+    try:
+        first_char = int(font_dict.get("/FirstChar", 0))
+        widths = font_dict["/Widths"].get_object()
+        return {
+            chr(first_char + index): float(width) / 1000
+            for index, width in enumerate(widths)
+            if float(width) > 0
+        }
+    except Exception:
+        return {}
+
+
+def _get_character_width(character: str, widths: Dict[str, float]) -> float:
+    return widths.get(character, AVERAGE_CHARACTER_WIDTH)
@@ -0,0 +1,235 @@
+import logging
+import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from lazarus_implementation_tools.config import (
+    OCR_MAX_TILES,
+    OCR_TILE_OVERLAP,
+    OCR_TILE_PAGE_SIZE,
+    OCR_TILE_SIZE,
+    OCR_TILE_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+# (left, top, right, bottom) in pixels, right and bottom exclusive
+Tile = Tuple[int, int, int, int]
+# Detections closer than this to a tile edge inside the page may be cut off
+EDGE_MARGIN = 2
+# Detections from different tiles overlapping by more than this, as a fraction of the
+# smaller one, are the same text
+DUPLICATE_OVERLAP = 0.5
+
+
+def needs_tiling(image: np.ndarray, page_size: int = OCR_TILE_PAGE_SIZE) -> bool:
+    """Checks if a page image is large enough to be OCR'd in tiles.
+
+    :param image: (np.ndarray) The page image.
+    :param page_size: (int) The length in pixels of the longer side above which pages
+        are tiled. 0 never tiles.
+
+    :returns: (bool) True if the page should be tiled.
+
+    """
+    return page_size > 0 and max(image.shape[:2]) > page_size
+
+
+def get_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[Tile]:
+    """Cuts an image into overlapping tiles covering all of it.
+
+    The last tile in each row and column is aligned with the edge of the image, so no
+    tile is smaller than tile_size unless the image is.
+
+    :param width: (int) The width of the image in pixels.
+    :param height: (int) The height of the image in pixels.
+    :param tile_size: (int) The width and height of the tiles.
+    :param overlap: (int) The number of pixels neighbouring tiles share.
+
+    :returns: (List[Tile]) The tiles, row by row.
+
+    """
+    overlap = min(overlap, tile_size // 2)
+    lefts = _get_tile_starts(width, tile_size, overlap)
+    tops = _get_tile_starts(height, tile_size, overlap)
+    return [
+        (left, top, min(left + tile_size, width), min(top + tile_size, height))
+        for top in tops
+        for left in lefts
+    ]
+
+
+def read_tiled(
+    reader,
+    image: np.ndarray,
+    tile_size: int = OCR_TILE_SIZE,
+    overlap: int = OCR_TILE_OVERLAP,
+    max_tiles: int = OCR_MAX_TILES,
+    thread_count: int = OCR_TILE_THREADS,
+) -> List[tuple]:
+    """OCRs a large page image one tile at a time.
+
+    Tiles are read in parallel and their detections moved back into page coordinates.
+    Text in the overlap between tiles is detected twice, the copy that isn't cut off
+    by a tile edge is kept. Pages that would need more than max_tiles tiles are scaled
+    down first, which keeps the time spent on a single huge sheet bounded.
+
+    :param reader: (easyocr.Reader) The reader.
+    :param image: (np.ndarray) The page image.
+    :param tile_size: (int) The width and height of the tiles in pixels.
+    :param overlap: (int) The number of pixels neighbouring tiles share. Should be
+        taller than a line of text, so every line is whole in some tile.
+    :param max_tiles: (int) The maximum number of tiles to read.
+    :param thread_count: (int) The number of tiles read at once.
+
+    :returns: (List[tuple]) Detections like reader.readtext returns them, in page
+        coordinates.
+
+    """
+    height, width = image.shape[:2]
+    scale = 1.0
+    tiles = get_tiles(width, height, tile_size, overlap)
+    while len(tiles) > max(1, max_tiles):
+        scale *= min(0.9, math.sqrt(max_tiles / len(tiles)))
+        tiles = get_tiles(int(width * scale), int(height * scale), tile_size, overlap)
+    if scale < 1:
+        logger.info(
+            f"Scaling a {width}x{height} page by {scale:.2f} to read it in {len(tiles)} tiles"
+        )
+        image = cv2.resize(
+            image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+    def read_tile(tile: Tile) -> List[tuple]:
+        left, top, right, bottom = tile
+        return reader.readtext(np.ascontiguousarray(image[top:bottom, left:right]))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(thread_count, len(tiles)))) as executor:
+        tile_results = list(executor.map(read_tile, tiles))
+
+    page_size = image.shape[1], image.shape[0]
+    detections = []
+    for tile_index, (tile, results) in enumerate(zip(tiles, tile_results)):
+        for coordinates, text, confidence in results:
+            is_cut = _is_cut(coordinates, tile, page_size)
+            coordinates = remap_coordinates(coordinates, tile, scale)
+            detections.append((tile_index, is_cut, coordinates, text, confidence))
+    return [
+        (coordinates, text, confidence)
+        for _, coordinates, text, confidence in dedupe_detections(
+            detections, int(tile_size / scale)
+        )
+    ]
+
+
+def remap_coordinates(coordinates, tile: Tile, scale: float = 1.0) -> List[List[int]]:
+    """Moves the corners of a detection from tile to page coordinates.
+
+    :param coordinates: The corners of the detection in the tile.
+    :param tile: (Tile) The tile the detection was made in.
+    :param scale: (float) The factor the page was scaled by before tiling.
+
+    :returns: (List[List[int]]) The corners in page coordinates.
+
+    """
+    left, top = tile[0], tile[1]
+    return [[round((x + left) / scale), round((y + top) / scale)] for x, y in coordinates]
+
+
+def dedupe_detections(detections: List[tuple], cell_size: int = OCR_TILE_SIZE) -> List[tuple]:
+    """Drops detections that repeat text already detected in a neighbouring tile.
+
+    Of overlapping detections from different tiles, one that isn't cut off by a tile
+    edge is kept over one that is, then the larger one.
+
+    :param detections: (List[tuple]) (tile_index, is_cut, coordinates, text, confidence)
+        tuples, with coordinates in page space.
+    :param cell_size: (int) The cell size of the grid used to find overlapping
+        detections, about the tile size.
+
+    :returns: (List[tuple]) The detections kept as (tile_index, coordinates, text,
+        confidence) tuples, in their original order.
+
+    """
+    candidates = sorted(
+        range(len(detections)),
+        key=lambda i: (detections[i][1], -_area(detections[i][2]), -detections[i][4]),
+    )
+    grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    kept = set()
+    for index in candidates:
+        tile_index, _, coordinates, _, _ = detections[index]
+        cells = _get_cells(coordinates, cell_size)
+        duplicate = any(
+            detections[other][0] != tile_index
+            and _overlap(coordinates, detections[other][2]) > DUPLICATE_OVERLAP
+            for cell in cells
+            for other in grid[cell]
+        )
+        if duplicate:
+            continue
+        kept.add(index)
+        for cell in cells:
+            grid[cell].append(index)
+
+    return [
+        (tile_index, coordinates, text, confidence)
+        for index, (tile_index, _, coordinates, text, confidence) in enumerate(detections)
+        if index in kept
+    ]
+
+
+def _get_tile_starts(length: int, tile_size: int, overlap: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    count = math.ceil((length - overlap) / step)
+    return [min(index * step, length - tile_size) for index in range(count)]
+
+
+def _is_cut(coordinates, tile: Tile, page_size: Tuple[int, int]) -> bool:
+    """Checks if a detection touches a tile edge that isn't also the edge of the page."""
+    left, top, right, bottom = tile
+    xs = [x for x, _ in coordinates]
+    ys = [y for _, y in coordinates]
+    return (
+        (left > 0 and min(xs) <= EDGE_MARGIN)
+        or (top > 0 and min(ys) <= EDGE_MARGIN)
+        or (right < page_size[0] and max(xs) >= right - left - EDGE_MARGIN)
+        or (bottom < page_size[1] and max(ys) >= bottom - top - EDGE_MARGIN)
+    )
+
+
+def _bounds(coordinates) -> Tuple[float, float, float, float]:
+    xs = [x for x, _ in coordinates]
+    ys = [y for _, y in coordinates]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _area(coordinates) -> float:
+    x0, y0, x1, y1 = _bounds(coordinates)
+    return (x1 - x0) * (y1 - y0)
+
+
+def _overlap(first, second) -> float:
+    """The intersection of two detections as a fraction of the smaller one."""
+    ax0, ay0, ax1, ay1 = _bounds(first)
+    bx0, by0, bx1, by1 = _bounds(second)
+    width = min(ax1, bx1) - max(ax0, bx0)
+    height = min(ay1, by1) - max(ay0, by0)
+    if width <= 0 or height <= 0:
+        return 0.0
+    return width * height / max(1.0, min(_area(first), _area(second)))
+
+
+def _get_cells(coordinates, cell_size: int) -> List[Tuple[int, int]]:
+    x0, y0, x1, y1 = _bounds(coordinates)
+    return [
+        (column, row)
+        for row in range(int(y0 // cell_size), int(y1 // cell_size) + 1)
+        for column in range(int(x0 // cell_size), int(x1 // cell_size) + 1)
+    ]
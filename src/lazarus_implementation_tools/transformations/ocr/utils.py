@@ -1,16 +1,104 @@
-from lazarus_implementation_tools.transformations.ocr.easyocr import read_pdf
+from lazarus_implementation_tools.transformations.ocr.easyocr import (
+    DEFAULT_LANGUAGES,
+    read_pdf,
+)
+from lazarus_implementation_tools.transformations.ocr.engine import ocr_pdfs
+from lazarus_implementation_tools.transformations.ocr.text_layer import read_text_layer
+from lazarus_implementation_tools.transformations.pdf.render import get_page_runs
+from lazarus_implementation_tools.transformations.pdf.utils import (
+    get_number_of_pages,
+    get_page_image_name,
+)
 
 
-def ocr_pdf(file_path, start_page=None, end_page=None):
+def ocr_pdf(
+    file_path,
+    start_page=None,
+    end_page=None,
+    use_text_layer=True,
+    languages=DEFAULT_LANGUAGES,
+    max_workers=1,
+    save_images=False,
+    tiled=None,
+    columnar=False,
+):
     """Reads a PDF file and extracts OCR results for each page.
 
+    Pages that carry a text layer are read from it directly, only image only pages are
+    run through OCR.
+
     :param file_path: (str) The path to the PDF file.
     :param start_page: (int) The starting page number to read. If None, reads from the
         first page.
     :param end_page: (int) The ending page number to read. If None, reads to the last
         page.
+    :param use_text_layer: (bool) If False, runs OCR on every page.
+    :param languages: (Iterable[str]) The languages to recognize. The OCR reader for
+        them is loaded once and shared by later calls.
+    :param max_workers: (int) If more than 1, pages are OCR'd by a pool of processes.
+    :param save_images: (bool) If True, the OCR'd pages are also saved as images to the
+        "<name>_images" folder next to the PDF. Pages are OCR'd in memory either way.
+    :param tiled: (bool) If True, pages are OCR'd in overlapping tiles, if False as a
+        whole. If None, only pages larger than OCR_TILE_PAGE_SIZE are tiled.
+    :param columnar: (bool) If True, returns the results as OcrResults, which take far
+        less memory than a dict per word. Their as_dict gives this dictionary lazily.
 
-    :returns: (dict) A dictionary containing the OCR results for each page.
+    :returns: (dict) A dictionary containing the OCR results for each page, or
+        OcrResults if columnar is True.
 
     """
-    return read_pdf(file_path, start_page=start_page, end_page=end_page)
+    if max_workers > 1 or columnar:
+        results = ocr_pdfs(
+            [file_path],
+            start_page=start_page,
+            end_page=end_page,
+            use_text_layer=use_text_layer,
+            languages=languages,
+            max_workers=max_workers,
+            save_images=save_images,
+            tiled=tiled,
+            columnar=columnar,
+        )
+        return results[file_path]
+
+    if not use_text_layer:
+        return read_pdf(
+            file_path,
+            start_page=start_page,
+            end_page=end_page,
+            languages=languages,
+            save_images=save_images,
+            tiled=tiled,
+        )
+
+    text_layer = read_text_layer(file_path, start_page=start_page, end_page=end_page)
+    if not text_layer:
+        return read_pdf(
+            file_path,
+            start_page=start_page,
+            end_page=end_page,
+            languages=languages,
+            save_images=save_images,
+            tiled=tiled,
+        )
+
+    image_pages = [page_number for page_number, words in text_layer.items() if words is None]
+    ocr_results = {}
+    for first_page, last_page in get_page_runs(image_pages):
+        ocr_results.update(
+            read_pdf(
+                file_path,
+                start_page=first_page,
+                end_page=last_page,
+                languages=languages,
+                save_images=save_images,
+                tiled=tiled,
+            )
+        )
+
+    page_count = get_number_of_pages(file_path)
+    results = {}
+    for page_number, words in text_layer.items():
+        file_name = get_page_image_name(page_number, page_count)
+        results[file_name] = words if words is not None else ocr_results.get(file_name, [])
+    return results
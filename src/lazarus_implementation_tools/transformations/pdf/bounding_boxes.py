@@ -1,9 +1,9 @@
 import logging
-import tempfile
-from typing import List
+from io import BytesIO
+from typing import Dict, List, Optional, Union
 
-from pdf2image import convert_from_path
-from PIL import ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont
+from PyPDF2 import PdfReader, PdfWriter
 
 from lazarus_implementation_tools.file_system.utils import file_exists
 from lazarus_implementation_tools.general.core import COLOR
@@ -12,12 +12,12 @@ from lazarus_implementation_tools.general.pydantic_models import (
     Polygon,
     TextBox,
 )
-from lazarus_implementation_tools.transformations.pdf.transformations import (
-    compile_images_to_pdf,
-)
+from lazarus_implementation_tools.transformations.pdf.render import render_pages
 
 logger = logging.getLogger(__name__)
 
+Annotation = Union[BoundingBox, Polygon, TextBox]
+
 
 def draw_box_on_pdf(
     input_pdf_path, output_pdf_path, bounding_boxes: List[BoundingBox], color=(255, 0, 0)
@@ -27,35 +27,13 @@ def draw_box_on_pdf(
     :param bounding_boxes: Boxes to apply to the pdf
     :param input_pdf_path: (str) Path to the input PDF file.
     :param output_pdf_path: (str) Path to save the modified PDF file.
-    :param color: (tuple, optional) RGB color of the rectangle (0-1 range). Defaults to
-        red (1.0, 0, 0).
-
-    """
-    if not file_exists(input_pdf_path):
-        logger.error(f"File not found: {input_pdf_path}")
+    :param color: (tuple, optional) RGB color of the rectangle (0-255 range). Defaults
+        to red (255, 0, 0).
 
-    with tempfile.TemporaryDirectory() as path:
-        dpi = 200
-        images = convert_from_path(input_pdf_path, output_folder=path, dpi=dpi)
-
-        for bounding_box in bounding_boxes:
-            # Note page number is 1 indexed. images is 0 indexed
-            if bounding_box.page_number < 1 or bounding_box.page_number > len(images):
-                return
-            page_number = bounding_box.page_number - 1
-
-            image = images[page_number]
-            scale = dpi if bounding_box.unit.lower() == "inch" else 1
-            rectangle = (
-                bounding_box.box["top_left_x"] * scale,
-                bounding_box.box["top_left_y"] * scale,
-                bounding_box.box["bottom_right_x"] * scale,
-                bounding_box.box["bottom_right_y"] * scale,
-            )
-            draw = ImageDraw.Draw(image)
-            draw.rectangle(rectangle, outline=color)
+    :raises ValueError: If a box points at a page outside of the PDF.
 
-        compile_images_to_pdf(images, output_pdf_path)
+    """
+    draw_annotations_on_pdf(input_pdf_path, output_pdf_path, bounding_boxes, box_color=color)
 
 
 def draw_polygon_on_pdf(
@@ -70,82 +48,205 @@ def draw_polygon_on_pdf(
     :param polygons: List of polygon objects (page number + x,y coordinates) to draw
     :param input_pdf_path: (str) Path to the input PDF file.
     :param output_pdf_path: (str) Path to save the modified PDF file.
-    :param color: (tuple, optional) RGB color of the rectangle (0-1 range). Defaults to
-        red (1.0, 0, 0).
+    :param border_color: (tuple, optional) RGB outline color of the polygon. Defaults
+        to red.
+    :param fill_color: (tuple, optional) RGB fill color of the polygon. Defaults to
+        transparent.
+
+    :raises ValueError: If a polygon points at a page outside of the PDF.
 
     """
-    if not file_exists(input_pdf_path):
-        logger.error(f"File not found: {input_pdf_path}")
+    draw_annotations_on_pdf(
+        input_pdf_path,
+        output_pdf_path,
+        polygons,
+        border_color=border_color,
+        fill_color=fill_color,
+    )
+
+
+def draw_text_on_pdf(
+    input_pdf_path: str,
+    output_pdf_path: str,
+    text_boxes: list[TextBox],
+    color=COLOR["black"],
+):
+    """Draws text on a specified PDF page and saves it as a new PDF.
 
-    with tempfile.TemporaryDirectory() as path:
-        dpi = 200
-        images = convert_from_path(input_pdf_path, output_folder=path, dpi=dpi)
+    :param input_pdf_path: (str) Path to the input PDF file.
+    :param output_pdf_path: (str) Path to save the modified PDF file.
+    :param text_boxes: List of text box objects (page number, position and text) to
+        draw.
+    :param color: (tuple, optional) RGB color of the text (0-255 range). Defaults to
+        black (0, 0, 0).
 
-        for polygon in polygons:
-            # Note page number is 1 indexed. images is 0 indexed
-            if polygon.page_number < 1 or polygon.page_number > len(images):
-                return
-            page_number = polygon.page_number - 1
+    :raises ValueError: If a text box points at a page outside of the PDF.
 
-            image = images[page_number]
-            draw = ImageDraw.Draw(image)
-            if polygon.unit.lower() == "inch":
-                polygon = scale_polygon(polygon, dpi)
-            draw.polygon(polygon.vertices, outline=border_color, fill=fill_color)
+    """
+    draw_annotations_on_pdf(input_pdf_path, output_pdf_path, text_boxes, text_color=color)
 
-        compile_images_to_pdf(images, output_pdf_path)
 
+def scale_polygon(polygon: Polygon, dpi: int) -> Polygon:
+    new_vertices = []
+    for coordinate in polygon.vertices:
+        vertice = (coordinate[0] * dpi, coordinate[1] * dpi)
+        new_vertices.append(vertice)
 
-def draw_text_on_pdf(
+    return Polygon(page_number=polygon.page_number, vertices=new_vertices, unit="pixel")
+
+
+def draw_annotations_on_pdf(
     input_pdf_path: str,
     output_pdf_path: str,
-    text_boxes: list[TextBox],
-    color=COLOR["black"],
+    annotations: List[Annotation],
+    box_color=COLOR["red"],
+    border_color=COLOR["red"],
+    fill_color=COLOR["transparent"],
+    text_color=COLOR["black"],
+    dpi: int = 200,
 ):
-    """Draws a polygon on a specified PDF page and saves it as a new PDF.
+    """Draws a mix of bounding boxes, polygons and text boxes on a PDF in a single pass.
+
+    Only the pages that carry annotations are rasterized, all other pages are copied
+    over from the input untouched.
 
     :param input_pdf_path: (str) Path to the input PDF file.
     :param output_pdf_path: (str) Path to save the modified PDF file.
-    :param text: text to put on the page
-    :param position: Tuple of x,y coordinates
-    :param color: (tuple, optional) RGB color of the rectangle (0-255 range). Defaults
-        to red (0, 0, 0).
+    :param annotations: List of BoundingBox, Polygon and TextBox objects to draw.
+    :param box_color: (tuple, optional) RGB outline color of the bounding boxes.
+    :param border_color: (tuple, optional) RGB outline color of the polygons.
+    :param fill_color: (tuple, optional) RGB fill color of the polygons.
+    :param text_color: (tuple, optional) RGB color of the text.
+    :param dpi: (int) The resolution the annotated pages are rasterized at.
+
+    :raises ValueError: If an annotation points at a page outside of the PDF.
 
     """
     if not file_exists(input_pdf_path):
         logger.error(f"File not found: {input_pdf_path}")
 
-    with tempfile.TemporaryDirectory() as path:
-        dpi = 200
-        images = convert_from_path(input_pdf_path, output_folder=path, dpi=dpi)
+    reader = PdfReader(input_pdf_path)
+    pages = group_annotations_by_page(annotations, len(reader.pages))
 
-        for text_box in text_boxes:
-            # Note page number is 1 indexed. images is 0 indexed
-            if text_box.page_number < 1 or text_box.page_number > len(images):
-                return
-            page_number = text_box.page_number - 1
+    writer = PdfWriter()
+    for page_number, image in _rasterize_pages(input_pdf_path, reader, list(pages), dpi):
+        if image is None:
+            writer.add_page(reader.pages[page_number - 1])
+            continue
 
-            image = images[page_number]
-            draw = ImageDraw.Draw(image)
-            coordinates = text_box.coordinates
-            if text_box.unit.lower() == "inch":
-                coordinates = (
-                    text_box.coordinates[0] * dpi,
-                    text_box.coordinates[1] * dpi,
-                )
+        draw = ImageDraw.Draw(image)
+        for annotation in pages[page_number]:
+            if isinstance(annotation, BoundingBox):
+                _draw_box(draw, annotation, dpi, color=box_color)
+            elif isinstance(annotation, Polygon):
+                _draw_polygon(draw, annotation, dpi, border_color, fill_color)
+            elif isinstance(annotation, TextBox):
+                _draw_text(draw, annotation, dpi, color=text_color)
+        writer.add_page(_image_to_pdf_page(image, dpi))
 
-            font = text_box.font
-            if not font:
-                font = ImageFont.load_default()
-            draw.text(coordinates, text_box.text, fill=color, font=font)
+    with open(output_pdf_path, "wb") as output_pdf:
+        writer.write(output_pdf)
 
-        compile_images_to_pdf(images, output_pdf_path)
 
+def group_annotations_by_page(
+    annotations: List[Annotation], page_count: int
+) -> Dict[int, List[Annotation]]:
+    """Buckets annotations by their (1 indexed) page number.
 
-def scale_polygon(polygon: Polygon, dpi: int) -> Polygon:
-    new_vertices = []
-    for coordinate in polygon.vertices:
-        vertice = (coordinate[0] * dpi, coordinate[1] * dpi)
-        new_vertices.append(vertice)
+    :param annotations: List of BoundingBox, Polygon or TextBox objects.
+    :param page_count: (int) The number of pages in the PDF being annotated.
 
-    return Polygon(page_number=polygon.page_number, vertices=new_vertices, unit="pixel")
+    :returns: (dict) A dictionary mapping page numbers to their annotations, in the
+        order they were given.
+
+    :raises ValueError: If an annotation points at a page outside of the PDF.
+
+    """
+    pages = {}  # type: Dict[int, List[Annotation]]
+    invalid_pages = set()
+    for annotation in annotations:
+        if annotation.page_number < 1 or annotation.page_number > page_count:
+            invalid_pages.add(annotation.page_number)
+            continue
+        pages.setdefault(annotation.page_number, []).append(annotation)
+
+    if invalid_pages:
+        raise ValueError(
+            f"Annotations reference pages {sorted(invalid_pages)} but the PDF has "
+            f"{page_count} pages."
+        )
+    return pages
+
+
+def _rasterize_pages(input_pdf_path, reader, page_numbers, dpi):
+    """Yields every page of the PDF, rasterizing only the requested page numbers.
+
+    Contiguous runs of requested pages are rasterized with a single poppler call, pages
+    already in the render cache are reused.
+
+    :returns: Tuples of (page_number, image), where image is None for pages that were
+        not requested.
+
+    :raises RuntimeError: If fewer pages are rendered than were requested.
+
+    """
+    requested = set(page_numbers)
+    page_number = 1
+    page_count = len(reader.pages)
+    while page_number <= page_count:
+        if page_number not in requested:
+            yield page_number, None
+            page_number += 1
+            continue
+
+        last_page = page_number
+        while last_page + 1 in requested:
+            last_page += 1
+        images = render_pages(input_pdf_path, first_page=page_number, last_page=last_page, dpi=dpi)
+        if len(images) != last_page - page_number + 1:
+            # Eg. poppler counts fewer pages than PyPDF2, asking again won't help
+            raise RuntimeError(
+                f"Rendered {len(images)} images for pages {page_number} to {last_page} "
+                f"of {input_pdf_path}"
+            )
+        for image in images:
+            yield page_number, image
+            page_number += 1
+
+
+def _image_to_pdf_page(image: Image.Image, dpi: int):
+    """Converts a rasterized page back into a PDF page of the original size."""
+    buffer = BytesIO()
+    image.convert("RGB").save(buffer, format="PDF", resolution=dpi)
+    buffer.seek(0)
+    return PdfReader(buffer).pages[0]
+
+
+def _get_scale(unit: Optional[str], dpi: int) -> int:
+    return dpi if unit and unit.lower() == "inch" else 1
+
+
+def _draw_box(draw: ImageDraw.ImageDraw, bounding_box: BoundingBox, dpi: int, color):
+    scale = _get_scale(bounding_box.unit, dpi)
+    rectangle = (
+        bounding_box.box["top_left_x"] * scale,
+        bounding_box.box["top_left_y"] * scale,
+        bounding_box.box["bottom_right_x"] * scale,
+        bounding_box.box["bottom_right_y"] * scale,
+    )
+    draw.rectangle(rectangle, outline=color)
+
+
+def _draw_polygon(draw: ImageDraw.ImageDraw, polygon: Polygon, dpi: int, border_color, fill_color):
+    if polygon.unit and polygon.unit.lower() == "inch":
+        polygon = scale_polygon(polygon, dpi)
+    draw.polygon(polygon.vertices, outline=border_color, fill=fill_color)
+
+
+def _draw_text(draw: ImageDraw.ImageDraw, text_box: TextBox, dpi: int, color):
+    scale = _get_scale(text_box.unit, dpi)
+    coordinates = (text_box.coordinates[0] * scale, text_box.coordinates[1] * scale)
+    font = text_box.font
+    if not font:
+        font = ImageFont.load_default()
+    draw.text(coordinates, text_box.text, fill=color, font=font)
@@ -1,18 +1,32 @@
 import glob
-import logging
+import hashlib
+import itertools
 import os
 import shutil
 import tempfile
-from typing import List, Optional
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import extract_msg
-import PyPDF2
 from fpdf import FPDF
-from PyPDF2 import PdfMerger
+from pydantic import BaseModel
 from xhtml2pdf import pisa
 
+from lazarus_implementation_tools.config import (
+    CACHE_FOLDER,
+    CONVERSION_CACHE,
+    CONVERSION_CACHE_HARDLINK,
+    CONVERSION_CACHE_SIZE_MB,
+    LIBRE_OFFICE_BATCH_SIZE,
+    PDF_CONVERSION_WORKERS,
+)
+from lazarus_implementation_tools.file_system.cache import FileCache
 from lazarus_implementation_tools.file_system.utils import (
     append_to_filename,
+    get_extension,
+    get_file_hash,
     get_filename,
     get_filename_with_ext,
     get_folder,
@@ -20,19 +34,97 @@ from lazarus_implementation_tools.file_system.utils import (
 from lazarus_implementation_tools.general.core import sanitize_string
 from lazarus_implementation_tools.transformations.pdf.libre_office import (
     libre_office_convert_file,
+    libre_office_convert_files,
     logger,
+    use_isolated_profile,
 )
+from lazarus_implementation_tools.transformations.pdf.merge import stream_merge_pdfs
 from lazarus_implementation_tools.transformations.pdf.transformations import (
     compile_image_files_to_pdf,
 )
 
 
-def convert_file_to_pdf(file_path: str, output_dir: Optional[str]) -> Optional[str]:
+OFFICE_EXTENSIONS = [
+    "doc",
+    "docx",
+    "xlsx",
+    "xls",
+    "ppt",
+    "pptx",
+    "txt",
+    "odt",
+    "ods",
+    "odp",
+]
+SPREADSHEET_EXTENSIONS = ["xlsx", "xls", "ods"]
+EMAIL_EXTENSIONS = ["msg"]
+IMAGE_EXTENSIONS = ["jpg", "jpeg", "gif", "tif", "tiff", "png"]
+TEXT_EXTENSIONS = ["txt", "csv"]
+
+# How many files of each kind may be converting at the same time. Office files spin up
+# LibreOffice and are by far the most expensive, images are cheap.
+DEFAULT_FORMAT_WORKERS = {
+    "pdf": 1,
+    "office": 2,
+    "email": 2,
+    "image": 4,
+    "text": 2,
+}
+
+# Bump when a converter changes its output, so stale cached PDFs are not served.
+CONVERSION_CACHE_VERSION = 1
+
+_conversion_cache = None  # type: Optional[FileCache]
+
+
+def get_conversion_format(file_path: str) -> Optional[str]:
+    """Returns the kind of conversion a file needs to become a PDF.
+
+    :param file_path: (str) The path to the file.
+
+    :returns: (Optional[str]) One of "pdf", "office", "email", "image" or "text", or
+        None if the file type is not supported.
+
+    """
+    file_extension = get_extension(file_path)
+    if file_extension == "pdf":
+        return "pdf"
+    if file_extension in OFFICE_EXTENSIONS:
+        return "office"
+    if file_extension in EMAIL_EXTENSIONS:
+        return "email"
+    if file_extension in IMAGE_EXTENSIONS:
+        return "image"
+    if file_extension in TEXT_EXTENSIONS:
+        return "text"
+    return None
+
+
+def get_libre_office_convert_to(file_path: str) -> str:
+    """Returns the LibreOffice --convert-to value used to turn an office file into a PDF.
+
+    Spreadsheets are exported with every sheet on a single page.
+
+    :param file_path: (str) The path to the office file.
+
+    :returns: (str) The --convert-to value.
+
+    """
+    if get_extension(file_path) in SPREADSHEET_EXTENSIONS:
+        return 'pdf:draw_pdf_Export:{"SinglePageSheets":{"type":"boolean","value":"true"}}'
+    return "pdf"
+
+
+def convert_file_to_pdf(
+    file_path: str, output_dir: Optional[str], use_cache: bool = CONVERSION_CACHE
+) -> Optional[str]:
     """Converts a single file to PDF using LibreOffice.
 
     :param file_path: (str) The path to the file to convert.
     :param output_dir: (Optional[str]) The output directory for the converted PDF. If
         None, uses the same directory as the input file.
+    :param use_cache: (bool) If True, unchanged files that were converted before are
+        copied out of the conversion cache instead of being converted again.
 
     :returns: (Optional[str]) The path to the converted PDF file, or None if the
         conversion fails.
@@ -41,59 +133,313 @@ def convert_file_to_pdf(file_path: str, output_dir: Optional[str]) -> Optional[s
     if output_dir is None:
         output_dir = get_folder(file_path)
 
-    file_extension = os.path.splitext(file_path)[1].strip(".").lower()
+    conversion_format = get_conversion_format(file_path)
 
-    if file_extension == "pdf":
+    if conversion_format is None:
+        return None
+
+    if conversion_format == "pdf":
         return file_path
 
-    supported_office_extensions = [
-        "doc",
-        "docx",
-        "xlsx",
-        "xls",
-        "ppt",
-        "pptx",
-        "txt",
-        "odt",
-        "ods",
-        "odp",
-    ]
-    if file_extension in supported_office_extensions:
-        convert_to = "pdf"
-        if file_extension in ["xlsx", "xls", "ods"]:
-            convert_to = (
-                'pdf:draw_pdf_Export:{"SinglePageSheets":{"type":"boolean","value":"true"}}'
-            )
+    output_file = f"{output_dir}/{get_filename(file_path)}.pdf"
+    cache_key = get_conversion_cache_key(file_path) if use_cache else None
+    if cache_key and load_cached_pdf(cache_key, output_file):
+        return output_file
 
+    # A PDF left by an earlier run must not be cached as the output of this one
+    previous_output = _get_mtime_ns(output_file)
+    if conversion_format == "office":
+        convert_to = get_libre_office_convert_to(file_path)
         libre_office_convert_file(file_path, output_dir, convert_to=convert_to)
-        output_file = f"{output_dir}/{get_filename(file_path)}.pdf"
-        return output_file
 
-    email_extensions = ["msg"]
-    if file_extension in email_extensions:
-        output_file = f"{output_dir}/{get_filename(file_path)}.pdf"
+    if conversion_format == "email":
         convert_msg_to_pdf(file_path, output_file)
-        return output_file
 
-    image_extensions = ["jpg", "jpeg", "gif", "tif", "tiff", "png"]
-    if file_extension in image_extensions:
-        output_file = f"{output_dir}/{get_filename(file_path)}.pdf"
+    if conversion_format == "image":
         compile_image_files_to_pdf([file_path], output_file)
-        return output_file
 
-    image_extensions = ["txt", "csv"]
-    if file_extension in image_extensions:
-        output_file = f"{output_dir}/{get_filename(file_path)}.pdf"
-        with open(file_path, "w") as file:
+    if conversion_format == "text":
+        with open(file_path, "r") as file:
             file_contents = file.read()
         create_pdf_from_string(file_contents, output_file)
-        return output_file
 
-    return None
+    if cache_key and _get_mtime_ns(output_file) not in (None, previous_output):
+        get_conversion_cache().put(cache_key, output_file, "pdf")
+    return output_file
+
+
+def get_conversion_cache() -> FileCache:
+    """Returns the cache converted PDFs are kept in.
+
+    :returns: (FileCache) The conversion cache.
+
+    """
+    global _conversion_cache
+    if _conversion_cache is None:
+        _conversion_cache = FileCache(
+            os.path.join(CACHE_FOLDER, "conversions"),
+            max_size=CONVERSION_CACHE_SIZE_MB * 1024 * 1024,
+        )
+    return _conversion_cache
+
+
+def get_conversion_cache_key(file_path: str) -> str:
+    """Returns the conversion cache key of a file.
+
+    The key covers the file contents, the converter and its options, so a file is only
+    served from the cache if it would be converted the exact same way.
+
+    :param file_path: (str) The path to the file to convert.
+
+    :returns: (str) The cache key.
+
+    """
+    conversion_format = get_conversion_format(file_path)
+    options = get_libre_office_convert_to(file_path) if conversion_format == "office" else ""
+    key = f"{CONVERSION_CACHE_VERSION}:{conversion_format}:{options}:{get_file_hash(file_path)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def load_cached_pdf(cache_key: str, output_file: str) -> bool:
+    """Copies a previously converted PDF from the conversion cache.
+
+    :param cache_key: (str) The key from get_conversion_cache_key.
+    :param output_file: (str) Where the PDF should end up.
+
+    :returns: (bool) True if the PDF was in the cache.
+
+    """
+    return get_conversion_cache().copy_to(
+        cache_key, output_file, "pdf", link=CONVERSION_CACHE_HARDLINK
+    )
+
+
+class ConversionResult(BaseModel):
+    """The outcome of converting a single file to PDF."""
+
+    source: str
+    output: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ConversionReport(BaseModel):
+    """The outcome of converting a batch of files to PDF, in input order."""
+
+    results: List[ConversionResult] = []
+
+    @property
+    def converted(self) -> List[str]:
+        """Paths of the PDFs that were produced."""
+        return [result.output for result in self.results if result.output]
+
+    @property
+    def failures(self) -> Dict[str, str]:
+        """Source paths that failed to convert, mapped to the reason why."""
+        return {result.source: result.error for result in self.results if result.error}
+
+
+def convert_files_to_pdf(
+    file_paths: List[str],
+    output_dir: Optional[str] = None,
+    max_workers: int = PDF_CONVERSION_WORKERS,
+    format_workers: Optional[Dict[str, int]] = None,
+    progress_callback: Optional[Callable[[int, int, ConversionResult], None]] = None,
+    batch_size: int = LIBRE_OFFICE_BATCH_SIZE,
+) -> ConversionReport:
+    """Converts many files to PDF in parallel.
+
+    Files are queued by format so that expensive LibreOffice conversions cannot starve
+    the cheap image and email conversions. Every worker process uses its own
+    LibreOffice profile, so office conversions do not collide with each other. Office
+    files are converted in batches of up to batch_size files per LibreOffice run.
+
+    :param file_paths: (List[str]) The files to convert.
+    :param output_dir: (Optional[str]) The output directory for the converted PDFs. If
+        None, uses the same directory as each input file.
+    :param max_workers: (int) The maximum number of conversions running at once.
+    :param format_workers: (Optional[Dict[str, int]]) Overrides for the number of
+        conversions of a given format that may run at once. See
+        DEFAULT_FORMAT_WORKERS.
+    :param progress_callback: (Optional[Callable]) Called with (completed, total,
+        result) every time a file finishes.
+    :param batch_size: (int) The maximum number of office files converted by a single
+        LibreOffice run.
+
+    :returns: (ConversionReport) A report with one result per input file.
+
+    :raises ValueError: If max_workers is less than 1.
+
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+    limits = {**DEFAULT_FORMAT_WORKERS, **(format_workers or {})}
+    results = [None] * len(file_paths)  # type: List[Optional[ConversionResult]]
+
+    format_indexes = {}  # type: Dict[str, List[int]]
+    for index, file_path in enumerate(file_paths):
+        conversion_format = get_conversion_format(file_path)
+        if conversion_format is None:
+            results[index] = ConversionResult(source=file_path, error="Unsupported file type")
+            continue
+        format_indexes.setdefault(conversion_format, []).append(index)
+
+    # Every job is a list of indexes into file_paths that one worker converts.
+    queues = {}  # type: Dict[str, deque]
+    for conversion_format, indexes in format_indexes.items():
+        if conversion_format == "office":
+            jobs = _batch_office_files(file_paths, indexes, output_dir, batch_size)
+        else:
+            jobs = [[index] for index in indexes]
+        queues[conversion_format] = deque(jobs)
+
+    total = len(file_paths)
+    completed = len([result for result in results if result])
+    in_flight = {conversion_format: 0 for conversion_format in queues}
+    # The worker profiles are removed with this directory, once the workers have exited
+    with (
+        tempfile.TemporaryDirectory(prefix="libre_office_profiles_") as profile_root,
+        ProcessPoolExecutor(
+            max_workers=max_workers, initializer=use_isolated_profile, initargs=(profile_root,)
+        ) as executor,
+    ):
+        futures: Dict[Future, Tuple[List[int], str]] = {}
+
+        def fill():
+            for conversion_format, queue in queues.items():
+                limit = max(1, limits.get(conversion_format, 1))
+                while queue and in_flight[conversion_format] < limit:
+                    if len(futures) >= max_workers:
+                        return
+                    indexes = queue.popleft()
+                    job = [file_paths[index] for index in indexes]
+                    future = executor.submit(_convert_files, job, output_dir)
+                    futures[future] = (indexes, conversion_format)
+                    in_flight[conversion_format] += 1
+
+        fill()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                indexes, conversion_format = futures.pop(future)
+                in_flight[conversion_format] -= 1
+                try:
+                    job_results = future.result()
+                except Exception as e:
+                    job_results = [
+                        ConversionResult(source=file_paths[index], error=str(e))
+                        for index in indexes
+                    ]
+
+                for index, result in zip(indexes, job_results):
+                    results[index] = result
+                    completed += 1
+                    if result.error:
+                        logger.error(f"Failed to convert {result.source}: {result.error}")
+                    if progress_callback:
+                        progress_callback(completed, total, result)
+                logger.info(f"Converted {completed} of {total} files to PDF")
+            fill()
+
+    return ConversionReport(results=results)
+
+
+def _batch_office_files(
+    file_paths: List[str], indexes: List[int], output_dir: Optional[str], batch_size: int
+) -> List[List[int]]:
+    """Splits office files into batches that can share a single LibreOffice run.
+
+    Files in a batch have the same --convert-to value, the same output directory and
+    unique filenames, so their outputs can be mapped back to their sources.
+
+    """
+    groups = {}  # type: Dict[Tuple[str, str], List[List[int]]]
+    for index in indexes:
+        file_path = file_paths[index]
+        target_dir = output_dir if output_dir is not None else get_folder(file_path)
+        key = (get_libre_office_convert_to(file_path), target_dir)
+        batches = groups.setdefault(key, [])
+
+        filename = get_filename(file_path)
+        for batch in batches:
+            filenames = [get_filename(file_paths[other]) for other in batch]
+            if len(batch) < batch_size and filename not in filenames:
+                batch.append(index)
+                break
+        else:
+            batches.append([index])
+
+    return [batch for batches in groups.values() for batch in batches]
+
+
+def _convert_files(file_paths: List[str], output_dir: Optional[str]) -> List[ConversionResult]:
+    """Worker for convert_files_to_pdf, converts a job of files and checks the output.
+
+    Jobs with more than one file are office batches, made by _batch_office_files. They
+    are converted with one LibreOffice run, any file that did not come out of it is
+    retried on its own.
+
+    """
+    if len(file_paths) == 1:
+        return [_convert_file(file_paths[0], output_dir)]
+
+    target_dir = output_dir if output_dir is not None else get_folder(file_paths[0])
+    convert_to = get_libre_office_convert_to(file_paths[0])
+
+    results = {}  # type: Dict[str, ConversionResult]
+    cache_keys = {}  # type: Dict[str, str]
+    for file_path in file_paths:
+        output_file = f"{target_dir}/{get_filename(file_path)}.pdf"
+        if CONVERSION_CACHE:
+            cache_keys[file_path] = get_conversion_cache_key(file_path)
+            if load_cached_pdf(cache_keys[file_path], output_file):
+                results[file_path] = ConversionResult(source=file_path, output=output_file)
+
+    to_convert = [file_path for file_path in file_paths if file_path not in results]
+    started = time.time()
+    output_files = []  # type: List[Optional[str]]
+    try:
+        if to_convert:
+            output_files = libre_office_convert_files(to_convert, target_dir, convert_to=convert_to)
+    except Exception as e:
+        logger.warning(f"LibreOffice batch failed, converting files one at a time: {e}")
+        output_files = [None] * len(to_convert)
+
+    for file_path, output_file in zip(to_convert, output_files):
+        # Anything older than this run is left over from before, not our output.
+        if output_file and _is_newer_than(output_file, started):
+            results[file_path] = ConversionResult(source=file_path, output=output_file)
+            if file_path in cache_keys:
+                get_conversion_cache().put(cache_keys[file_path], output_file, "pdf")
+        else:
+            results[file_path] = _convert_file(file_path, output_dir)
+    return [results[file_path] for file_path in file_paths]
+
+
+def _get_mtime_ns(file_path: str) -> Optional[int]:
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _is_newer_than(file_path: str, timestamp: float) -> bool:
+    # Allow for file systems that store modification times with a coarse resolution.
+    return os.path.exists(file_path) and os.path.getmtime(file_path) >= int(timestamp) - 1
+
+
+def _convert_file(file_path: str, output_dir: Optional[str]) -> ConversionResult:
+    """Converts one file and checks the output."""
+    output_file = convert_file_to_pdf(file_path, output_dir=output_dir)
+    if not output_file or not os.path.exists(output_file):
+        return ConversionResult(source=file_path, error="Conversion produced no output")
+    return ConversionResult(source=file_path, output=output_file)
 
 
 def convert_folder_to_pdf(
-    dir_path: str, output_dir: Optional[str] = None, recursive: bool = False
+    dir_path: str,
+    output_dir: Optional[str] = None,
+    recursive: bool = False,
+    max_workers: int = PDF_CONVERSION_WORKERS,
 ) -> List[str]:
     """Converts all supported files in a directory to PDF using LibreOffice.
 
@@ -101,28 +447,27 @@ def convert_folder_to_pdf(
     :param output_dir: (Optional[str]) The output directory for the converted PDFs. If
         None, uses the same directory as the input files.
     :param recursive: (bool) If True, recursively convert files in subdirectories.
+    :param max_workers: (int) The maximum number of conversions running at once.
 
     :returns: (List[str]) A list of paths to the converted PDF files.
 
     """
-    # if dir: create blob and do all files
-    # else just do the one file
     results = []  # type: List
     if not os.path.exists(dir_path):
         return results
 
-    files = glob.glob(f"{dir_path}/**", recursive=recursive)
-    for file in files:
+    files = []
+    for file in glob.glob(f"{dir_path}/**", recursive=recursive):
         if file.startswith("."):
             continue
         if not os.path.isfile(file):
             continue
+        if get_conversion_format(file) is None:
+            continue
+        files.append(file)
 
-        output_file = convert_file_to_pdf(file, output_dir=output_dir)
-        if output_file:
-            results.append(output_file)
-
-    return results
+    report = convert_files_to_pdf(files, output_dir=output_dir, max_workers=max_workers)
+    return report.converted
 
 
 def convert_msg_to_pdf(file_path: str, destination_path: str = None) -> Optional[str]:
@@ -232,27 +577,31 @@ def create_pdf_from_string(content: str, destination_path: str) -> Optional[str]
         return None
 
 
-def merge_pdfs(pdf_paths: List, output_path: Optional[str] = None) -> str:
+def merge_pdfs(pdf_paths: Iterable[str], output_path: Optional[str] = None) -> str:
     """Merges multiple PDF files into a single PDF file.
 
-    :param pdf_paths: A list of paths to the PDF files to merge.
+    Pages are streamed to the output as they are read, so large sets of documents can
+    be merged without holding them in memory. Empty and corrupted PDF files are skipped.
+    Bookmarks of the inputs are not carried over. Use stream_merge_pdfs for a report of
+    the page counts and skipped files.
+
+    :param pdf_paths: A list or iterable of paths to the PDF files to merge.
     :param output_path: The output path for the merged PDF file. If None, uses a default
         name.
 
     :returns: The path to the merged PDF file.
 
+    :raises ValueError: If there are no PDFs to merge and no output path to name the
+        merged file after.
+
     """
+    pdf_paths = iter(pdf_paths)
     if not output_path:
-        output_path = append_to_filename(pdf_paths[0], "_merged_file")
-    merger = PdfMerger()
-    for pdf in pdf_paths:
-        try:
-            merger.append(pdf)
-        except PyPDF2.errors.EmptyFileError:
-            logging.info(f"Skipping empty PDF file: {pdf}")
-        except PyPDF2.errors.PdfReadError:
-            logging.info(f"Skipping corrupted PDF file: {pdf}")
-
-    merger.write(output_path)
-    merger.close()
+        first_path = next(pdf_paths, None)
+        if first_path is None:
+            raise ValueError("No PDFs to merge")
+        output_path = append_to_filename(first_path, "_merged_file")
+        pdf_paths = itertools.chain([first_path], pdf_paths)
+
+    stream_merge_pdfs(pdf_paths, output_path)
     return output_path
@@ -1,26 +1,99 @@
+import atexit
+import json
 import logging
+import multiprocessing.util
+import os
+import queue
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
 
 from lazarus_implementation_tools.config import (
+    LIBRE_OFFICE_DAEMON,
+    LIBRE_OFFICE_MAX_JOBS,
+    LIBRE_OFFICE_POOL_SIZE,
     PATH_TO_LIBRE_OFFICE,
     PROJECT_ROOT_FOLDER,
 )
+from lazarus_implementation_tools.file_system.utils import get_filename
+
+try:
+    # LibreOffice's python bindings ship with LibreOffice rather than on PyPI, without
+    # them every conversion goes through the command line.
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+    PropertyValue = None
 
 logger = logging.getLogger(__name__)
 
+# LibreOffice refuses to run two instances against the same user profile, so processes
+# that convert in parallel each point LibreOffice at a profile of their own.
+_profile_dir: Optional[str] = None
+
+# Checked in order, presentations are also drawings.
+PDF_EXPORT_FILTERS = [
+    ("com.sun.star.text.TextDocument", "writer_pdf_Export"),
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+    ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+    ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export"),
+]
+
+
+def use_isolated_profile(profile_root: Optional[str] = None) -> str:
+    """Gives the current process its own LibreOffice user profile.
+
+    Used as the initializer of conversion worker processes. Worker processes exit
+    without running atexit handlers, so the parent passes a profile_root it removes
+    once the workers are done. The process's LibreOffice pool is kept running between
+    jobs and stopped when the worker exits.
+
+    :param profile_root: (Optional[str]) The directory to create the profile in. If
+        None, the profile is created in the system temporary directory.
+
+    :returns: (str) The path to the profile directory.
+
+    """
+    global _profile_dir
+    if _profile_dir is None:
+        _profile_dir = tempfile.mkdtemp(prefix="libre_office_profile_", dir=profile_root)
+        # Unlike atexit handlers, finalizers run when a worker process is shut down
+        multiprocessing.util.Finalize(None, close_libre_office_pool, exitpriority=10)
+    return _profile_dir
+
 
 def libre_office_convert_file(file_path, output_dir, convert_to="pdf"):
     """Converts a single file to the specified format using LibreOffice.
 
+    PDF conversions are sent to a pool of long running LibreOffice instances when
+    LibreOffice's python bindings are available, otherwise LibreOffice is started from
+    the command line for the one file.
+
     :param file_path: (str) The path to the file to convert.
     :param output_dir: (str) The output directory for the converted file.
     :param convert_to: (str) The target format to convert the file to (default is
         "pdf").
 
+    :returns: (str) The path the converted file is written to.
+
     """
-    command = [
-        PATH_TO_LIBRE_OFFICE,
-        "--headless",
+    extension, _, _ = parse_convert_to(convert_to)
+    if LIBRE_OFFICE_DAEMON and uno is not None and extension == "pdf":
+        try:
+            return get_libre_office_pool().convert(file_path, output_dir, convert_to)
+        except Exception as e:
+            logger.warning(f"LibreOffice daemon could not convert {file_path}: {e}")
+
+    command = [PATH_TO_LIBRE_OFFICE, "--headless"]
+    if _profile_dir:
+        command.append(f"-env:UserInstallation={Path(_profile_dir).as_uri()}")
+    command += [
         "--convert-to",
         convert_to,
         "--outdir",
@@ -28,3 +101,311 @@ def libre_office_convert_file(file_path, output_dir, convert_to="pdf"):
         file_path,
     ]
     subprocess.run(command, capture_output=True, text=True, cwd=PROJECT_ROOT_FOLDER)
+    return os.path.join(output_dir, f"{get_filename(file_path)}.{extension}")
+
+
+def libre_office_convert_files(file_paths, output_dir, convert_to="pdf"):
+    """Converts several files to the specified format with a single LibreOffice run.
+
+    Falls back to converting the files one at a time when the LibreOffice daemon is in
+    use, since the daemon has no start up cost to share.
+
+    :param file_paths: (list) The paths to the files to convert. Their filenames should
+        be unique, otherwise the outputs overwrite each other.
+    :param output_dir: (str) The output directory for the converted files.
+    :param convert_to: (str) The target format to convert the files to (default is
+        "pdf").
+
+    :returns: (list) The paths the converted files are written to, in input order.
+
+    """
+    extension, _, _ = parse_convert_to(convert_to)
+    if LIBRE_OFFICE_DAEMON and uno is not None and extension == "pdf":
+        return [
+            libre_office_convert_file(file_path, output_dir, convert_to=convert_to)
+            for file_path in file_paths
+        ]
+
+    command = [PATH_TO_LIBRE_OFFICE, "--headless"]
+    if _profile_dir:
+        command.append(f"-env:UserInstallation={Path(_profile_dir).as_uri()}")
+    command += ["--convert-to", convert_to, "--outdir", output_dir, *file_paths]
+    subprocess.run(command, capture_output=True, text=True, cwd=PROJECT_ROOT_FOLDER)
+    return [
+        os.path.join(output_dir, f"{get_filename(file_path)}.{extension}")
+        for file_path in file_paths
+    ]
+
+
+def parse_convert_to(convert_to: str) -> tuple:
+    """Splits a LibreOffice --convert-to value into its parts.
+
+    For example 'pdf:draw_pdf_Export:{"SinglePageSheets":{"type":"boolean","value":
+    "true"}}' becomes ("pdf", "draw_pdf_Export", {"SinglePageSheets": True}).
+
+    :param convert_to: (str) The target format, optionally followed by a filter name
+        and JSON filter options.
+
+    :returns: (tuple) The output extension, the filter name (or None) and a dictionary
+        of filter options.
+
+    """
+    parts = convert_to.split(":", 2)
+    extension = parts[0]
+    filter_name = parts[1] if len(parts) > 1 and parts[1] else None
+    filter_options = {}
+    if len(parts) > 2:
+        for name, option in json.loads(parts[2]).items():
+            value = option.get("value")
+            if option.get("type") == "boolean":
+                value = str(value).lower() == "true"
+            elif option.get("type") == "long":
+                value = int(value)
+            filter_options[name] = value
+    return extension, filter_name, filter_options
+
+
+class LibreOfficeWorker:
+    """A long running headless LibreOffice instance that converts documents to PDF.
+
+    Jobs are sent over a named UNO pipe. The instance runs against its own profile
+    directory and is restarted when it crashes or after max_jobs conversions.
+
+    """
+
+    def __init__(
+        self,
+        profile_dir: Optional[str] = None,
+        max_jobs: int = LIBRE_OFFICE_MAX_JOBS,
+        startup_timeout: int = 60,
+    ):
+        """Initializes the worker, LibreOffice itself is started on the first job.
+
+        :param profile_dir: (Optional[str]) The LibreOffice profile directory. If None,
+            a temporary one is created.
+        :param max_jobs: (int) The number of conversions after which LibreOffice is
+            restarted.
+        :param startup_timeout: (int) Seconds to wait for LibreOffice to accept
+            connections.
+
+        """
+        self.profile_dir = profile_dir or tempfile.mkdtemp(prefix="libre_office_profile_")
+        self.max_jobs = max_jobs
+        self.startup_timeout = startup_timeout
+        self.pipe_name = f"lazarus_libre_office_{uuid4().hex}"
+        self.process = None  # type: Optional[subprocess.Popen]
+        self.desktop = None
+        self.jobs = 0
+
+    @property
+    def is_alive(self) -> bool:
+        """Whether the LibreOffice process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Starts LibreOffice and connects to it.
+
+        :raises RuntimeError: If LibreOffice does not accept connections in time.
+
+        """
+        connection = f"pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"
+        command = [
+            PATH_TO_LIBRE_OFFICE,
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--nodefault",
+            "--norestore",
+            "--nolockcheck",
+            f"-env:UserInstallation={Path(self.profile_dir).as_uri()}",
+            f"--accept={connection}",
+        ]
+        self.process = subprocess.Popen(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            cwd=PROJECT_ROOT_FOLDER,
+        )
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.time() + self.startup_timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:{connection}")
+                break
+            except Exception:
+                if not self.is_alive or time.time() > deadline:
+                    self.stop()
+                    raise RuntimeError("LibreOffice did not start accepting connections")
+                time.sleep(0.25)
+
+        self.desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context
+        )
+        self.jobs = 0
+
+    def stop(self):
+        """Shuts LibreOffice down, killing it if it does not exit by itself."""
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+    def restart(self):
+        """Restarts LibreOffice with a fresh connection."""
+        self.stop()
+        self.start()
+
+    def convert(self, file_path: str, output_dir: str, convert_to: str = "pdf") -> str:
+        """Converts a document to PDF.
+
+        :param file_path: (str) The path to the file to convert.
+        :param output_dir: (str) The output directory for the converted file.
+        :param convert_to: (str) The --convert-to value, its filter options are
+            applied to the export.
+
+        :returns: (str) The path to the converted file.
+
+        """
+        if not self.is_alive or self.jobs >= self.max_jobs:
+            self.restart()
+
+        try:
+            output_file = self._convert(file_path, output_dir, convert_to)
+        except Exception as e:
+            # LibreOffice may have crashed part way through, retry once on a new instance
+            logger.warning(f"Restarting LibreOffice after failing on {file_path}: {e}")
+            self.restart()
+            output_file = self._convert(file_path, output_dir, convert_to)
+
+        self.jobs += 1
+        return output_file
+
+    def _convert(self, file_path: str, output_dir: str, convert_to: str) -> str:
+        extension, _, filter_options = parse_convert_to(convert_to)
+        output_file = os.path.join(output_dir, f"{get_filename(file_path)}.{extension}")
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(file_path)),
+            "_blank",
+            0,
+            (_property("Hidden", True),),
+        )
+        if document is None:
+            raise RuntimeError(f"LibreOffice could not open {file_path}")
+
+        try:
+            filter_data = tuple(_property(name, value) for name, value in filter_options.items())
+            properties = (
+                _property("FilterName", _get_pdf_export_filter(document)),
+                _property("Overwrite", True),
+                _property("FilterData", uno.Any("[]com.sun.star.beans.PropertyValue", filter_data)),
+            )
+            url = uno.systemPathToFileUrl(os.path.abspath(output_file))
+            uno.invoke(document, "storeToURL", (url, properties))
+        finally:
+            document.close(True)
+
+        return output_file
+
+
+class LibreOfficePool:
+    """A fixed size pool of LibreOfficeWorker instances shared between threads."""
+
+    def __init__(self, size: int = LIBRE_OFFICE_POOL_SIZE, max_jobs: int = LIBRE_OFFICE_MAX_JOBS):
+        """Initializes the pool, LibreOffice instances are started lazily.
+
+        :param size: (int) The number of LibreOffice instances.
+        :param max_jobs: (int) The number of conversions after which an instance is
+            restarted.
+
+        """
+        self.pid = os.getpid()
+        self.workers = [LibreOfficeWorker(max_jobs=max_jobs) for _ in range(max(1, size))]
+        self.idle = queue.Queue()  # type: queue.Queue
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def convert(self, file_path: str, output_dir: str, convert_to: str = "pdf") -> str:
+        """Converts a document on the next free LibreOffice instance.
+
+        :param file_path: (str) The path to the file to convert.
+        :param output_dir: (str) The output directory for the converted file.
+        :param convert_to: (str) The --convert-to value.
+
+        :returns: (str) The path to the converted file.
+
+        """
+        worker = self.idle.get()
+        try:
+            return worker.convert(file_path, output_dir, convert_to)
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        """Stops every LibreOffice instance and removes their profiles."""
+        if self.pid != os.getpid():
+            return
+        for worker in self.workers:
+            worker.stop()
+            shutil.rmtree(worker.profile_dir, ignore_errors=True)
+
+
+_pool: Optional[LibreOfficePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_libre_office_pool() -> LibreOfficePool:
+    """Returns the process wide LibreOfficePool, creating it on first use.
+
+    :returns: (LibreOfficePool) The pool.
+
+    """
+    global _pool
+    with _pool_lock:
+        # A forked child can't talk to its parent's LibreOffice connections.
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = LibreOfficePool()
+            atexit.register(_pool.close)
+    return _pool
+
+
+def close_libre_office_pool():
+    """Stops the LibreOffice instances of the process wide pool, if this process has one.
+
+    Conversion worker processes exit without running atexit handlers, so
+    use_isolated_profile registers this to run when they shut down.
+
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
+def _property(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def _get_pdf_export_filter(document) -> str:
+    for service, filter_name in PDF_EXPORT_FILTERS:
+        if document.supportsService(service):
+            return filter_name
+    return "writer_pdf_Export"
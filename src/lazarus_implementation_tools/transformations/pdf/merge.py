@@ -0,0 +1,258 @@
+import hashlib
+import logging
+import os
+import tempfile
+from io import BytesIO
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
+from lazarus_implementation_tools.file_system.utils import get_folder
+
+logger = logging.getLogger(__name__)
+
+
+class MergedInput(BaseModel):
+    """The outcome of adding one PDF to a merge."""
+
+    path: str
+    page_count: int = 0
+    error: Optional[str] = None
+
+
+class MergeReport(BaseModel):
+    """The outcome of merging PDFs, with one entry per input in order."""
+
+    output_path: str
+    page_count: int = 0
+    inputs: List[MergedInput] = []
+
+    @property
+    def skipped(self) -> List[MergedInput]:
+        """Inputs that could not be read and were left out of the merge."""
+        return [merged_input for merged_input in self.inputs if merged_input.error]
+
+
+class StreamingPdfWriter:
+    """Writes a PDF one page at a time instead of holding the whole document in memory.
+
+    Objects are written out as soon as they are copied. Objects that serialize to the
+    same bytes, like fonts and images shared by several inputs, are only written once.
+
+    """
+
+    PAGES_ID = 1
+    CATALOG_ID = 2
+
+    def __init__(self, stream: BinaryIO):
+        """Initializes the writer and writes the PDF header.
+
+        :param stream: A binary file object to write the PDF to.
+
+        """
+        self.stream = stream
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = self.CATALOG_ID + 1
+        self.written: Dict[bytes, int] = {}
+        self._reader_ids: Dict[Tuple[int, int], Optional[int]] = {}
+        self.stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_reader(self, reader: PdfReader, page_indexes: Optional[Iterable[int]] = None) -> int:
+        """Copies the pages of a PDF into the output.
+
+        The pages only become part of the document if all of them could be copied.
+
+        :param reader: The PdfReader to copy pages from.
+        :param page_indexes: The zero indexed pages to copy, in order. If None, copies
+            every page.
+
+        :returns: The number of pages added.
+
+        """
+        if reader.is_encrypted and not reader.decrypt(""):
+            raise ValueError("PDF is encrypted")
+
+        if page_indexes is None:
+            page_indexes = range(len(reader.pages))
+
+        self._reader_ids = {}
+        page_ids = []
+        for page_index in page_indexes:
+            page_ids.append(self._write_page(reader.pages[page_index]))
+            # Everything this page needed has been written, drop it from memory.
+            reader.resolved_objects.clear()
+
+        self.page_ids.extend(page_ids)
+        return len(page_ids)
+
+    def close(self):
+        """Writes the page tree, catalog and cross reference table."""
+        kids = ArrayObject(IndirectObject(page_id, 0, None) for page_id in self.page_ids)
+        pages = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Pages"),
+                NameObject("/Kids"): kids,
+                NameObject("/Count"): NumberObject(len(self.page_ids)),
+            }
+        )
+        catalog = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Catalog"),
+                NameObject("/Pages"): IndirectObject(self.PAGES_ID, 0, None),
+            }
+        )
+        self._write_object(self.PAGES_ID, self._serialize(pages))
+        self._write_object(self.CATALOG_ID, self._serialize(catalog))
+
+        xref_offset = self.stream.tell()
+        self.stream.write(f"xref\n0 {self.next_id}\n".encode())
+        self.stream.write(b"0000000000 65535 f \n")
+        for object_id in range(1, self.next_id):
+            # Ids reserved for objects that were never written, eg. from a failed input
+            offset = self.offsets.get(object_id)
+            if offset is None:
+                self.stream.write(b"0000000000 65535 f \n")
+            else:
+                self.stream.write(f"{offset:010d} 00000 n \n".encode())
+        self.stream.write(
+            f"trailer\n<< /Size {self.next_id} /Root {self.CATALOG_ID} 0 R >>\n".encode()
+        )
+        self.stream.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+    def _write_page(self, page: DictionaryObject) -> int:
+        new_page = DictionaryObject()
+        for key, value in page.items():
+            if key == "/Parent":
+                continue
+            new_page[NameObject(key)] = self._copy(value)
+        new_page[NameObject("/Parent")] = IndirectObject(self.PAGES_ID, 0, None)
+
+        page_id = self._allocate_id()
+        self._write_object(page_id, self._serialize(new_page))
+        return page_id
+
+    def _copy(self, obj):
+        """Copies an object from the reader, writing out the objects it references."""
+        if isinstance(obj, IndirectObject):
+            return self._copy_reference(obj)
+
+        if isinstance(obj, StreamObject):
+            new_stream = type(obj)()
+            new_stream._data = obj._data
+            for key, value in obj.items():
+                new_stream[NameObject(key)] = self._copy(value)
+            return new_stream
+
+        if isinstance(obj, DictionaryObject):
+            new_dict = DictionaryObject()
+            for key, value in obj.items():
+                new_dict[NameObject(key)] = self._copy(value)
+            return new_dict
+
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(value) for value in obj)
+
+        return obj
+
+    def _copy_reference(self, reference: IndirectObject):
+        key = (reference.idnum, reference.generation)
+        if key in self._reader_ids:
+            object_id = self._reader_ids[key]
+            if object_id is None:
+                # A reference cycle, the object needs its id before it is written
+                object_id = self._allocate_id()
+                self._reader_ids[key] = object_id
+            return IndirectObject(object_id, 0, None)
+
+        obj = reference.get_object()
+        if obj is None or (
+            isinstance(obj, DictionaryObject) and obj.get("/Type") in ("/Page", "/Pages")
+        ):
+            # Links to other pages (annotations, destinations) would drag in the source
+            # page tree.
+            return NullObject()
+
+        self._reader_ids[key] = None
+        data = self._serialize(self._copy(obj))
+        object_id = self._reader_ids[key]
+        if object_id is None:
+            digest = hashlib.sha256(data).digest()
+            object_id = self.written.get(digest)
+            if object_id is None:
+                object_id = self._allocate_id()
+                self.written[digest] = object_id
+                self._write_object(object_id, data)
+        else:
+            self._write_object(object_id, data)
+
+        self._reader_ids[key] = object_id
+        return IndirectObject(object_id, 0, None)
+
+    def _allocate_id(self) -> int:
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def _write_object(self, object_id: int, data: bytes):
+        self.offsets[object_id] = self.stream.tell()
+        self.stream.write(f"{object_id} 0 obj\n".encode())
+        self.stream.write(data)
+        self.stream.write(b"\nendobj\n")
+
+    @staticmethod
+    def _serialize(obj) -> bytes:
+        buffer = BytesIO()
+        obj.write_to_stream(buffer, None)
+        return buffer.getvalue()
+
+
+def stream_merge_pdfs(pdf_paths: Iterable[str], output_path: str) -> MergeReport:
+    """Merges PDF files into one, streaming pages to the output as they are read.
+
+    Only one input is open at a time and pages are written out as soon as they are
+    copied, so memory use does not grow with the size of the merged document. Inputs
+    that can't be read are skipped and reported.
+
+    :param pdf_paths: An iterable of paths to the PDF files to merge.
+    :param output_path: The output path for the merged PDF file.
+
+    :returns: A MergeReport with the page count of every input.
+
+    """
+    report = MergeReport(output_path=output_path)
+    output_folder = get_folder(os.path.abspath(output_path))
+    # Written next to the output and moved into place at the end, so an input can also
+    # be the output.
+    handle, tmp_path = tempfile.mkstemp(dir=output_folder, suffix=".pdf")
+    try:
+        with os.fdopen(handle, "wb") as output_file:
+            writer = StreamingPdfWriter(output_file)
+            for pdf_path in pdf_paths:
+                merged_input = MergedInput(path=pdf_path)
+                try:
+                    with open(pdf_path, "rb") as input_file:
+                        merged_input.page_count = writer.add_reader(PdfReader(input_file))
+                except Exception as e:
+                    merged_input.error = str(e) or type(e).__name__
+                    logger.info(f"Skipping unreadable PDF file {pdf_path}: {merged_input.error}")
+                report.inputs.append(merged_input)
+            writer.close()
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    report.page_count = len(writer.page_ids)
+    return report
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel
+from PyPDF2 import PdfReader
+
+from lazarus_implementation_tools.config import (
+    CACHE_FOLDER,
+    PDF_METADATA_CACHE,
+    PDF_METADATA_CACHE_SIZE_MB,
+)
+from lazarus_implementation_tools.file_system.cache import FileCache
+
+logger = logging.getLogger(__name__)
+
+# Bump when PdfMetadata changes so stale cache entries are ignored
+METADATA_CACHE_VERSION = 2
+
+_metadata_cache = None  # type: Optional[FileCache]
+
+
+class PdfMetadata(BaseModel):
+    """What can be learned about a PDF from its trailer and page tree alone."""
+
+    page_count: Optional[int] = None
+    # (width, height) in points as the page is displayed, ie. of the crop box after
+    # rotation
+    page_sizes: List[Tuple[float, float]] = []
+    encrypted: bool = False
+    # True if any page uses a font, a PDF of scanned images has none
+    has_text_layer: bool = False
+
+
+def get_metadata_cache() -> FileCache:
+    """Returns the cache PDF metadata is kept in.
+
+    :returns: (FileCache) The metadata cache.
+
+    """
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = FileCache(
+            os.path.join(CACHE_FOLDER, "pdf_metadata"),
+            max_size=PDF_METADATA_CACHE_SIZE_MB * 1024 * 1024,
+        )
+    return _metadata_cache
+
+
+def get_metadata_cache_key(pdf_path: str) -> str:
+    """Builds the cache key for a PDF from its path, modification time and size.
+
+    :param pdf_path: (str) The path to the PDF file.
+
+    :returns: (str) The cache key.
+
+    """
+    stat = os.stat(pdf_path)
+    key = f"{METADATA_CACHE_VERSION}:{os.path.abspath(pdf_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def read_pdf_metadata(pdf_path: str, use_cache: bool = PDF_METADATA_CACHE) -> PdfMetadata:
+    """Reads the page count, page sizes, encryption and text layer presence of a PDF.
+
+    Only the trailer and page tree are parsed, page contents are never decoded. Results
+    are cached on disk until the file changes.
+
+    :param pdf_path: (str) The path to the PDF file.
+    :param use_cache: (bool) If True, reuse metadata read earlier for the same file.
+
+    :returns: (PdfMetadata) The metadata of the PDF.
+
+    """
+    cache_key = None
+    if use_cache:
+        cache_key = get_metadata_cache_key(pdf_path)
+        cached_path = get_metadata_cache().get(cache_key, "json")
+        if cached_path:
+            try:
+                with open(cached_path) as file:
+                    return PdfMetadata.model_validate_json(file.read())
+            except (OSError, ValueError):
+                # Evicted or partly written by another process, read it again
+                pass
+
+    with open(pdf_path, "rb") as file:
+        metadata = _read_metadata(PdfReader(file))
+
+    if cache_key:
+        get_metadata_cache().put_bytes(cache_key, metadata.model_dump_json().encode(), "json")
+    return metadata
+
+
+def _read_metadata(reader: PdfReader) -> PdfMetadata:
+    metadata = PdfMetadata(encrypted=reader.is_encrypted)
+    if reader.is_encrypted and not reader.decrypt(""):
+        # The page tree can't be read without the password
+        return metadata
+
+    for page in reader.pages:
+        # Viewers show the crop box, which defaults to the media box
+        width, height = float(page.cropbox.width), float(page.cropbox.height)
+        if page.get("/Rotate", 0) % 180:
+            width, height = height, width
+        metadata.page_sizes.append((width, height))
+
+        if not metadata.has_text_layer:
+            resources = page.get("/Resources")
+            resources = resources.get_object() if resources else {}
+            if resources.get("/Font"):
+                metadata.has_text_layer = True
+
+    metadata.page_count = len(metadata.page_sizes)
+    return metadata
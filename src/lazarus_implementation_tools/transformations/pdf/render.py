@@ -0,0 +1,360 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from typing import Hashable, Iterator, List, Optional, Tuple
+
+from pdf2image import convert_from_path
+from PIL import Image
+
+from lazarus_implementation_tools.config import (
+    CACHE_FOLDER,
+    PDF_RENDER_CACHE,
+    PDF_RENDER_CACHE_SIZE_MB,
+    PDF_RENDER_DISK_CACHE_SIZE_MB,
+    PDF_RENDER_THREADS,
+)
+from lazarus_implementation_tools.file_system.cache import FileCache
+from lazarus_implementation_tools.file_system.utils import get_file_hash
+from lazarus_implementation_tools.transformations.pdf.metadata import read_pdf_metadata
+
+logger = logging.getLogger(__name__)
+
+_render_cache = None  # type: Optional[RenderCache]
+# The number of PDF versions whose hashes are kept
+PDF_KEY_CACHE_SIZE = 1024
+
+
+class ImageCache:
+    """A thread safe in-memory LRU cache of PIL images, capped by their size in bytes.
+
+    Images are copied on the way in and out, so callers are free to draw on them.
+
+    """
+
+    def __init__(self, max_size: int):
+        """Initializes an empty cache.
+
+        :param max_size: (int) The maximum size of the cached images in bytes.
+
+        """
+        self.max_size = max_size
+        self.size = 0
+        self._images: OrderedDict[Hashable, Image.Image] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._images
+
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        """Looks up an image, marking it as recently used.
+
+        :param key: The cache key.
+
+        :returns: (Optional[Image.Image]) A copy of the cached image, or None on a miss.
+
+        """
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                return None
+            self._images.move_to_end(key)
+        return image.copy()
+
+    def put(self, key: Hashable, image: Image.Image):
+        """Stores a copy of an image, evicting the least recently used images if needed.
+
+        :param key: The cache key.
+        :param image: (Image.Image) The image to store.
+
+        """
+        image_size = get_image_size(image)
+        if image_size > self.max_size:
+            return
+
+        image = image.copy()
+        with self._lock:
+            previous = self._images.pop(key, None)
+            if previous is not None:
+                self.size -= get_image_size(previous)
+            self._images[key] = image
+            self.size += image_size
+            while self.size > self.max_size:
+                _, evicted = self._images.popitem(last=False)
+                self.size -= get_image_size(evicted)
+
+    def clear(self):
+        """Removes every image from the cache."""
+        with self._lock:
+            self._images.clear()
+            self.size = 0
+
+
+def get_image_size(image: Image.Image) -> int:
+    """Returns the approximate memory used by an image's pixels in bytes.
+
+    :param image: (Image.Image) The image.
+
+    :returns: (int) The size in bytes.
+
+    """
+    return image.width * image.height * len(image.getbands())
+
+
+class RenderCache:
+    """Rendered pages kept in two tiers, an in-memory LRU in front of a disk cache.
+
+    Pages found on disk are promoted to memory. Disk entries are shared between
+    processes and survive restarts.
+
+    """
+
+    def __init__(self, memory: ImageCache, disk: Optional[FileCache] = None):
+        """Initializes the cache from its tiers.
+
+        :param memory: (ImageCache) The in-memory tier.
+        :param disk: (Optional[FileCache]) The disk tier, or None to keep pages in memory
+            only.
+
+        """
+        self.memory = memory
+        self.disk = disk
+
+    def __contains__(self, key: Tuple) -> bool:
+        if key in self.memory:
+            return True
+        return self.disk is not None and os.path.exists(
+            self.disk.path_for(self._disk_key(key), "png")
+        )
+
+    def get(self, key: Tuple) -> Optional[Image.Image]:
+        """Looks up a rendered page.
+
+        :param key: A (pdf_key, page_number, dpi, grayscale) tuple.
+
+        :returns: (Optional[Image.Image]) A copy of the page image, or None on a miss.
+
+        """
+        image = self.memory.get(key)
+        if image is not None or self.disk is None:
+            return image
+
+        path = self.disk.get(self._disk_key(key), "png")
+        if path is None:
+            return None
+        try:
+            with Image.open(path) as file:
+                image = file.copy()
+        except (OSError, ValueError):
+            # Evicted or unreadable, render it again
+            return None
+        self.memory.put(key, image)
+        return image
+
+    def put(self, key: Tuple, image: Image.Image):
+        """Stores a rendered page in both tiers.
+
+        :param key: A (pdf_key, page_number, dpi, grayscale) tuple.
+        :param image: (Image.Image) The page image.
+
+        """
+        self.memory.put(key, image)
+        if self.disk is not None:
+            buffer = BytesIO()
+            # Lossless, favouring speed over size
+            image.save(buffer, format="PNG", compress_level=1)
+            self.disk.put_bytes(self._disk_key(key), buffer.getvalue(), "png")
+
+    def clear(self):
+        """Removes every page from both tiers."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    @staticmethod
+    def _disk_key(key: Tuple) -> str:
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+def get_render_cache() -> RenderCache:
+    """Returns the process wide cache of rendered pages.
+
+    :returns: (RenderCache) The render cache.
+
+    """
+    global _render_cache
+    if _render_cache is None:
+        disk = None
+        if PDF_RENDER_DISK_CACHE_SIZE_MB > 0:
+            disk = FileCache(
+                os.path.join(CACHE_FOLDER, "renders"),
+                max_size=PDF_RENDER_DISK_CACHE_SIZE_MB * 1024 * 1024,
+            )
+        _render_cache = RenderCache(
+            ImageCache(max_size=PDF_RENDER_CACHE_SIZE_MB * 1024 * 1024), disk
+        )
+    return _render_cache
+
+
+def get_pdf_key(pdf_path: str) -> str:
+    """Returns the content hash of a PDF, hashing each version of the file only once.
+
+    :param pdf_path: (str) The path to the PDF file.
+
+    :returns: (str) The sha256 of the file.
+
+    """
+    stat = os.stat(pdf_path)
+    return hash_pdf_version(os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=PDF_KEY_CACHE_SIZE)
+def hash_pdf_version(pdf_path: str, mtime_ns: int, size: int) -> str:
+    """Hashes a PDF, remembering the hashes of the most recently used file versions.
+
+    :param pdf_path: (str) The absolute path to the PDF file.
+    :param mtime_ns: (int) The modification time of the file, part of the cache key.
+    :param size: (int) The size of the file, part of the cache key.
+
+    :returns: (str) The sha256 of the file.
+
+    """
+    return get_file_hash(pdf_path)
+
+
+def render_pages(
+    pdf_path: str,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    dpi: int = 200,
+    grayscale: bool = False,
+    thread_count: int = PDF_RENDER_THREADS,
+    use_cache: bool = PDF_RENDER_CACHE,
+) -> List[Image.Image]:
+    """Rasterizes pages of a PDF into memory.
+
+    Pages rendered earlier at the same settings are taken from the render cache, so
+    OCR, tidying, annotation and grading can share page images instead of rasterizing
+    the same PDF several times.
+
+    :param pdf_path: (str) The path to the PDF file.
+    :param first_page: (int) The first page (1 indexed) to render. If None, starts at
+        the first page.
+    :param last_page: (int) The last page (1 indexed) to render. If None, renders to
+        the last page.
+    :param dpi: (int) The resolution to render at.
+    :param grayscale: (bool) If True, renders single channel grayscale images.
+    :param thread_count: (int) The number of poppler processes rendering at once.
+    :param use_cache: (bool) If True, reuse and store pages in the render cache.
+
+    :returns: (List[Image.Image]) The rendered pages, in order.
+
+    """
+    pages = iter_rendered_pages(
+        pdf_path, first_page, last_page, dpi, grayscale, thread_count, use_cache
+    )
+    return [image for _, image in pages]
+
+
+def iter_rendered_pages(
+    pdf_path: str,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    dpi: int = 200,
+    grayscale: bool = False,
+    thread_count: int = PDF_RENDER_THREADS,
+    use_cache: bool = PDF_RENDER_CACHE,
+) -> Iterator[Tuple[int, Image.Image]]:
+    """Rasterizes pages of a PDF a few at a time, like render_pages.
+
+    At most thread_count pages are held in memory at once, which keeps high resolution
+    renders of long PDFs from exhausting memory.
+
+    :returns: (Iterator[Tuple[int, Image.Image]]) (page_number, image) tuples, in order.
+
+    :raises RuntimeError: If poppler renders fewer pages than were asked for.
+
+    """
+    first_page = first_page or 1
+    page_count = read_pdf_metadata(pdf_path).page_count
+    if last_page is None or (page_count and last_page > page_count):
+        last_page = page_count
+    if last_page is None:
+        # Unreadable page tree, let poppler work out the pages
+        images = _render(pdf_path, first_page, None, dpi, grayscale, thread_count)
+        yield from enumerate(images, start=first_page)
+        return
+
+    cache = get_render_cache() if use_cache else None
+    pdf_key = get_pdf_key(pdf_path) if cache else None
+    chunk_size = max(1, thread_count)
+
+    page_number = first_page
+    while page_number <= last_page:
+        image = cache.get((pdf_key, page_number, dpi, grayscale)) if cache else None
+        if image is not None:
+            yield page_number, image
+            page_number += 1
+            continue
+
+        # Render the run of missing pages that follows, one chunk at a time
+        end_page = page_number
+        while end_page < last_page and end_page - page_number + 1 < chunk_size:
+            if cache and (pdf_key, end_page + 1, dpi, grayscale) in cache:
+                break
+            end_page += 1
+
+        rendered = _render(pdf_path, page_number, end_page, dpi, grayscale, thread_count)
+        if len(rendered) != end_page - page_number + 1:
+            # The images can't be matched to their pages, and asking again won't help
+            raise RuntimeError(
+                f"Rendered {len(rendered)} images for pages {page_number} to {end_page} "
+                f"of {pdf_path}"
+            )
+        for image in rendered:
+            if cache:
+                cache.put((pdf_key, page_number, dpi, grayscale), image)
+            yield page_number, image
+            page_number += 1
+
+
+def get_page_runs(page_numbers: List[int]) -> List[Tuple[int, int]]:
+    """Groups sorted page numbers into runs of consecutive pages.
+
+    :param page_numbers: (List[int]) Sorted page numbers.
+
+    :returns: (List[Tuple[int, int]]) (first_page, last_page) tuples, inclusive.
+
+    """
+    runs: List[Tuple[int, int]] = []
+    for page_number in page_numbers:
+        if runs and runs[-1][1] + 1 == page_number:
+            runs[-1] = (runs[-1][0], page_number)
+        else:
+            runs.append((page_number, page_number))
+    return runs
+
+
+def _render(pdf_path, first_page, last_page, dpi, grayscale, thread_count) -> List[Image.Image]:
+    if last_page:
+        # Poppler splits the pages between processes, more than one per page is waste
+        thread_count = max(1, min(thread_count, last_page - first_page + 1))
+    with tempfile.TemporaryDirectory() as path:
+        images = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            grayscale=grayscale,
+            thread_count=thread_count,
+            output_folder=path,
+        )
+        # The images are read lazily from the temporary folder, load them before it goes
+        for image in images:
+            image.load()
+    return images
@@ -0,0 +1,250 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ContentStream
+
+from lazarus_implementation_tools.file_system.utils import (
+    append_to_filename,
+    get_filename_with_ext,
+    mkdir,
+)
+from lazarus_implementation_tools.transformations.pdf.merge import StreamingPdfWriter
+
+logger = logging.getLogger(__name__)
+
+# A 1 indexed, inclusive page range like trim_pdf takes
+PageRange = Tuple[int, int]
+
+# Content stream operators that paint a path or a shading onto the page
+PAINT_OPERATORS = {b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*", b"sh"}
+FILL_OPERATORS = {b"f", b"F", b"f*"}
+STROKE_OPERATORS = {b"S", b"s"}
+# Colors that leave a white page white, per color setting operator
+WHITE_COLORS = {
+    b"g": [[1]],
+    b"G": [[1]],
+    b"rg": [[1, 1, 1]],
+    b"RG": [[1, 1, 1]],
+    b"k": [[0, 0, 0, 0]],
+    b"K": [[0, 0, 0, 0]],
+}
+
+
+def split_pdf(
+    input_path: str,
+    ranges: List[PageRange],
+    output_folder: Optional[str] = None,
+    max_workers: int = 1,
+) -> List[str]:
+    """Splits a PDF into one file per page range, parsing the input only once.
+
+    :param input_path: The path to the input PDF file.
+    :param ranges: A list of (start_page, end_page) tuples, 1 indexed and inclusive. End
+        pages past the end of the PDF are clamped to the last page.
+    :param output_folder: The folder to write the files to. If None, uses the folder of
+        the input.
+    :param max_workers: The number of processes writing files. Each process parses the
+        input once.
+
+    :returns: The paths to the split PDF files, in the order of the ranges.
+
+    :raises ValueError: If a range starts outside of the PDF or ends before it starts.
+
+    """
+    with open(input_path, "rb") as file:
+        reader = PdfReader(file)
+        page_count = len(reader.pages)
+
+        clamped_ranges = []
+        for start_page, end_page in ranges:
+            end_page = min(end_page, page_count)
+            if start_page < 1 or start_page > end_page:
+                raise ValueError(
+                    f"Invalid page range {start_page}-{end_page} for a PDF with {page_count} pages."
+                )
+            clamped_ranges.append((start_page, end_page))
+
+        return _write_ranges(input_path, reader, clamped_ranges, output_folder, max_workers)
+
+
+def split_pdf_by_bookmarks(
+    input_path: str, output_folder: Optional[str] = None, max_workers: int = 1
+) -> List[str]:
+    """Splits a PDF into one file per top level bookmark.
+
+    Each file runs from the page a bookmark points at up to the page before the next
+    one. Pages before the first bookmark are kept with it.
+
+    :param input_path: The path to the input PDF file.
+    :param output_folder: The folder to write the files to. If None, uses the folder of
+        the input.
+    :param max_workers: The number of processes writing files.
+
+    :returns: The paths to the split PDF files, or the whole PDF as a single file if it
+        has no bookmarks.
+
+    """
+    with open(input_path, "rb") as file:
+        reader = PdfReader(file)
+        page_count = len(reader.pages)
+
+        start_pages = set()
+        for bookmark in reader.outline:
+            # Nested lists hold the children of the previous bookmark
+            if isinstance(bookmark, list):
+                continue
+            page_index = reader.get_destination_page_number(bookmark)
+            if page_index is not None and page_index >= 0:
+                start_pages.add(page_index + 1)
+        start_pages.discard(1)
+
+        ranges = []
+        start_page = 1
+        for next_start_page in sorted(start_pages):
+            ranges.append((start_page, next_start_page - 1))
+            start_page = next_start_page
+        ranges.append((start_page, page_count))
+
+        return _write_ranges(input_path, reader, ranges, output_folder, max_workers)
+
+
+def split_pdf_by_blank_pages(
+    input_path: str, output_folder: Optional[str] = None, max_workers: int = 1
+) -> List[str]:
+    """Splits a PDF at its blank pages, which are left out of the files.
+
+    A page counts as blank if it has no text, no images and no drawings. Scanned
+    separator sheets are images and are not detected, OCR or tidy the PDF first.
+
+    :param input_path: The path to the input PDF file.
+    :param output_folder: The folder to write the files to. If None, uses the folder of
+        the input.
+    :param max_workers: The number of processes writing files.
+
+    :returns: The paths to the split PDF files.
+
+    """
+    with open(input_path, "rb") as file:
+        reader = PdfReader(file)
+
+        ranges = []
+        start_page = None
+        for page_number, page in enumerate(reader.pages, start=1):
+            if is_blank_page(page):
+                if start_page is not None:
+                    ranges.append((start_page, page_number - 1))
+                start_page = None
+            elif start_page is None:
+                start_page = page_number
+        if start_page is not None:
+            ranges.append((start_page, len(reader.pages)))
+
+        return _write_ranges(input_path, reader, ranges, output_folder, max_workers)
+
+
+def is_blank_page(page) -> bool:
+    """Checks if a PDF page has no text, no images and no drawings.
+
+    Pages drawn only with vector paths, like charts, signatures or forms, are not
+    blank. Shapes filled or stroked in white, eg. a page background, are ignored.
+
+    :param page: A PyPDF2 PageObject.
+
+    :returns: True if the page is blank.
+
+    """
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources else {}
+    if resources.get("/XObject"):
+        return False
+    if page.extract_text().strip():
+        return False
+    return not paints_paths(page)
+
+
+def paints_paths(page) -> bool:
+    """Checks if a PDF page paints any visible path or shading.
+
+    :param page: A PyPDF2 PageObject.
+
+    :returns: True if the content stream paints something other than white.
+
+    """
+    contents = page.get_contents()
+    if contents is None:
+        return False
+    # Painting starts out in black, colors are saved and restored with the graphics state
+    white_fill = white_stroke = False
+    saved_states = []
+    for operands, operator in ContentStream(contents, page.pdf).operations:
+        if operator == b"q":
+            saved_states.append((white_fill, white_stroke))
+        elif operator == b"Q":
+            if saved_states:
+                white_fill, white_stroke = saved_states.pop()
+        elif operator in WHITE_COLORS:
+            is_white = [float(operand) for operand in operands] in WHITE_COLORS[operator]
+            if operator.islower():
+                white_fill = is_white
+            else:
+                white_stroke = is_white
+        elif operator in (b"scn", b"sc"):
+            white_fill = False
+        elif operator in (b"SCN", b"SC"):
+            white_stroke = False
+        elif operator in FILL_OPERATORS:
+            if not white_fill:
+                return True
+        elif operator in STROKE_OPERATORS:
+            if not white_stroke:
+                return True
+        elif operator in PAINT_OPERATORS:
+            return True
+    return False
+
+
+def _write_ranges(
+    input_path: str,
+    reader: PdfReader,
+    ranges: List[PageRange],
+    output_folder: Optional[str],
+    max_workers: int,
+) -> List[str]:
+    if output_folder:
+        mkdir(output_folder)
+        base_path = os.path.join(output_folder, get_filename_with_ext(input_path))
+    else:
+        base_path = input_path
+
+    jobs = [
+        (start_page, end_page, append_to_filename(base_path, f"_{start_page}-{end_page}"))
+        for start_page, end_page in ranges
+    ]
+
+    if max_workers <= 1 or len(jobs) < 2:
+        _write_jobs(reader, jobs)
+    else:
+        # Contiguous chunks, so each process only resolves the objects of its own pages
+        chunk_size = -(-len(jobs) // max_workers)
+        chunks = [jobs[i : i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            list(executor.map(_write_jobs_from_path, [input_path] * len(chunks), chunks))
+
+    return [output_path for _, _, output_path in jobs]
+
+
+def _write_jobs_from_path(input_path: str, jobs: List[Tuple[int, int, str]]):
+    with open(input_path, "rb") as file:
+        _write_jobs(PdfReader(file), jobs)
+
+
+def _write_jobs(reader: PdfReader, jobs: List[Tuple[int, int, str]]):
+    for start_page, end_page, output_path in jobs:
+        with open(output_path, "wb") as output_file:
+            writer = StreamingPdfWriter(output_file)
+            writer.add_reader(reader, range(start_page - 1, end_page))
+            writer.close()
+        logger.debug(f"Wrote pages {start_page}-{end_page} to {output_path}")
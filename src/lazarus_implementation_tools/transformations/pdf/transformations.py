@@ -1,15 +1,14 @@
 import math
-import tempfile
 from typing import List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 from deskew import determine_skew
-from pdf2image import convert_from_path
 from PIL import Image
 
 from lazarus_implementation_tools.file_system.utils import append_to_filename
 from lazarus_implementation_tools.general.core import log_timing
+from lazarus_implementation_tools.transformations.pdf.render import iter_rendered_pages
 
 
 class PDFTidy:
@@ -41,18 +40,16 @@ class PDFTidy:
         if destination_path is None:
             destination_path = append_to_filename(self.pdf_path, "_tidied")
 
-        with tempfile.TemporaryDirectory() as path:
-            image_objects = convert_from_path(self.pdf_path, output_folder=path)
-            completed_image_objects = []
-            for image_object in image_objects:
-                if deskew:
-                    image_object = self.deskew(image_object)
+        completed_image_objects = []
+        for _, image_object in iter_rendered_pages(self.pdf_path):
+            if deskew:
+                image_object = self.deskew(image_object)
 
-                if auto_crop:
-                    image_object = self.auto_crop(image_object)
-                completed_image_objects.append(image_object)
+            if auto_crop:
+                image_object = self.auto_crop(image_object)
+            completed_image_objects.append(image_object)
 
-            compile_images_to_pdf(completed_image_objects, destination_path)
+        compile_images_to_pdf(completed_image_objects, destination_path)
 
         return destination_path
 
@@ -1,11 +1,14 @@
 import logging
 import os
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
-import PyPDF2
-from pdf2image import convert_from_path
+from PIL import Image
 from PyPDF2 import PdfReader, PdfWriter
 
+from lazarus_implementation_tools.config import (
+    PDF_CONVERSION_WORKERS,
+    PDF_RENDER_THREADS,
+)
 from lazarus_implementation_tools.file_system.utils import (
     append_to_filename,
     get_filename,
@@ -19,40 +22,59 @@ from lazarus_implementation_tools.general.pydantic_models import (
     TextBox,
 )
 from lazarus_implementation_tools.transformations.pdf.bounding_boxes import (
+    Annotation,
+    draw_annotations_on_pdf,
     draw_box_on_pdf,
     draw_polygon_on_pdf,
     draw_text_on_pdf,
 )
 from lazarus_implementation_tools.transformations.pdf.core import (
     convert_file_to_pdf,
+    convert_files_to_pdf,
     convert_folder_to_pdf,
 )
 from lazarus_implementation_tools.transformations.pdf.core import (
     merge_pdfs as core_merge_pdfs,
 )
+from lazarus_implementation_tools.transformations.pdf.metadata import read_pdf_metadata
+from lazarus_implementation_tools.transformations.pdf.render import (
+    iter_rendered_pages,
+    render_pages,
+)
+from lazarus_implementation_tools.transformations.pdf.split import (
+    split_pdf as core_split_pdf,
+)
 from lazarus_implementation_tools.transformations.pdf.transformations import PDFTidy
 
 logger = logging.getLogger(__name__)
 
+# pdf2image formats and the file extensions poppler gives them
+IMAGE_FILE_EXTENSIONS = {"jpeg": "jpg", "tiff": "tif"}
+
 
 def convert_to_pdf(
-    path: Union[str, List], output_dir: Optional[str] = None, recursive=False
+    path: Union[str, List],
+    output_dir: Optional[str] = None,
+    recursive=False,
+    max_workers: int = PDF_CONVERSION_WORKERS,
 ) -> List[str]:
     """Converts a file or directory of files to PDF.
 
+    Lists of files and directories are converted in parallel.
+
     :param path: The file or directory path to convert.
     :param output_dir: The output directory for the converted PDF files. If None, uses
         the same directory as the input files.
     :param recursive: If True, recursively convert files in subdirectories.
+    :param max_workers: The maximum number of conversions running at once.
 
     :returns: A list of paths to the converted PDF files.
 
     """
     results = []
     if isinstance(path, list):
-        for path_item in path:
-            results.append(convert_file_to_pdf(path_item, output_dir))
-            return results
+        report = convert_files_to_pdf(path, output_dir, max_workers=max_workers)
+        return report.converted
 
     if isinstance(path, str):
         if not os.path.exists(path):
@@ -64,7 +86,9 @@ def convert_to_pdf(
         if os.path.isfile(path):
             return [convert_file_to_pdf(path, output_dir)]
 
-        return convert_folder_to_pdf(path, output_dir, recursive=recursive)  # type: ignore
+        return convert_folder_to_pdf(  # type: ignore
+            path, output_dir, recursive=recursive, max_workers=max_workers
+        )
 
     return results
 
@@ -91,16 +115,16 @@ def trim_pdf(
     if output_path is None:
         output_path = append_to_filename(input_path, f"_{start_page}-{end_page}")
 
-    num_pages = get_number_of_pages(input_path)
+    # Read the input PDF
+    reader = PdfReader(input_path)
+
+    num_pages = len(reader.pages)
     if end_page > num_pages:
         end_page = num_pages
     # Ensure the page numbers are zero-indexed
     start_page -= 1
     end_page -= 1
 
-    # Read the input PDF
-    reader = PdfReader(input_path)
-
     # Create a PDF writer object
     writer = PdfWriter()
 
@@ -115,18 +139,36 @@ def trim_pdf(
     return output_path
 
 
+def split_pdf(
+    input_path: str, ranges: List[Tuple[int, int]], output_folder: Optional[str] = None
+) -> List[str]:
+    """Splits a PDF file into one file per page range.
+
+    :param input_path: The file path of the PDF file.
+    :param ranges: The (start_page, end_page) ranges, 1-indexed and inclusive.
+    :param output_folder: The folder the parts are written to, defaults to the folder
+        of the PDF file.
+
+    :returns: The file paths of the parts, in the order of the ranges.
+
+    :raises ValueError: If a range starts outside of the PDF or ends before it starts.
+
+    """
+    return core_split_pdf(input_path, ranges, output_folder)
+
+
 def get_number_of_pages(pdf_path: str) -> Optional[int]:
     """Returns the number of pages in a PDF file.
 
+    The count is read from the page tree and cached until the file changes.
+
     :param pdf_path: The file path of the PDF file.
 
     :returns: The number of pages in the PDF file.
 
     """
     try:
-        with open(pdf_path, "rb") as file:
-            reader = PyPDF2.PdfReader(file)
-            return len(reader.pages)
+        return read_pdf_metadata(pdf_path).page_count
     except Exception as e:
         logging.error(f"Error: {e}")
         return None
@@ -266,12 +308,59 @@ def draw_text_boxes(
     return destination_path
 
 
+def annotate_pdf(
+    pdf_path: str,
+    annotations: List[Annotation],
+    destination_path: Optional[str] = None,
+    box_color=COLOR["red"],
+    border_color=COLOR["red"],
+    fill_color=COLOR["transparent"],
+    text_color=COLOR["black"],
+) -> Optional[str]:
+    """Draws bounding boxes, polygons and text boxes on a PDF file in a single pass.
+
+    :param pdf_path: The path to the input PDF file.
+    :param annotations: A mixed list of BoundingBox, Polygon and TextBox objects.
+    :param destination_path: The output path for the annotated PDF. If None, uses a
+        default name.
+    :param box_color: Outline color of the bounding boxes.
+    :param border_color: Outline color of the polygons.
+    :param fill_color: Fill color of the polygons.
+    :param text_color: Text color
+
+    :returns: The path to the annotated PDF, or None if no annotations are provided.
+
+    """
+    if not annotations:
+        return None
+
+    if destination_path is None:
+        destination_path = append_to_filename(pdf_path, "_annotated")
+
+    draw_annotations_on_pdf(
+        input_pdf_path=pdf_path,
+        output_pdf_path=destination_path,
+        annotations=annotations,
+        box_color=box_color,
+        border_color=border_color,
+        fill_color=fill_color,
+        text_color=text_color,
+    )
+
+    return destination_path
+
+
 def convert_pdf_to_images(
     pdf_path: str,
     start_page: Optional[int] = None,
     end_page: Optional[int] = None,
     output_folder: Optional[str] = None,
-) -> str:
+    dpi: int = 300,
+    fmt: str = "jpeg",
+    grayscale: bool = False,
+    thread_count: int = PDF_RENDER_THREADS,
+    in_memory: bool = False,
+) -> Union[str, List[Image.Image]]:
     """Converts a PDF file to images.
 
     :param pdf_path: The path to the input PDF file.
@@ -281,24 +370,68 @@ def convert_pdf_to_images(
         pages.
     :param output_folder: The output folder for the images. If None, uses a default
         name.
+    :param dpi: The resolution to render the pages at.
+    :param fmt: The image format of the files, eg. "jpeg", "png" or "tiff".
+    :param grayscale: If True, renders single channel grayscale images.
+    :param thread_count: The number of poppler processes rendering at once.
+    :param in_memory: If True, returns the page images instead of writing files. The
+        pages are shared through the render cache.
 
-    :returns: The path to the output folder containing the images.
+    :returns: The path to the output folder containing the images, or the list of page
+        images if in_memory is True.
 
     """
-    if not output_folder:
-        filename = get_filename(pdf_path)
-        folder = get_folder(pdf_path)
-        folder = f"{folder}/{filename}_images"
-        mkdir(folder)
-        output_folder = folder
-
-    convert_from_path(
-        pdf_path=pdf_path,
-        dpi=300,
+    if in_memory:
+        return render_pages(
+            pdf_path,
+            first_page=start_page,
+            last_page=end_page,
+            dpi=dpi,
+            grayscale=grayscale,
+            thread_count=thread_count,
+        )
+
+    output_folder = output_folder or get_image_folder(pdf_path)
+    mkdir(output_folder)
+
+    page_count = get_number_of_pages(pdf_path)
+    pages = iter_rendered_pages(
+        pdf_path,
         first_page=start_page,
         last_page=end_page,
-        fmt="jpeg",
-        output_folder=output_folder,
-        output_file="page_",
+        dpi=dpi,
+        grayscale=grayscale,
+        thread_count=thread_count,
     )
+    for page_number, image in pages:
+        image.save(os.path.join(output_folder, get_page_image_name(page_number, page_count, fmt)))
     return output_folder
+
+
+def get_image_folder(pdf_path: str) -> str:
+    """Returns the default folder page images of a PDF are written to.
+
+    :param pdf_path: The path to the PDF file.
+
+    :returns: The "<name>_images" folder next to the PDF.
+
+    """
+    return f"{get_folder(pdf_path)}/{get_filename(pdf_path)}_images"
+
+
+def get_page_image_name(page_number: int, page_count: Optional[int], fmt: str = "jpeg") -> str:
+    """Returns the file name convert_pdf_to_images gives a page image.
+
+    Pages are named like pdftoppm names them, "page_0001-07.jpg" with the page number
+    padded to the width of the page count, so they sort in page order.
+
+    :param page_number: The page number (1-based).
+    :param page_count: The number of pages in the PDF.
+    :param fmt: The image format, eg. "jpeg" or "png".
+
+    :returns: The file name of the page image.
+
+    """
+    extension = IMAGE_FILE_EXTENSIONS.get(fmt.lower(), fmt.lower())
+    number_width = len(str(page_count or ""))
+    return f"page_0001-{page_number:0{number_width}d}.{extension}"
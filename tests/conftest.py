@@ -1,10 +1,16 @@
 import os
+import shutil
+import tempfile
 
 FIXTURE_ROOT = os.path.join(os.path.dirname(__file__), "fixtures")
 
 # Set all ENV variables with bogus defaults for testing
 os.environ["WORKING_FOLDER"] = FIXTURE_ROOT
 os.environ["DOWNLOAD_FOLDER"] = FIXTURE_ROOT
+# Keep caches out of the fixtures folder. Set before the config is imported, so it
+# can't come from tmp_path_factory, and is removed in pytest_unconfigure instead
+CACHE_FOLDER = tempfile.mkdtemp(prefix="impl_utils_cache_")
+os.environ["CACHE_FOLDER"] = CACHE_FOLDER
 
 # Rikai2
 os.environ["RIKAI2_ORG_ID"] = "rikai2_org_id"
@@ -64,3 +70,7 @@ os.environ["ONE_DRIVE_REDIRECT_URI"] = ""  # Must match Azure registration
 ##gdrive
 os.environ["GOOGLE_DRIVE_CREDENTIALS_PATH"] = ""
 os.environ["GOOGLE_DRIVE_TOKEN_PATH"] = ""
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+from lazarus_implementation_tools.file_system.cache import FileCache
+
+
+def test_file_cache_put_and_get():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FileCache(os.path.join(tmp_dir, "cache"), max_size=1024)
+        assert cache.get("abcdef", "pdf") is None
+
+        path = cache.put_bytes("abcdef", b"sherlock", "pdf")
+        assert cache.get("abcdef", "pdf") == path
+
+        destination = os.path.join(tmp_dir, "copy.pdf")
+        assert cache.copy_to("abcdef", destination, "pdf")
+        with open(destination, "rb") as file:
+            assert file.read() == b"sherlock"
+
+
+def test_file_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FileCache(tmp_dir, max_size=30)
+        for index, key in enumerate(["aa1", "bb2", "cc3"]):
+            path = cache.put_bytes(key, b"0123456789")
+            os.utime(path, (index, index))
+
+        cache.get("aa1")  # Marks aa1 as recently used
+        cache.put_bytes("dd4", b"0123456789")
+
+        assert cache.get("aa1") is not None
+        assert cache.get("bb2") is None
+        assert cache.get("cc3") is not None
+        assert cache.get("dd4") is not None
+
+
+def test_file_cache_overwrite_keeps_size():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FileCache(tmp_dir, max_size=30)
+        cache.put_bytes("aa1", b"0123456789")
+        for _ in range(5):
+            cache.put_bytes("bb2", b"0123456789")
+            # The replaced file no longer counts
+            assert cache._size == 20
@@ -1,3 +1,4 @@
+import bisect
 from unittest import mock
 
 from lazarus_implementation_tools.sync.firebase.client import FirebaseStorageManager
@@ -44,3 +45,131 @@ class TestFirebaseClient(FirebaseMockMixin):
 
         blob = self.mock_blob({"name": "/folder/", "generate_signed_url": "http://blob.com/blob1"})
         assert client.is_folder(blob)
+
+
+class FakeBlobIterator:
+    def __init__(self, blobs, prefixes):
+        self._blobs = blobs
+        self.prefixes = set()
+        self._prefixes = prefixes
+
+    def __iter__(self):
+        yield from self._blobs
+        self.prefixes.update(self._prefixes)
+
+
+class FakeBucket(FirebaseMockMixin):
+    """Lists blobs like Cloud Storage does, counting the entries it sends back."""
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.listed = 0
+        self.blobs = {}
+
+    def list_blobs(self, prefix=None, delimiter=None, fields=None):
+        prefix = prefix or ""
+        start = bisect.bisect_left(self.names, prefix)
+        blobs, prefixes = [], set()
+        for name in self.names[start:]:
+            if not name.startswith(prefix):
+                break
+            rest = name[len(prefix) :]
+            if delimiter and delimiter in rest:
+                prefixes.add(prefix + rest[: rest.index(delimiter) + 1])
+                continue
+            blobs.append(self.mock_blob({"name": name}))
+        self.listed += len(blobs) + len(prefixes)
+        return FakeBlobIterator(blobs, prefixes)
+
+    def blob(self, name):
+        blob = self.mock_blob({"name": name})
+        # Large files take two rewrite calls
+        blob.rewrite.side_effect = [("token", 5, 10), (None, 10, 10)]
+        self.blobs[name] = blob
+        return blob
+
+    def get_blob(self, name):
+        self.listed += 1
+        if name not in self.names:
+            return None
+        return self.mock_blob({"name": name, "generate_signed_url": f"http://blob.com/{name}"})
+
+
+class TestFirebaseListing:
+    # A bucket full of webhook results, with one small folder of interest
+    names = [f"webhooks/{batch}/{item}.json" for batch in range(100) for item in range(1000)]
+    names += ["jobs/a/1.pdf", "jobs/a/2.pdf", "jobs/a/sub/3.pdf", "jobs/b/4.pdf", "jobs/c.pdf"]
+
+    def get_client(self):
+        client = FirebaseStorageManager(storage_url="fake_url.com")
+        client.bucket = FakeBucket(self.names)
+        return client
+
+    @mock.patch("firebase_admin.credentials.Certificate")
+    @mock.patch("firebase_admin.storage.bucket")
+    def test_list_all_files_in_path(self, mock_bucket, mock_credentials):
+        client = self.get_client()
+        assert client.list_all_files_in_path("jobs/a/") == ["1.pdf", "2.pdf"]
+        # Subfolders are rolled up by the server instead of being sent and dropped
+        assert client.bucket.listed == 3
+
+        client.bucket.listed = 0
+        files = client.list_all_files_in_path("jobs/a/", recursive=True)
+        assert files == ["1.pdf", "2.pdf", "sub/3.pdf"]
+        assert client.bucket.listed == 3
+
+        assert client.list_folders_in_path("jobs/") == ["a/", "b/"]
+
+    @mock.patch("firebase_admin.credentials.Certificate")
+    @mock.patch("firebase_admin.storage.bucket")
+    def test_delete_files_in_path(self, mock_bucket, mock_credentials):
+        client = self.get_client()
+        assert client.delete_files_in_path("jobs/a/") == [
+            "jobs/a/1.pdf",
+            "jobs/a/2.pdf",
+            "jobs/a/sub/3.pdf",
+        ]
+        # Proportional to the matched files, not to the 100,000 in the bucket
+        assert client.bucket.listed == 3
+
+    @mock.patch("firebase_admin.credentials.Certificate")
+    @mock.patch("firebase_admin.storage.bucket")
+    def test_get_presigned_url(self, mock_bucket, mock_credentials):
+        client = self.get_client()
+        assert client.get_presigned_url("jobs/c.pdf") == "http://blob.com/jobs/c.pdf"
+        assert client.get_presigned_url("jobs/missing.pdf") is None
+        assert client.bucket.listed == 2
+
+    @mock.patch("firebase_admin.credentials.Certificate")
+    @mock.patch("firebase_admin.storage.bucket")
+    def test_download_all_files_from_path_duplicate_names(
+        self, mock_bucket, mock_credentials, tmp_path
+    ):
+        client = self.get_client()
+        client.bucket = FakeBucket(["jobs/a/1.pdf", "jobs/a/sub/1.pdf", "jobs/a/2.pdf"])
+        with mock.patch.object(client, "download_blob", return_value=1) as mock_download:
+            results = client.download_all_files_from_path("jobs/a/", str(tmp_path))
+        assert [name for name, _ in results] == ["jobs/a/1.pdf", "jobs/a/2.pdf", "jobs/a/sub/1.pdf"]
+        # The last file listed wins, the one it replaces is not downloaded
+        downloaded = [call.args[0].name for call in mock_download.call_args_list]
+        assert sorted(downloaded) == ["jobs/a/2.pdf", "jobs/a/sub/1.pdf"]
+
+    @mock.patch("firebase_admin.credentials.Certificate")
+    @mock.patch("firebase_admin.storage.bucket")
+    def test_copy_files(self, mock_bucket, mock_credentials):
+        client = self.get_client()
+        assert client.copy_files("jobs/a/", "copies/") == [
+            ("1.pdf", "copies/1.pdf"),
+            ("2.pdf", "copies/2.pdf"),
+            ("sub/3.pdf", "copies/sub/3.pdf"),
+        ]
+        destination = client.bucket.blobs["copies/sub/3.pdf"]
+        source = client.bucket.blobs["jobs/a/sub/3.pdf"]
+        assert destination.rewrite.call_args_list == [
+            mock.call(source),
+            mock.call(source, token="token"),
+        ]
+        # Nothing goes through this process
+        source.download_as_bytes.assert_not_called()
+        destination.upload_from_string.assert_not_called()
+        assert client.last_transfer_report.transferred_bytes == 30
@@ -0,0 +1,123 @@
+import os
+from unittest import mock
+
+import pytest
+
+from lazarus_implementation_tools.sync.firebase.client import FirebaseStorageManager
+from lazarus_implementation_tools.sync.firebase.sync import sync_folder
+from lazarus_implementation_tools.sync.firebase.transfer import get_file_checksums
+
+
+class MemoryBlob:
+    content_encoding = None
+    generation = 1
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        content = bucket.data.get(name, b"")
+        self.size = len(content)
+        path = bucket.tmp_path / "checksum"
+        path.write_bytes(content)
+        self.md5_hash, self.crc32c = get_file_checksums(str(path))
+
+    def upload_from_filename(self, file_path, checksum=None):
+        with open(file_path, "rb") as file:
+            self.bucket.data[self.name] = file.read()
+        self.bucket.uploads += 1
+
+    def download_to_file(self, file, start, end, **kwargs):
+        file.write(self.bucket.data[self.name][start : end + 1])
+        self.bucket.downloads += 1
+
+    def delete(self):
+        del self.bucket.data[self.name]
+
+
+class MemoryBucket:
+    """Keeps blobs in memory, listing them with their checksums like Cloud Storage."""
+
+    def __init__(self, tmp_path):
+        self.data = {}
+        self.uploads = self.downloads = 0
+        self.tmp_path = tmp_path
+
+    def blob(self, name, chunk_size=None):
+        return MemoryBlob(self, name)
+
+    def get_blob(self, name):
+        return MemoryBlob(self, name) if name in self.data else None
+
+    def list_blobs(self, prefix=None, fields=None):
+        return [MemoryBlob(self, name) for name in sorted(self.data) if name.startswith(prefix)]
+
+
+@mock.patch("firebase_admin.credentials.Certificate")
+@mock.patch("firebase_admin.storage.bucket")
+@mock.patch(
+    "lazarus_implementation_tools.sync.firebase.sync.get_file_checksums", wraps=get_file_checksums
+)
+def test_sync_folder(mock_checksums, mock_bucket, mock_credentials, tmp_path):
+    local = tmp_path / "working"
+    (local / "results" / "sub").mkdir(parents=True)
+    (local / ".cache").mkdir()
+    (local / ".cache" / "page.npz").write_bytes(b"cached")
+    for number in range(5):
+        (local / "results" / f"{number}.json").write_text(f"result {number}")
+    (local / "results" / "sub" / "5.json").write_text("result 5")
+
+    client = FirebaseStorageManager(storage_url="fake_url.com")
+    client.bucket = MemoryBucket(tmp_path)
+    client.bucket.data["sync/stale.json"] = b"stale"
+
+    report = sync_folder(client, str(local), "sync")
+    assert report.transferred == [f"results/{number}.json" for number in range(5)] + [
+        "results/sub/5.json"
+    ]
+    assert "sync/results/sub/5.json" in client.bucket.data
+    assert "sync/.cache/page.npz" not in client.bucket.data
+    assert client.bucket.data["sync/stale.json"] == b"stale"
+    assert mock_checksums.call_count == 6
+
+    # Nothing changed, nothing is hashed or uploaded again
+    mock_checksums.reset_mock()
+    client.bucket.uploads = 0
+    report = sync_folder(client, str(local), "sync", delete_missing=True)
+    assert report.transferred == [] and report.unchanged == 6
+    assert report.deleted == ["stale.json"]
+    assert "sync/stale.json" not in client.bucket.data
+    assert client.bucket.uploads == 0
+    assert mock_checksums.call_count == 0
+
+    # Only the edited file is hashed and uploaded
+    (local / "results" / "2.json").write_text("result two")
+    report = sync_folder(client, str(local), "sync")
+    assert report.transferred == ["results/2.json"]
+    assert client.bucket.uploads == 1
+    assert mock_checksums.call_count == 1
+
+    # And back down into an empty folder, preserving the layout
+    other = tmp_path / "other"
+    report = sync_folder(client, str(other), "sync", direction="download")
+    assert len(report.transferred) == 6
+    assert (other / "results" / "2.json").read_text() == "result two"
+    assert (other / "results" / "sub" / "5.json").read_text() == "result 5"
+    assert sync_folder(client, str(other), "sync", direction="download").transferred == []
+
+    os.remove(local / "results" / "0.json")
+    report = sync_folder(client, str(local), "sync", delete_missing=True, dry_run=True)
+    assert report.deleted == ["results/0.json"]
+    assert "sync/results/0.json" in client.bucket.data
+
+
+@mock.patch("firebase_admin.credentials.Certificate")
+@mock.patch("firebase_admin.storage.bucket")
+@pytest.mark.parametrize("firebase_path", ["", "/"])
+def test_sync_folder_delete_missing_at_root(mock_bucket, mock_credentials, firebase_path, tmp_path):
+    client = FirebaseStorageManager(storage_url="fake_url.com")
+    client.bucket = MemoryBucket(tmp_path)
+    client.bucket.data["other/project.json"] = b"someone else's"
+
+    with pytest.raises(ValueError):
+        sync_folder(client, str(tmp_path / "working"), firebase_path, delete_missing=True)
+    assert "other/project.json" in client.bucket.data
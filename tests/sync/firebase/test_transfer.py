@@ -0,0 +1,144 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from google.api_core import exceptions
+
+from lazarus_implementation_tools.sync.firebase.client import FirebaseStorageManager
+from lazarus_implementation_tools.sync.firebase.transfer import (
+    FirebaseChecksumError,
+    FirebaseTransferError,
+    TransferProgress,
+    TransferResult,
+    get_file_checksums,
+    run_transfers,
+)
+
+
+@mock.patch("lazarus_implementation_tools.sync.firebase.transfer.RETRY_DELAY", 0)
+def test_run_transfers():
+    attempts = {}
+    running = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def transfer(job):
+        with lock:
+            attempts[job] = attempts.get(job, 0) + 1
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        try:
+            if job == "flaky" and attempts[job] < 3:
+                raise exceptions.ServiceUnavailable("try again")
+            if job == "missing":
+                raise exceptions.NotFound("no such blob")
+            time.sleep(0.01)
+            return TransferResult(source=job, size=10)
+        finally:
+            with lock:
+                running["now"] -= 1
+
+    updates = []
+    progress = TransferProgress(callback=lambda progress: updates.append(progress.files_done))
+    jobs = [f"file{number}" for number in range(20)] + ["flaky", "missing"]
+    report = run_transfers(jobs, transfer, max_workers=8, retries=3, progress=progress)
+
+    assert [result.source for result in report.results] == jobs
+    assert report.results[-2].attempts == 3 and not report.results[-2].error
+    # Client errors are not retried
+    assert attempts["missing"] == 1
+    assert [result.source for result in report.failed] == ["missing"]
+    assert report.transferred_bytes == 210
+    assert progress.files_done == 21 and progress.files_failed == 1
+    assert progress.bytes_done == 210 and progress.files_total == 22
+    assert len(updates) == 22
+    # The transfers overlapped, up to the number of workers
+    assert 1 < running["peak"] <= 8
+    assert "21 files" in report.summary()
+
+
+@mock.patch("firebase_admin.credentials.Certificate")
+@mock.patch("firebase_admin.storage.bucket")
+def test_upload_folder_to_path(mock_bucket, mock_credentials, tmp_path):
+    for number in range(5):
+        (tmp_path / f"{number}.txt").write_text("x" * number)
+    client = FirebaseStorageManager(storage_url="fake_url.com", working_folder=str(tmp_path))
+    client.bucket = mock.Mock()
+
+    def get_blob(name, chunk_size=None):
+        blob = mock.Mock()
+        blob.name = name
+        return blob
+
+    client.bucket.blob.side_effect = get_blob
+
+    results = client.upload_folder_to_path("uploads", str(tmp_path))
+    assert sorted(destination for _, destination in results) == [
+        f"uploads/{number}.txt" for number in range(5)
+    ]
+    assert client.last_transfer_report.transferred_bytes == 10
+
+    client.bucket.blob.side_effect = exceptions.Forbidden("denied")
+    with pytest.raises(FirebaseTransferError) as error:
+        client.upload_folder_to_path("uploads", str(tmp_path))
+    assert len(error.value.report.failed) == 5
+
+
+class FlakyBlob:
+    """A 1 MB blob whose connection drops halfway through the third chunk."""
+
+    name = "archives/big.zip"
+    generation = 7
+    content_encoding = None
+
+    def __init__(self, tmp_path):
+        self.data = bytes(range(256)) * 4096
+        self.size = len(self.data)
+        path = tmp_path / "checksum"
+        path.write_bytes(self.data)
+        self.md5_hash, self.crc32c = get_file_checksums(str(path))
+        self.requests = []
+
+    def download_to_file(self, file, start, end, if_generation_match, **kwargs):
+        assert if_generation_match == self.generation
+        self.requests.append(start)
+        if len(self.requests) == 3:
+            file.write(self.data[start : start + 1000])
+            raise exceptions.ServiceUnavailable("connection reset")
+        file.write(self.data[start : end + 1])
+
+
+@mock.patch("firebase_admin.credentials.Certificate")
+@mock.patch("firebase_admin.storage.bucket")
+def test_download_blob(mock_bucket, mock_credentials, tmp_path):
+    client = FirebaseStorageManager(storage_url="fake_url.com")
+    blob = FlakyBlob(tmp_path)
+    local_path = str(tmp_path / "big.zip")
+    chunk_size = 256 * 1024
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        client.download_blob(blob, local_path, chunk_size=chunk_size)
+    # The next attempt continues where the dropped request stopped
+    assert client.download_blob(blob, local_path, chunk_size=chunk_size) == blob.size
+    assert blob.requests == [
+        0,
+        chunk_size,
+        2 * chunk_size,
+        2 * chunk_size + 1000,
+        3 * chunk_size + 1000,
+    ]
+    with open(local_path, "rb") as file:
+        assert file.read() == blob.data
+    assert not list(tmp_path.glob("*.part"))
+
+    # Only parts of older generations are cleaned up, once the download is in place
+    (tmp_path / "big.zip.6.part").write_bytes(b"old")
+    (tmp_path / "big.zip.8.part").write_bytes(b"newer")
+    client.download_blob(blob, local_path, chunk_size=chunk_size)
+    assert [path.name for path in tmp_path.glob("*.part")] == ["big.zip.8.part"]
+    (tmp_path / "big.zip.8.part").unlink()
+
+    blob.crc32c = "AAAAAA=="
+    with pytest.raises(FirebaseChecksumError):
+        client.download_blob(blob, local_path, chunk_size=chunk_size)
+    assert not list(tmp_path.glob("*.part"))
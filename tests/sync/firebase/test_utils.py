@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from lazarus_implementation_tools.sync.firebase import utils
+
+
+@mock.patch("firebase_admin.credentials.Certificate")
+@mock.patch("firebase_admin.storage.bucket")
+def test_get_firebase_manager(mock_bucket, mock_credentials):
+    utils.clear_firebase_managers()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        managers = list(
+            executor.map(lambda _: utils.get_firebase_manager("a.com", "key"), range(50))
+        )
+    assert all(manager is managers[0] for manager in managers)
+    assert mock_credentials.call_count == 1
+
+    assert utils.get_firebase_manager("b.com", "key") is not managers[0]
+    # The Firebase app is already set up with the first credentials
+    with pytest.raises(ValueError):
+        utils.get_firebase_manager("a.com", "other_key")
+    with pytest.raises(ValueError):
+        utils.get_firebase_manager("c.com", "other_key")
+
+    utils.clear_firebase_managers()
+    assert utils.get_firebase_manager("a.com", "key") is not managers[0]
+    utils.clear_firebase_managers()
@@ -0,0 +1,27 @@
+from lazarus_implementation_tools.transformations.ocr.cache import (
+    cache_page,
+    get_cached_page,
+    get_ocr_cache_key,
+)
+from lazarus_implementation_tools.transformations.ocr.results import OcrResults
+
+
+def test_ocr_cache():
+    settings = (("en",), ()), "1.7.2", None, ()
+    cache_key = get_ocr_cache_key("pdf_hash", 3, 300, settings)
+    assert get_ocr_cache_key("pdf_hash", 3, 200, settings) != cache_key
+    assert get_ocr_cache_key("pdf_hash", 4, 300, settings) != cache_key
+    assert get_ocr_cache_key("other_hash", 3, 300, settings) != cache_key
+    assert get_ocr_cache_key("pdf_hash", 3, 300, (("fr",), ())) != cache_key
+    assert get_cached_page(cache_key) is None
+
+    detections = [([[10, 20], [110, 20], [110, 60], [10, 60]], "LAZARUS", 0.91)]
+    cache_page(cache_key, OcrResults.from_detections(detections, 3))
+    cached = get_cached_page(cache_key)
+    assert cached.text == ["LAZARUS"]
+    assert cached.pages.tolist() == [3]
+
+    # Pages without words are cached too
+    empty_key = get_ocr_cache_key("pdf_hash", 4, 300, settings)
+    cache_page(empty_key, OcrResults.from_detections([], 4))
+    assert len(get_cached_page(empty_key)) == 0
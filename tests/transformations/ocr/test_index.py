@@ -0,0 +1,72 @@
+from lazarus_implementation_tools.file_system.utils import in_working
+from lazarus_implementation_tools.transformations.ocr.index import WordIndex
+from lazarus_implementation_tools.transformations.ocr.results import OcrResults
+from lazarus_implementation_tools.transformations.ocr.text_layer import read_text_layer
+
+PDF_PATH = in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf")
+
+
+def get_index() -> WordIndex:
+    pages = read_text_layer(PDF_PATH, start_page=7, end_page=9)
+    return WordIndex(
+        OcrResults.concatenate(
+            [OcrResults.from_page_results(words, number) for number, words in pages.items()]
+        )
+    )
+
+
+def test_search_region():
+    index = get_index()
+    results = index.results
+    words = [
+        (number, x0, y0, x1, y1)
+        for number, x0, y0, x1, y1 in zip(
+            results.page, results.x0, results.y0, results.x1, results.y1
+        )
+    ]
+    region = (8, 300, 1000, 1500, 1600)
+
+    found = index.search_region(*region)
+    expected = [
+        position
+        for position, (number, x0, y0, x1, y1) in enumerate(words)
+        if number == 8 and x0 <= 1500 and y0 <= 1600 and x1 >= 300 and y1 >= 1000
+    ]
+    assert found.tolist() == expected
+    assert len(expected) > 10
+
+    contained = index.search_region(*region, contained=True)
+    assert set(contained.tolist()) < set(expected)
+    assert index.search_region(20, 0, 0, 3000, 3000).tolist() == []
+
+
+def test_nearest():
+    index = get_index()
+    results = index.results
+    first_word = int(index.page_words[7][0])
+    x = (int(results.x0[first_word]) + int(results.x1[first_word])) / 2
+    y = (int(results.y0[first_word]) + int(results.y1[first_word])) / 2
+
+    nearest = index.nearest(7, x, y, count=3)
+    assert nearest[0] == first_word
+    assert len(nearest) == 3
+    # Far off the page, the closest words are still found
+    assert len(index.nearest(7, -5000, -5000, count=2)) == 2
+
+
+def test_find_text():
+    index = get_index()
+
+    matches = index.find_text("Mr Sherlok Holmes")
+    assert matches
+    best = matches[0]
+    assert best.text.replace(".", "") == "Mr Sherlock Holmes"
+    assert best.score > 0.9
+    assert best.bounding_box.page_number == 7
+    box = best.bounding_box.box
+    assert box["top_left_x"] < box["bottom_right_x"]
+
+    matches = index.find_text("Sherlock Holmes", page_number=9)
+    assert len(matches) == 3
+    assert all(match.bounding_box.page_number == 9 for match in matches)
+    assert index.find_text("zzzz qqqq") == []
@@ -0,0 +1,52 @@
+import numpy as np
+
+from lazarus_implementation_tools.transformations.ocr.core import format_ocr_results
+from lazarus_implementation_tools.transformations.ocr.results import OcrResults
+
+DETECTIONS = [
+    (
+        [[np.int32(10), np.int32(20)], [110, 20], [110, 60], [10, 60]],
+        "LAZARUS",
+        np.float64(0.9106397069581507),
+    ),
+    ([[120, 20], [200, 20], [200, 60], [120, 60]], "Ünïcode ✓", 0.5),
+]
+
+
+def test_ocr_results_match_format_ocr_results():
+    results = OcrResults.concatenate(
+        [
+            OcrResults.from_detections(DETECTIONS, 3),
+            OcrResults.from_detections([], 1),
+            OcrResults.from_detections(DETECTIONS[:1], 2),
+        ],
+        page_count=12,
+    )
+    assert len(results) == 3
+    assert results.pages.tolist() == [1, 2, 3]
+
+    pages = results.as_dict()
+    assert list(pages) == ["page_0001-01.jpg", "page_0001-02.jpg", "page_0001-03.jpg"]
+    assert pages["page_0001-01.jpg"] == []
+    assert pages["page_0001-03.jpg"] == format_ocr_results(DETECTIONS, 3)
+
+    again = OcrResults.from_dict(dict(pages), page_count=12)
+    assert again.as_dict()["page_0001-03.jpg"] == pages["page_0001-03.jpg"]
+
+
+def test_ocr_results_save_and_load(tmp_path):
+    results = OcrResults.concatenate(
+        [OcrResults.from_detections(DETECTIONS, 1), OcrResults.from_detections([], 2)],
+        page_count=2,
+    )
+    path = str(tmp_path / "ocr_results.npz")
+    results.save(path)
+
+    loaded = OcrResults.load(path)
+    assert loaded.text == ["LAZARUS", "Ünïcode ✓"]
+    assert loaded.pages.tolist() == [1, 2]
+    assert loaded.page_count == 2
+    assert dict(loaded.as_dict()) == dict(results.as_dict())
+    # Cached pages are identical to the fresh ones, confidences included
+    first_page = next(iter(loaded.as_dict().values()))
+    assert first_page == format_ocr_results(DETECTIONS, 1)
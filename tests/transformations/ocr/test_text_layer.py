@@ -0,0 +1,46 @@
+from fpdf import FPDF
+from PIL import Image
+
+from lazarus_implementation_tools.file_system.utils import in_working
+from lazarus_implementation_tools.transformations.ocr.text_layer import read_text_layer
+
+PDF_PATH = in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf")
+
+
+def test_read_text_layer():
+    pages = read_text_layer(PDF_PATH, start_page=3, end_page=7)
+    assert list(pages) == [3, 4, 5, 6, 7]
+    # Blank pages have no text layer and are left to OCR
+    assert pages[4] is None
+    assert pages[6] is None
+
+    words = pages[7]
+    assert [word["data"] for word in words[:5]] == ["CHAPTER", "I.", "Mr.", "Sherlock", "Holmes"]
+    for word in words:
+        assert word["confidence"] == 1.0
+        assert word["bounding_box"]["page_number"] == 7
+        box = word["bounding_box"]["box"]
+        # Letter size at 300 DPI
+        assert 0 <= box["top_left_x"] < box["bottom_right_x"] <= 2550
+        assert 0 <= box["top_left_y"] < box["bottom_right_y"] <= 3300
+
+
+def test_read_text_layer_scanned_pages(tmp_path):
+    scan = Image.new("L", (850, 1100), 255)
+    pdf = FPDF(unit="pt", format="letter")
+    pdf.set_font("helvetica", size=10)
+    # A scan with only a Bates number on top of it
+    pdf.add_page()
+    pdf.image(scan, x=0, y=0, w=612, h=792)
+    pdf.text(480, 780, "Page 1 of 5 BATES-000123")
+    # A searchable scan, with the words of the scanned page in its text layer
+    pdf.add_page()
+    pdf.image(scan, x=0, y=0, w=612, h=792)
+    for line in range(40):
+        pdf.text(72, 72 + 16 * line, "It was in the year 1878 that I took my degree " * 2)
+    pdf_path = str(tmp_path / "scan.pdf")
+    pdf.output(pdf_path)
+
+    pages = read_text_layer(pdf_path)
+    assert pages[1] is None
+    assert pages[2][0]["data"] == "It"
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+from lazarus_implementation_tools.transformations.ocr.tiling import (
+    get_tiles,
+    needs_tiling,
+    read_tiled,
+)
+
+
+class BlobReader:
+    """Reads every dark blob in an image as a word, like reader.readtext."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def readtext(self, image):
+        self.shapes.append(image.shape)
+        mask = (image.min(axis=2) < 128).astype(np.uint8)
+        results = []
+        for contour in cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]:
+            x, y, w, h = cv2.boundingRect(contour)
+            corners = [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+            results.append((corners, "word", 0.9))
+        return results
+
+
+def test_get_tiles():
+    tiles = get_tiles(5000, 3000, tile_size=2048, overlap=256)
+    assert all(right - left == 2048 and bottom - top == 2048 for left, top, right, bottom in tiles)
+    # Every pixel is covered and neighbours share the overlap
+    assert sorted({left for left, _, _, _ in tiles}) == [0, 1792, 2952]
+    assert sorted({top for _, top, _, _ in tiles}) == [0, 952]
+    assert get_tiles(1000, 800, tile_size=2048, overlap=256) == [(0, 0, 1000, 800)]
+
+
+def test_read_tiled():
+    image = np.full((3000, 5000, 3), 255, dtype=np.uint8)
+    boxes = [
+        (100, 100, 300, 140),
+        (1850, 500, 1950, 540),  # Whole in two tiles
+        (2000, 700, 2100, 740),  # Cut by the edge of the first tile
+        (4800, 2900, 4900, 2950),
+    ]
+    for x0, y0, x1, y1 in boxes:
+        image[y0:y1, x0:x1] = 0
+    assert needs_tiling(image, page_size=4000)
+    assert not needs_tiling(image, page_size=0)
+
+    reader = BlobReader()
+    results = read_tiled(reader, image, tile_size=2048, overlap=256, max_tiles=36)
+    assert len(reader.shapes) == 6
+    # Words in the overlap are detected by two tiles but kept once, whole and in page space
+    found = sorted((x0, y0, x1, y1) for (x0, y0), _, (x1, y1), _ in (r[0] for r in results))
+    assert found == boxes
+
+    # Too many tiles, the page is scaled down and coordinates scaled back up
+    reader = BlobReader()
+    results = read_tiled(reader, image, tile_size=1024, overlap=128, max_tiles=4)
+    assert len(reader.shapes) <= 4
+    assert len(results) == 4
+    (x0, y0), _, (x1, y1), _ = sorted(r[0] for r in results)[0]
+    assert abs(x0 - 100) < 10 and abs(y0 - 100) < 10
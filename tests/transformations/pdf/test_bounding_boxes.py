@@ -0,0 +1,46 @@
+from unittest import mock
+
+import pytest
+
+from lazarus_implementation_tools.general.pydantic_models import (
+    BoundingBox,
+    Polygon,
+    TextBox,
+)
+from lazarus_implementation_tools.transformations.pdf import bounding_boxes
+from lazarus_implementation_tools.transformations.pdf.bounding_boxes import (
+    _rasterize_pages,
+    group_annotations_by_page,
+)
+
+box = {"top_left_x": 10, "top_left_y": 10, "bottom_right_x": 110, "bottom_right_y": 110}
+
+
+def test_group_annotations_by_page():
+    annotations = [
+        BoundingBox(page_number=2, box=box),
+        Polygon(page_number=1, vertices=[(0, 0), (1, 1), (0, 1)]),
+        TextBox(page_number=2, coordinates=(1, 1), text="Sherlock"),
+    ]
+    pages = group_annotations_by_page(annotations, page_count=3)
+    assert list(pages) == [2, 1]
+    assert pages[1] == [annotations[1]]
+    assert pages[2] == [annotations[0], annotations[2]]
+
+
+@pytest.mark.parametrize("page_number", [0, 4])
+def test_group_annotations_by_page_out_of_range(page_number):
+    annotations = [
+        BoundingBox(page_number=1, box=box),
+        BoundingBox(page_number=page_number, box=box),
+    ]
+    with pytest.raises(ValueError):
+        group_annotations_by_page(annotations, page_count=3)
+
+
+def test_rasterize_pages_short_render():
+    reader = mock.Mock(pages=[None] * 5)
+    # Poppler sees fewer pages than PyPDF2
+    with mock.patch.object(bounding_boxes, "render_pages", return_value=[]):
+        with pytest.raises(RuntimeError):
+            list(_rasterize_pages("scan.pdf", reader, [4, 5], dpi=72))
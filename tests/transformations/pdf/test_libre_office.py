@@ -0,0 +1,87 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from lazarus_implementation_tools.file_system.utils import in_working
+from lazarus_implementation_tools.transformations.pdf import libre_office
+from lazarus_implementation_tools.transformations.pdf.core import convert_files_to_pdf
+from lazarus_implementation_tools.transformations.pdf.libre_office import (
+    libre_office_convert_file,
+    parse_convert_to,
+)
+
+DOCX_PATH = "word_processing/Sherlock_Holmes_Fan_Club_Newsletter.docx"
+
+convert_to_cases = [
+    ("pdf", ("pdf", None, {})),
+    ("pdf:writer_pdf_Export", ("pdf", "writer_pdf_Export", {})),
+    (
+        'pdf:draw_pdf_Export:{"SinglePageSheets":{"type":"boolean","value":"true"}}',
+        ("pdf", "draw_pdf_Export", {"SinglePageSheets": True}),
+    ),
+    (
+        'pdf:calc_pdf_Export:{"Quality":{"type":"long","value":"90"}}',
+        ("pdf", "calc_pdf_Export", {"Quality": 90}),
+    ),
+]
+
+
+@pytest.mark.parametrize("convert_to,expected", convert_to_cases)
+def test_parse_convert_to(convert_to, expected):
+    assert parse_convert_to(convert_to) == expected
+
+
+@mock.patch.object(libre_office, "uno", None)
+@mock.patch("subprocess.run")
+def test_libre_office_convert_file_without_uno(mock_run):
+    output_file = libre_office_convert_file("/in/report.docx", "/out")
+    assert output_file == "/out/report.pdf"
+    command = mock_run.call_args[0][0]
+    assert command[-5:] == ["--convert-to", "pdf", "--outdir", "/out", "/in/report.docx"]
+
+
+def test_convert_files_to_pdf_stops_libre_office(tmp_path, monkeypatch):
+    """LibreOffice runs for every job of a worker, and is stopped when the worker exits."""
+    pid_file = tmp_path / "pids"
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    os.mkdir(tempfile.tempdir)
+
+    def start(worker):
+        # Stands in for soffice, a child process that only exits when terminated
+        worker.process = subprocess.Popen(["sleep", "60"])
+        worker.desktop = mock.Mock(terminate=worker.process.terminate)
+        with open(pid_file, "a") as file:
+            file.write(f"{worker.process.pid}\n")
+
+    def convert(worker, file_path, output_dir, convert_to):
+        output_file = os.path.join(output_dir, f"{Path(file_path).stem}.pdf")
+        shutil.copy(in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf"), output_file)
+        return output_file
+
+    # Unique contents, so the conversion cache can't answer for LibreOffice
+    file_paths = []
+    for number in range(3):
+        file_path = tmp_path / f"report{number}.docx"
+        file_path.write_bytes(Path(in_working(DOCX_PATH)).read_bytes() + os.urandom(16))
+        file_paths.append(str(file_path))
+
+    monkeypatch.setattr(libre_office, "uno", mock.Mock())
+    monkeypatch.setattr(libre_office, "LIBRE_OFFICE_DAEMON", True)
+    monkeypatch.setattr(libre_office.LibreOfficeWorker, "start", start)
+    monkeypatch.setattr(libre_office.LibreOfficeWorker, "_convert", convert)
+    # One worker process and one file per job, so the jobs run one after another
+    report = convert_files_to_pdf(file_paths, str(tmp_path), max_workers=1, batch_size=1)
+
+    assert report.converted == [str(tmp_path / f"report{number}.pdf") for number in range(3)]
+    pids = [int(pid) for pid in pid_file.read_text().split()]
+    # Started for the first job and kept running for the others
+    assert len(pids) == 1
+    with pytest.raises(ProcessLookupError):
+        os.kill(pids[0], 0)
+    # Neither the worker profiles nor the LibreOffice profiles are left behind
+    assert os.listdir(tempfile.tempdir) == []
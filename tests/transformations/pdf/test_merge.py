@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+import pytest
+from PyPDF2 import PdfReader
+
+from lazarus_implementation_tools.file_system.utils import in_working
+from lazarus_implementation_tools.transformations.pdf.core import merge_pdfs
+from lazarus_implementation_tools.transformations.pdf.merge import stream_merge_pdfs
+
+PDF_PATH = in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf")
+
+
+def test_stream_merge_pdfs():
+    with tempfile.TemporaryDirectory() as folder:
+        corrupt_path = os.path.join(folder, "corrupt.pdf")
+        with open(corrupt_path, "wb") as file:
+            file.write(b"%PDF-1.4\nnot a pdf")
+
+        output_path = os.path.join(folder, "merged.pdf")
+        report = stream_merge_pdfs(iter([PDF_PATH, corrupt_path, PDF_PATH]), output_path)
+
+        assert report.page_count == 124
+        assert [merged.page_count for merged in report.inputs] == [62, 0, 62]
+        assert [merged.path for merged in report.skipped] == [corrupt_path]
+
+        reader = PdfReader(output_path)
+        assert len(reader.pages) == 124
+        assert reader.pages[62].extract_text() == PdfReader(PDF_PATH).pages[0].extract_text()
+        # The second copy shares the fonts and images of the first
+        assert os.path.getsize(output_path) < 1.5 * os.path.getsize(PDF_PATH)
+
+
+def test_merge_pdfs_without_pdfs():
+    with pytest.raises(ValueError, match="No PDFs to merge"):
+        merge_pdfs(iter([]))
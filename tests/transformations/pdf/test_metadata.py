@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import NameObject, NumberObject, RectangleObject
+
+from lazarus_implementation_tools.file_system.utils import in_working
+from lazarus_implementation_tools.transformations.pdf import metadata
+from lazarus_implementation_tools.transformations.pdf.metadata import read_pdf_metadata
+
+PDF_PATH = in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf")
+
+
+def test_read_pdf_metadata():
+    pdf_metadata = read_pdf_metadata(PDF_PATH, use_cache=False)
+    assert pdf_metadata.page_count == 62
+    assert len(pdf_metadata.page_sizes) == 62
+    assert not pdf_metadata.encrypted
+    assert pdf_metadata.has_text_layer
+
+
+def test_read_pdf_metadata_uses_cache():
+    with tempfile.TemporaryDirectory() as folder:
+        pdf_path = shutil.copy(PDF_PATH, os.path.join(folder, "copy.pdf"))
+        first = read_pdf_metadata(pdf_path, use_cache=True)
+
+        with mock.patch.object(metadata, "_read_metadata") as read_metadata:
+            assert read_pdf_metadata(pdf_path, use_cache=True) == first
+            read_metadata.assert_not_called()
+
+            # A changed file is read again
+            os.utime(pdf_path, ns=(0, 0))
+            read_metadata.return_value = first
+            read_pdf_metadata(pdf_path, use_cache=True)
+            read_metadata.assert_called_once()
+
+
+def test_read_pdf_metadata_page_sizes(tmp_path):
+    writer = PdfWriter()
+    writer.add_page(PageObject.create_blank_page(width=612, height=792))
+    # Cropped to the top half of the page, and shown in landscape
+    page = PageObject.create_blank_page(width=612, height=792)
+    page.cropbox = RectangleObject([0, 396, 612, 792])
+    page[NameObject("/Rotate")] = NumberObject(90)
+    writer.add_page(page)
+    pdf_path = str(tmp_path / "cropped.pdf")
+    with open(pdf_path, "wb") as file:
+        writer.write(file)
+
+    assert read_pdf_metadata(pdf_path, use_cache=False).page_sizes == [
+        (612.0, 792.0),
+        (396.0, 612.0),
+    ]
@@ -0,0 +1,93 @@
+import os
+import tempfile
+from unittest import mock
+
+import pytest
+from PIL import Image
+
+from lazarus_implementation_tools.file_system.cache import FileCache
+from lazarus_implementation_tools.file_system.utils import get_file_hash, in_working
+from lazarus_implementation_tools.transformations.pdf import render
+from lazarus_implementation_tools.transformations.pdf.render import (
+    PDF_KEY_CACHE_SIZE,
+    ImageCache,
+    RenderCache,
+    get_page_runs,
+    get_pdf_key,
+    hash_pdf_version,
+    iter_rendered_pages,
+)
+
+
+def test_get_page_runs():
+    assert get_page_runs([1, 2, 3, 5, 7, 8]) == [(1, 3), (5, 5), (7, 8)]
+    assert get_page_runs([]) == []
+
+
+def test_image_cache():
+    # Each 10x10 RGB image is 300 bytes
+    cache = ImageCache(max_size=700)
+    cache.put("a", Image.new("RGB", (10, 10), "red"))
+    cache.put("b", Image.new("RGB", (10, 10), "green"))
+
+    image = cache.get("a")
+    assert image.getpixel((0, 0)) == (255, 0, 0)
+    # Drawing on a returned image leaves the cached one alone
+    image.putpixel((0, 0), (0, 0, 0))
+    assert cache.get("a").getpixel((0, 0)) == (255, 0, 0)
+
+    # "b" is the least recently used
+    cache.put("c", Image.new("RGB", (10, 10), "blue"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.size == 600
+
+
+def test_render_cache_disk_tier():
+    with tempfile.TemporaryDirectory() as folder:
+        cache = RenderCache(ImageCache(max_size=1024 * 1024), FileCache(folder, 1024 * 1024))
+        key = ("pdf_hash", 1, 200, False)
+        cache.put(key, Image.new("RGB", (10, 10), "red"))
+
+        cache.memory.clear()
+        assert key in cache
+        assert cache.get(key).getpixel((0, 0)) == (255, 0, 0)
+        # Promoted back to memory
+        assert key in cache.memory
+        assert ("pdf_hash", 1, 300, False) not in cache
+
+
+def test_get_pdf_key(tmp_path):
+    hash_pdf_version.cache_clear()
+    pdf_path = tmp_path / "report.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 first")
+    with mock.patch.object(render, "get_file_hash", wraps=get_file_hash) as mock_hash:
+        first_key = get_pdf_key(str(pdf_path))
+        assert first_key == get_file_hash(str(pdf_path))
+        # An unchanged file keeps its key without being read again
+        assert get_pdf_key(str(pdf_path)) == first_key
+        assert mock_hash.call_count == 1
+
+        # Rewritten with the same size, only the modification time tells them apart
+        pdf_path.write_bytes(b"%PDF-1.4 other")
+        stat = os.stat(pdf_path)
+        os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second_key = get_pdf_key(str(pdf_path))
+        assert second_key == get_file_hash(str(pdf_path)) != first_key
+        assert mock_hash.call_count == 2
+
+        # Only the most recent versions are remembered
+        for mtime_ns in range(PDF_KEY_CACHE_SIZE):
+            hash_pdf_version(str(pdf_path), mtime_ns, 0)
+        mock_hash.reset_mock()
+        assert get_pdf_key(str(pdf_path)) == second_key
+        assert mock_hash.call_count == 1
+
+
+def test_iter_rendered_pages_short_render():
+    pdf_path = in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf")
+    # Poppler skipped a page it failed to render
+    images = [Image.new("RGB", (10, 10), "white")] * 3
+    with mock.patch.object(render, "_render", return_value=images):
+        with pytest.raises(RuntimeError):
+            list(iter_rendered_pages(pdf_path, 1, 4, thread_count=4, use_cache=False))
@@ -0,0 +1,64 @@
+import tempfile
+
+import pytest
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, NameObject
+
+from lazarus_implementation_tools.file_system.utils import in_working
+from lazarus_implementation_tools.transformations.pdf.metadata import read_pdf_metadata
+from lazarus_implementation_tools.transformations.pdf.split import (
+    split_pdf,
+    split_pdf_by_blank_pages,
+    split_pdf_by_bookmarks,
+)
+
+PDF_PATH = in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf")
+
+
+def page_counts(pdf_paths):
+    return [read_pdf_metadata(pdf_path, use_cache=False).page_count for pdf_path in pdf_paths]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_split_pdf(max_workers):
+    with tempfile.TemporaryDirectory() as folder:
+        output_paths = split_pdf(PDF_PATH, [(1, 10), (11, 30), (31, 100)], folder, max_workers)
+        assert output_paths[2].endswith("sherlock_holmes_study_in_scarlet_31-62.pdf")
+        assert page_counts(output_paths) == [10, 20, 32]
+
+
+def test_split_pdf_invalid_range():
+    with pytest.raises(ValueError):
+        split_pdf(PDF_PATH, [(70, 80)])
+
+
+def test_split_pdf_by_bookmarks():
+    with tempfile.TemporaryDirectory() as folder:
+        assert page_counts(split_pdf_by_bookmarks(PDF_PATH, folder)) == [4, 30, 28]
+
+
+def add_drawn_page(writer, content):
+    page = PageObject.create_blank_page(width=612, height=792)
+    stream = DecodedStreamObject()
+    stream.set_data(content)
+    page[NameObject("/Contents")] = stream
+    writer.add_page(page)
+
+
+def test_split_pdf_by_blank_pages(tmp_path):
+    # Pages 4, 6, 34 and 36 of the fixture are blank
+    assert page_counts(split_pdf_by_blank_pages(PDF_PATH, str(tmp_path))) == [3, 1, 27, 1, 26]
+
+    writer = PdfWriter()
+    reader = PdfReader(PDF_PATH)
+    writer.add_page(reader.pages[0])
+    # A signature, drawn with paths only
+    add_drawn_page(writer, b"0 0 0 RG 100 100 m 200 150 l 300 120 l S")
+    # A separator with a white background
+    add_drawn_page(writer, b"1 g 0 0 612 792 re f")
+    writer.add_page(reader.pages[1])
+    pdf_path = str(tmp_path / "signed.pdf")
+    with open(pdf_path, "wb") as file:
+        writer.write(file)
+
+    assert page_counts(split_pdf_by_blank_pages(pdf_path, str(tmp_path / "split"))) == [2, 1]
@@ -1,8 +1,16 @@
+import os
 import tempfile
+from unittest import mock
 
 import pytest
 
 from lazarus_implementation_tools.file_system.utils import get_extension, in_working
+from lazarus_implementation_tools.transformations.pdf import core
+from lazarus_implementation_tools.transformations.pdf.core import (
+    _batch_office_files,
+    convert_file_to_pdf,
+    convert_files_to_pdf,
+)
 from lazarus_implementation_tools.transformations.pdf.utils import (
     convert_to_pdf,
     get_number_of_pages,
@@ -27,3 +35,73 @@ def test_convert_to_pdf(file_path, page_count):
         # and gets a sense if all the pages are there.
         assert get_extension(actual_file) == "pdf"
         assert get_number_of_pages(actual_file) == page_count
+
+
+def test_convert_to_pdf_list():
+    file_paths = [
+        in_working("images/Sherlock_Holmes_Fan_Club_Flyer.png"),
+        in_working("pdfs/sherlock_holmes_study_in_scarlet.pdf"),
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        converted_files = convert_to_pdf(file_paths, tmp_dir, max_workers=2)
+        assert len(converted_files) == 2
+        assert get_number_of_pages(converted_files[0]) == 1
+        assert converted_files[1] == file_paths[1]
+
+
+def test_convert_files_to_pdf_collects_failures():
+    file_paths = [
+        in_working("images/Sherlock_Holmes_Fan_Club_Flyer.png"),
+        in_working("unsupported.zzz"),
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        report = convert_files_to_pdf(file_paths, tmp_dir, max_workers=2)
+        assert [result.source for result in report.results] == file_paths
+        assert len(report.converted) == 1
+        assert list(report.failures) == [file_paths[1]]
+
+
+def test_convert_files_to_pdf_needs_a_worker():
+    with pytest.raises(ValueError):
+        convert_files_to_pdf(
+            [in_working("images/Sherlock_Holmes_Fan_Club_Flyer.png")], max_workers=0
+        )
+
+
+def test_batch_office_files():
+    file_paths = [
+        "/in/a/one.docx",
+        "/in/a/two.docx",
+        "/in/b/one.docx",
+        "/in/a/sheet.xlsx",
+        "/in/a/three.pptx",
+    ]
+    batches = _batch_office_files(file_paths, list(range(5)), "/out", batch_size=3)
+    # Spreadsheets use a different export filter and duplicate filenames would
+    # overwrite each other, so both get their own batch.
+    assert batches == [[0, 1, 4], [2], [3]]
+
+
+def test_convert_file_to_pdf_uses_cache():
+    doc_path = in_working("images/Sherlock_Holmes_Fan_Club_Flyer.png")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first = convert_file_to_pdf(doc_path, tmp_dir)
+        os.remove(first)
+        with mock.patch.object(core, "compile_image_files_to_pdf") as mock_compile:
+            second = convert_file_to_pdf(doc_path, tmp_dir)
+            mock_compile.assert_not_called()
+        assert second == first
+        assert get_number_of_pages(second) == 1
+
+
+def test_convert_file_to_pdf_does_not_cache_stale_output(tmp_path):
+    file_path = tmp_path / "report.docx"
+    file_path.write_bytes(os.urandom(64))
+    # Left behind by an earlier conversion
+    (tmp_path / "report.pdf").write_bytes(b"%PDF-1.4 old report")
+
+    # LibreOffice fails without writing anything
+    with mock.patch.object(core, "libre_office_convert_file"):
+        convert_file_to_pdf(str(file_path), str(tmp_path))
+    cache_key = core.get_conversion_cache_key(str(file_path))
+    assert core.get_conversion_cache().get(cache_key, "pdf") is None